@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Adaptive admission control for model inference
+An AIMD limit on concurrent inference grows while requests finish under the
+latency target and shrinks when they don't; requests over the limit are answered
+in degraded stages (cache, then pre-filter, then explicit fail-open) instead of
+queueing behind the model
+"""
+import threading
+import time
+
+# Degraded stages from least to most severe
+DEGRADED_STAGES = ("cache", "prefilter", "fail_open")
+
+
+def worst_stage(stages):
+    """Most severe degraded stage among stages (None entries ignored)"""
+    present = [stage for stage in stages if stage]
+    if not present:
+        return None
+    return max(present, key=DEGRADED_STAGES.index)
+
+
+class AdmissionController:
+    """Additive-increase / multiplicative-decrease cap on requests running inference"""
+
+    def __init__(
+        self, initial_limit=8, min_limit=1, max_limit=64, target_latency=0.5, backoff=0.9
+    ):
+        """
+        Args:
+            initial_limit: concurrent inference requests allowed at start
+            min_limit, max_limit: bounds for the adaptive limit
+            target_latency: seconds; slower completions shrink the limit
+            backoff: multiplicative decrease factor
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.deferred = 0
+        self.increases = 0
+        self.decreases = 0
+        self.latency_ewma = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Admit a request to the model path, or return False if it should be degraded"""
+        with self._lock:
+            if self.in_flight >= max(self.min_limit, int(self.limit)):
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def try_acquire_background(self):
+        """
+        Admit background work (queued jobs) only while it leaves a slot under the
+        limit for live requests, or nothing else is running; refusals are counted
+        as deferred, not shed
+        """
+        with self._lock:
+            if self.in_flight and self.in_flight + 1 >= max(self.min_limit, int(self.limit)):
+                self.deferred += 1
+                return False
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def release(self, latency, ok=True):
+        """Report an admitted request's outcome and adjust the limit"""
+        with self._lock:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self.latency_ewma = latency if not self.latency_ewma else (
+                0.9 * self.latency_ewma + 0.1 * latency
+            )
+
+            now = time.monotonic()
+            if not ok or latency > self.target_latency:
+                # One decrease per target interval, so a burst of slow completions
+                # from the same overload doesn't collapse the limit
+                if now - self._last_decrease >= self.target_latency:
+                    self._last_decrease = now
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self.decreases += 1
+            elif saturated and self.limit < self.max_limit:
+                # Roughly +1 per limit's worth of fast completions
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self.increases += 1
+
+    def get_stats(self):
+        """Current limit and counters"""
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "target_latency_ms": self.target_latency * 1000.0,
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "deferred": self.deferred,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "latency_ewma_ms": self.latency_ewma * 1000.0,
+            }
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Hardware autotuner for the moderation service
+Runs offline on the target machine: starts moderation_server.py with candidate
+settings, replays a sample corpus at a fixed client concurrency and measures
+throughput and p99 latency. The fastest setting that meets the p99 SLO (and
+still agrees with the reference verdicts) is written as a machine-specific
+profile to TUNING_PROFILE, which moderation_server.py applies at startup
+
+The search goes one group at a time instead of over the full grid:
+  1. backend x torch intra-op threads
+  2. torch inter-op threads
+  3. micro-batch size x max wait
+  4. sequence length cap
+each group starting from the best setting found so far. Threads are tuned for
+in-process serving (trial servers run with WORKER_PROCESSES=1)
+
+  python3 autotune.py --corpus posts.jsonl --slo-p99-ms 250
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add the automod directory to Python path
+sys.path.append(str(Path(__file__).parent))
+
+from benchmark import (
+    ServerUnderTest,
+    environment_info,
+    free_port,
+    measure_throughput,
+    synthetic_corpus,
+)
+from config import TUNABLE_SETTINGS, ModerationConfig
+from inference_backends import BACKENDS
+
+
+def load_corpus(path, limit):
+    """Posts from a JSONL or CSV export with title/content fields"""
+    posts = []
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for record in records:
+            if isinstance(record, dict) and (record.get("title") or record.get("content")):
+                posts.append({"title": record.get("title"), "content": record.get("content")})
+            if len(posts) >= limit:
+                break
+    if not posts:
+        raise SystemExit(f"No posts with a title or content in {path}")
+    return posts
+
+
+def parse_list(value, cast=int):
+    """Comma-separated sweep values"""
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def default_thread_counts():
+    """Powers of two up to the core count, plus the core count itself"""
+    cores = os.cpu_count() or 1
+    counts = {cores}
+    count = 1
+    while count < cores:
+        counts.add(count)
+        count *= 2
+    return ",".join(str(count) for count in sorted(counts))
+
+
+def batch_verdicts(server, posts, chunk=None):
+    """allowed flag per post, via POST /batch"""
+    chunk = chunk or ModerationConfig.BATCH_MAX_ITEMS
+    verdicts = []
+    for start in range(0, len(posts), chunk):
+        body = json.dumps({"items": posts[start : start + chunk]}).encode("utf-8")
+        request = urllib.request.Request(
+            server.url + "/batch", data=body, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=600) as response:
+            results = json.loads(response.read())["results"]
+        verdicts.extend(result.get("allowed") for result in results)
+    return verdicts
+
+
+class Autotuner:
+    """Measures candidate settings in fresh server processes and keeps every trial"""
+
+    def __init__(self, env, posts, args):
+        self.env = env
+        self.posts = posts
+        self.args = args
+        self.reference = None
+        self.trials = []
+        self._measured = {}
+
+    def measure(self, settings):
+        """Throughput, latency and verdict agreement of one setting (memoized)"""
+        key = tuple(sorted(settings.items()))
+        if key in self._measured:
+            return self._measured[key]
+
+        env = dict(self.env, **{name: str(value) for name, value in settings.items()})
+        trial = {"settings": dict(settings)}
+        try:
+            with ServerUnderTest(env, free_port(), self.args.startup_timeout) as server:
+                trial["startup_s"] = server.startup_seconds
+                verdicts = batch_verdicts(server, self.posts)
+                if self.reference is None:
+                    self.reference = verdicts
+                agreeing = sum(a == b for a, b in zip(verdicts, self.reference))
+                trial["agreement"] = agreeing / len(self.reference)
+
+                if self.args.warmup:
+                    measure_throughput(server, self.posts, self.args.concurrency, self.args.warmup)
+                load = measure_throughput(
+                    server, self.posts, self.args.concurrency, self.args.duration
+                )
+                trial.update(
+                    requests_per_s=load["requests_per_s"],
+                    p50_ms=load.get("p50_ms"),
+                    p99_ms=load.get("p99_ms"),
+                    status_counts=load["status_counts"],
+                    peak_rss_bytes=server.peak_rss_bytes,
+                )
+        except Exception as e:
+            trial["error"] = str(e)
+
+        trial["meets_slo"] = self.qualifies(trial)
+        self.trials.append(trial)
+        self._measured[key] = trial
+        print(self.describe(trial), file=sys.stderr)
+        return trial
+
+    def qualifies(self, trial):
+        """Error-free, within the p99 SLO and close enough to the reference verdicts"""
+        return (
+            "error" not in trial
+            and set(trial["status_counts"]) == {"200"}
+            and trial["p99_ms"] is not None
+            and trial["p99_ms"] <= self.args.slo_p99_ms
+            and trial["agreement"] >= self.args.min_agreement
+        )
+
+    def best(self, trials):
+        """Highest throughput within the SLO, else the lowest p99 among working trials"""
+        qualified = [trial for trial in trials if trial["meets_slo"]]
+        if qualified:
+            return max(qualified, key=lambda trial: trial["requests_per_s"])
+        working = [trial for trial in trials if "error" not in trial and trial.get("p99_ms")]
+        if not working:
+            return None
+        return min(working, key=lambda trial: trial["p99_ms"])
+
+    def run_stage(self, name, current, candidates):
+        """Measure each candidate change on top of current; returns the new best settings"""
+        print(f"== {name}: {len(candidates)} candidates", file=sys.stderr)
+        trials = [self.measure({**current, **candidate}) for candidate in candidates]
+        winner = self.best(trials + [self.measure(current)])
+        return dict(winner["settings"]) if winner is not None else current
+
+    @staticmethod
+    def describe(trial):
+        settings = " ".join(f"{name}={value}" for name, value in trial["settings"].items())
+        if "error" in trial:
+            return f"  {settings}: failed ({trial['error']})"
+        return (
+            f"  {settings}: {trial['requests_per_s']:.1f} req/s, "
+            f"p99 {trial['p99_ms'] or 0:.1f} ms, agreement {trial['agreement']:.3f}"
+            + ("" if trial["meets_slo"] else " (rejected)")
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sweep inference settings on this machine and write a tuning profile"
+    )
+    parser.add_argument("--corpus", help="JSONL or CSV sample of real posts (default: synthetic)")
+    parser.add_argument("--posts", type=int, default=300, help="posts used from the corpus")
+    parser.add_argument("--model", help="model to tune for (default: MODEL)")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per trial")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds per trial")
+    parser.add_argument("--slo-p99-ms", type=float, default=300.0, help="p99 latency target")
+    parser.add_argument(
+        "--min-agreement",
+        type=float,
+        default=0.99,
+        help="share of verdicts that must match the reference (eager, longest sequence cap)",
+    )
+    parser.add_argument("--backends", default="eager,int8", help=f"subset of {','.join(BACKENDS)}")
+    parser.add_argument("--threads", default=default_thread_counts(), help="torch intra-op threads")
+    parser.add_argument("--interop-threads", default="1,2", help="torch inter-op threads")
+    parser.add_argument("--batch-sizes", default="1,8,16,32", help="BATCH_MAX_SIZE values")
+    parser.add_argument("--max-waits", default="2,5,10", help="BATCH_MAX_WAIT_MS values")
+    parser.add_argument(
+        "--sequence-lengths",
+        default=str(ModerationConfig.MAX_SEQUENCE_LENGTH),
+        help="MAX_SEQUENCE_LENGTH caps (shorter is faster but sees less of long posts)",
+    )
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument(
+        "--output",
+        default=ModerationConfig.TUNING_PROFILE,
+        help="profile path (default: TUNING_PROFILE)",
+    )
+    args = parser.parse_args()
+
+    backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"Unknown backends: {', '.join(sorted(unknown))}")
+    threads = parse_list(args.threads)
+    interop = parse_list(args.interop_threads)
+    batch_sizes = parse_list(args.batch_sizes)
+    waits = parse_list(args.max_waits, float)
+    sequence_lengths = sorted(parse_list(args.sequence_lengths), reverse=True)
+    if not (backends and threads and interop and batch_sizes and waits and sequence_lengths):
+        parser.error("Every sweep needs at least one value")
+
+    posts = (
+        load_corpus(args.corpus, args.posts) if args.corpus else synthetic_corpus(args.posts)
+    )
+    model = args.model or ModerationConfig.MODEL_NAME
+
+    # Every request runs inference, and the trial servers touch nothing shared
+    # with a production instance (socket, job queue, verdict store, profile)
+    env = dict(
+        os.environ,
+        MODEL=model,
+        TUNING_PROFILE="",
+        CACHE_MAX_ENTRIES="0",
+        VERDICT_STORE_PATH="",
+        PREFILTER_MODE="off",
+        NEAR_DUPLICATE_MODE="off",
+        JOB_QUEUE_PATH="",
+        MODERATION_SOCKET_PATH="",
+        ADMISSION_CONTROL="false",
+        WORKER_PROCESSES="1",
+        MAX_IN_FLIGHT=str(max(ModerationConfig.MAX_IN_FLIGHT, args.concurrency)),
+        MODERATION_IDLE_TIMEOUT="600",
+        LOG_LEVEL="WARNING",
+        PYTHONUNBUFFERED="1",
+    )
+
+    tuner = Autotuner(env, posts, args)
+    started = time.monotonic()
+    # The reference everything is compared with: full precision, longest cap
+    current = {
+        "MODERATION_BACKEND": "eager",
+        "TORCH_THREADS": 0,
+        "TORCH_INTEROP_THREADS": 0,
+        "BATCH_MAX_SIZE": ModerationConfig.BATCH_MAX_SIZE,
+        "BATCH_MAX_WAIT_MS": ModerationConfig.BATCH_MAX_WAIT_MS,
+        "MAX_SEQUENCE_LENGTH": sequence_lengths[0],
+    }
+    if "error" in tuner.measure(current):
+        raise SystemExit("The reference configuration failed; check MODEL and the server logs")
+
+    current = tuner.run_stage(
+        "backend x threads",
+        current,
+        [
+            {"MODERATION_BACKEND": backend, "TORCH_THREADS": count}
+            for backend in backends
+            for count in threads
+        ],
+    )
+    current = tuner.run_stage(
+        "inter-op threads", current, [{"TORCH_INTEROP_THREADS": count} for count in interop]
+    )
+    current = tuner.run_stage(
+        "batching",
+        current,
+        [
+            {"BATCH_MAX_SIZE": size, "BATCH_MAX_WAIT_MS": wait}
+            for size in batch_sizes
+            # Batch size 1 disables micro-batching, so the wait doesn't matter
+            for wait in (waits if size > 1 else waits[:1])
+        ],
+    )
+    current = tuner.run_stage(
+        "sequence length", current, [{"MAX_SEQUENCE_LENGTH": n} for n in sequence_lengths]
+    )
+
+    result = tuner.measure(current)
+    profile = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment_info(model),
+        "objective": {
+            "concurrency": args.concurrency,
+            "slo_p99_ms": args.slo_p99_ms,
+            "min_agreement": args.min_agreement,
+            "corpus": args.corpus or "synthetic",
+            "posts": len(posts),
+        },
+        "slo_met": result["meets_slo"],
+        "settings": {name: current[name] for name in TUNABLE_SETTINGS if name in current},
+        "result": {key: value for key, value in result.items() if key != "settings"},
+        "search_seconds": round(time.monotonic() - started, 1),
+        "trials": tuner.trials,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+        f.write("\n")
+
+    print(json.dumps({"output": args.output, **{k: profile[k] for k in ("slo_met", "settings")}}))
+    if not result["meets_slo"]:
+        print(
+            f"No setting met p99 <= {args.slo_p99_ms:g} ms at {args.concurrency} clients; "
+            "the profile holds the lowest-latency one",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
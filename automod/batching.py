@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Dynamic micro-batching for moderation inference
+Gathers concurrent requests into one padded batch and hands each caller its own result;
+PipelinedBatcher additionally runs tokenization, the forward pass and post-processing
+on separate threads so consecutive batches overlap
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+# Sentinel used to wake the worker thread on shutdown
+_STOP = object()
+
+
+class MicroBatcher:
+    """Collects submitted items and flushes them to predict_fn in batches"""
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, name="moderation-batcher"):
+        """
+        Args:
+            predict_fn: callable taking a list of items and returning a list of results
+            max_batch_size: flush as soon as this many items are pending
+            max_wait_ms: flush after waiting this long for the first item's batch to fill
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._flush_reasons = Counter()
+        self._items_processed = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue an item for the next batch and return a Future for its result"""
+        future = Future()
+        if not self._running:
+            future.set_exception(RuntimeError("Batcher has been stopped"))
+            return future
+        self._queue.put((item, future))
+        return future
+
+    def predict(self, item, timeout=None):
+        """Submit a single item and block until its result is available"""
+        return self.submit(item).result(timeout=timeout)
+
+    def queue_depth(self):
+        """Number of items waiting for a batch"""
+        return self._queue.qsize()
+
+    def stop(self, timeout=5.0):
+        """Flush pending items and stop the worker thread"""
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        """Worker loop: block for the first item, then fill the batch until full or timed out"""
+        stopping = False
+        while not stopping:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+
+            batch = [entry]
+            reason = "full"
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        entry = self._queue.get(timeout=remaining)
+                    else:
+                        entry = self._queue.get_nowait()
+                except queue.Empty:
+                    reason = "timeout"
+                    break
+                if entry is _STOP:
+                    reason = "shutdown"
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            self._process(batch, reason)
+
+    def _process(self, batch, reason):
+        """Record a collected batch and hand it on, skipping callers that gave up"""
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        with self._stats_lock:
+            self._batch_sizes[len(batch)] += 1
+            self._flush_reasons[reason] += 1
+            self._items_processed += len(batch)
+        self._execute(batch)
+
+    def _execute(self, batch):
+        """Run one batch through predict_fn and resolve each caller's future"""
+        try:
+            results = self.predict_fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"predict_fn returned {len(results)} results for {len(batch)} items"
+                )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def get_stats(self):
+        """Batch-size distribution and flush reasons for tuning the limits"""
+        with self._stats_lock:
+            sizes = dict(sorted(self._batch_sizes.items()))
+            reasons = dict(self._flush_reasons)
+            items = self._items_processed
+
+        batches = sum(sizes.values())
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": (items / batches) if batches else 0.0,
+            "p50_batch_size": _percentile(sizes, 0.50),
+            "p95_batch_size": _percentile(sizes, 0.95),
+            "batch_size_distribution": {str(size): count for size, count in sizes.items()},
+            "flush_reasons": reasons,
+            "queue_depth": self.queue_depth(),
+        }
+
+
+class _Stage:
+    """Bounded input queue, threads and busy-time accounting for one pipeline stage"""
+
+    def __init__(self, name, threads, queue_size):
+        self.name = name
+        self.threads = max(1, int(threads))
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.workers = []
+        self._lock = threading.Lock()
+        self.units = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+
+    def record(self, busy, blocked):
+        with self._lock:
+            self.units += 1
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+
+    def get_stats(self, running_seconds):
+        with self._lock:
+            units, busy, blocked = self.units, self.busy_seconds, self.blocked_seconds
+        return {
+            "threads": self.threads,
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "units": units,
+            "busy_s": busy,
+            "mean_busy_ms": busy / units * 1000.0 if units else 0.0,
+            # Share of the stage's thread time spent working since start
+            "utilization": busy / (running_seconds * self.threads) if running_seconds else 0.0,
+            # Time spent waiting for room in the next stage's queue
+            "blocked_downstream_s": blocked,
+        }
+
+
+class PipelinedBatcher(MicroBatcher):
+    """
+    MicroBatcher whose batches flow through three stages, each on its own threads:
+    prepare (e.g. tokenize and pad, one unit per length bucket), forward and finish
+    (e.g. softmax into per-item results). Bounded queues between the stages apply
+    backpressure, so the next batch is prepared while the model runs this one
+    """
+
+    def __init__(
+        self,
+        prepare_fn,
+        forward_fn,
+        finish_fn,
+        max_batch_size=16,
+        max_wait_ms=5.0,
+        prepare_threads=1,
+        queue_size=2,
+        name="moderation-pipeline",
+    ):
+        """
+        Args:
+            prepare_fn: list of items -> list of (indices, inputs) units covering every item
+            forward_fn: inputs -> outputs for one unit
+            finish_fn: outputs -> one result per index of the unit
+            prepare_threads: threads running prepare_fn concurrently
+            queue_size: units buffered ahead of each stage
+        """
+        self.prepare_fn = prepare_fn
+        self.forward_fn = forward_fn
+        self.finish_fn = finish_fn
+        self._started_at = time.monotonic()
+        self._collect_blocked = 0.0
+        prepare = _Stage("prepare", prepare_threads, queue_size)
+        forward = _Stage("forward", 1, queue_size)
+        finish = _Stage("finish", 1, queue_size)
+        self._stages = (prepare, forward, finish)
+
+        def fan_out(futures, units):
+            for indices, inputs in units:
+                forward.queue.put(([futures[index] for index in indices], inputs))
+
+        workers = (
+            (prepare, prepare_fn, fan_out),
+            (forward, forward_fn, lambda futures, outputs: finish.queue.put((futures, outputs))),
+            (finish, finish_fn, _resolve),
+        )
+        for stage, fn, emit in workers:
+            for index in range(stage.threads):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(stage, fn, emit),
+                    name=f"{name}-{stage.name}-{index}",
+                    daemon=True,
+                )
+                thread.start()
+                stage.workers.append(thread)
+        super().__init__(None, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, name=name)
+
+    def stop(self, timeout=5.0):
+        """Flush pending items through every stage and stop all threads"""
+        if not self._running:
+            return
+        super().stop(timeout)
+        for stage in self._stages:
+            for _ in stage.workers:
+                stage.queue.put(_STOP)
+            for worker in stage.workers:
+                worker.join(timeout)
+
+    def _execute(self, batch):
+        """Hand a collected batch to the prepare stage, waiting while it is full"""
+        started = time.perf_counter()
+        self._stages[0].queue.put(([future for _, future in batch], [item for item, _ in batch]))
+        with self._stats_lock:
+            self._collect_blocked += time.perf_counter() - started
+
+    def _work(self, stage, fn, emit):
+        """Stage thread: apply fn to each queued unit and pass the output on"""
+        while True:
+            unit = stage.queue.get()
+            if unit is _STOP:
+                return
+            futures, payload = unit
+            started = time.perf_counter()
+            try:
+                output = fn(payload)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                stage.record(time.perf_counter() - started, 0.0)
+                continue
+            finished = time.perf_counter()
+            try:
+                emit(futures, output)
+            except Exception as e:
+                # A failed hand-off must not kill the stage thread and strand later batches
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            stage.record(finished - started, time.perf_counter() - finished)
+
+    def get_stats(self):
+        """Batching stats plus per-stage queue depth and utilization"""
+        stats = super().get_stats()
+        running = time.monotonic() - self._started_at
+        stages = {stage.name: stage.get_stats(running) for stage in self._stages}
+        with self._stats_lock:
+            collect_blocked = self._collect_blocked
+        stats["pipeline"] = {
+            "collect_blocked_s": collect_blocked,
+            "stages": stages,
+            "bottleneck": max(stages, key=lambda name: stages[name]["utilization"]),
+        }
+        return stats
+
+
+def _resolve(futures, results):
+    """Finish stage output: one result per future"""
+    if len(results) != len(futures):
+        error = RuntimeError(f"finish_fn returned {len(results)} results for {len(futures)} items")
+        for future in futures:
+            future.set_exception(error)
+        return
+    for future, result in zip(futures, results):
+        future.set_result(result)
+
+
+def _percentile(histogram, fraction):
+    """Percentile of a {value: count} histogram (values sorted ascending)"""
+    total = sum(histogram.values())
+    if not total:
+        return 0
+    threshold = fraction * total
+    seen = 0
+    for value, count in histogram.items():
+        seen += count
+        if seen >= threshold:
+            return value
+    return max(histogram)
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the moderation service
+Builds a small stand-in BERT and a synthetic forum corpus, then measures:
+  latency:     sequential single-post requests through moderation_server (p50/p95/p99)
+  throughput:  sustained requests/s at several concurrency levels
+  cold start:  moderate_cli.py wall time and peak RSS per invocation
+  memory:      peak RSS of the server and its workers under load
+Results are printed (or written) as JSON so runs can be compared between commits
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+AUTOMOD_DIR = Path(__file__).parent
+
+# Caregiver-forum vocabulary for the synthetic corpus and the stand-in tokenizer
+FORUM_WORDS = """
+my mum dad mother father husband wife son daughter carer caring care home hospital
+doctor nurse gp appointment medication pills dose sleep night day week month year
+dementia alzheimers stroke cancer memory forgetting confused tired exhausted stressed
+guilty lonely worried anxious grateful thanks thank you so much for the help advice
+support group meeting respite service council benefits allowance form application
+does anyone know how to cope with when they what where is are was were have has had
+been being can could would should will not no yes it this that these those we i he
+she they them their our your a an and or but if then because about after before
+today yesterday tomorrow again still just really very quite always never sometimes
+good bad better worse hard easy long short new old first last next time people
+family friend neighbour house room bed bath food meal eat drink walk talk call
+hate stupid idiot useless pathetic disgusting shut up get lost nobody wants here
+""".split()
+
+# Phrases mixed into a small share of posts so some verdicts come out HATE-leaning
+HOSTILE_PHRASES = [
+    "you are a stupid idiot",
+    "shut up nobody wants you here",
+    "this is useless and so are you",
+    "get lost you pathetic people",
+]
+
+
+def build_stand_in_model(path, hidden_size=128, layers=2, seed=0):
+    """
+    Save a small randomly initialised BERT classifier and matching WordPiece
+    tokenizer to path (nothing is downloaded)
+    Returns: path
+    """
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+    os.makedirs(path, exist_ok=True)
+
+    specials = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    characters = list("abcdefghijklmnopqrstuvwxyz0123456789.,!?'")
+    vocab = specials + sorted(set(FORUM_WORDS)) + characters
+    vocab += ["##" + character for character in characters]
+    vocab_path = os.path.join(path, "vocab.txt")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(dict.fromkeys(vocab)))
+
+    tokenizer = BertTokenizerFast(vocab_path, do_lower_case=True)
+    config = BertConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        num_hidden_layers=layers,
+        num_attention_heads=max(1, hidden_size // 64),
+        intermediate_size=hidden_size * 4,
+        max_position_embeddings=512,
+        num_labels=2,
+    )
+    torch.manual_seed(seed)
+    BertForSequenceClassification(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return path
+
+
+def synthetic_corpus(count, seed=0, duplicate_rate=0.05, hostile_rate=0.05):
+    """
+    Forum posts with log-normal title and body lengths: titles ~8 words, bodies
+    ~60 words with a long tail past the 512-token window; a few posts have no body
+    """
+    rng = random.Random(seed)
+
+    def sentence(words):
+        return " ".join(rng.choice(FORUM_WORDS) for _ in range(words))
+
+    posts = []
+    for _ in range(count):
+        if posts and rng.random() < duplicate_rate:
+            posts.append(dict(rng.choice(posts)))
+            continue
+
+        title_words = max(1, min(25, int(rng.lognormvariate(2.0, 0.5))))
+        post = {"title": sentence(title_words).capitalize() + "?", "author": "benchmark"}
+        if rng.random() > 0.05:
+            body_words = max(1, min(1500, int(rng.lognormvariate(4.1, 0.9))))
+            body = sentence(body_words)
+            if rng.random() < hostile_rate:
+                body += " " + rng.choice(HOSTILE_PHRASES)
+            post["content"] = body.capitalize() + "."
+        posts.append(post)
+    return posts
+
+
+def percentiles(samples):
+    """p50/p95/p99/mean/max in milliseconds for latencies given in seconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+    return {
+        "count": len(ordered),
+        "p50_ms": rank(0.50) * 1000.0,
+        "p95_ms": rank(0.95) * 1000.0,
+        "p99_ms": rank(0.99) * 1000.0,
+        "mean_ms": sum(ordered) / len(ordered) * 1000.0,
+        "max_ms": ordered[-1] * 1000.0,
+    }
+
+
+def free_port():
+    """An unused localhost TCP port"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class ServerUnderTest:
+    """moderation_server.py in a subprocess, with RSS sampling of it and its workers"""
+
+    def __init__(self, env, port, startup_timeout=120.0):
+        self.env = env
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.startup_seconds = None
+        self.peak_rss_bytes = 0
+        self._sampling = False
+        self._sampler = None
+
+    def __enter__(self):
+        env = dict(self.env, MODERATION_SERVICE_PORT=str(self.port), API_HOST="127.0.0.1")
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, str(AUTOMOD_DIR / "moderation_server.py")],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        while time.perf_counter() - started < self.startup_timeout:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"moderation_server exited with code {self.process.returncode}")
+            try:
+                with urllib.request.urlopen(self.url + "/health", timeout=1):
+                    break
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.1)
+        else:
+            self.__exit__(None, None, None)
+            raise RuntimeError("moderation_server did not become healthy in time")
+        self.startup_seconds = time.perf_counter() - started
+
+        self._sampling = True
+        self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._sampling = False
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def moderate(self, post):
+        """POST one post; returns (seconds, HTTP status)"""
+        body = json.dumps(post).encode("utf-8")
+        request = urllib.request.Request(
+            self.url, data=body, headers={"Content-Type": "application/json"}
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = 0
+        return time.perf_counter() - started, status
+
+    def _sample_rss(self):
+        try:
+            import psutil
+        except ImportError:
+            return
+        try:
+            process = psutil.Process(self.process.pid)
+        except psutil.Error:
+            return
+        while self._sampling:
+            try:
+                rss = process.memory_info().rss
+                rss += sum(child.memory_info().rss for child in process.children())
+            except psutil.Error:
+                break
+            self.peak_rss_bytes = max(self.peak_rss_bytes, rss)
+            time.sleep(0.2)
+
+
+def measure_latency(server, posts, requests):
+    """Sequential single-post requests"""
+    latencies = []
+    errors = 0
+    for post in itertools.islice(itertools.cycle(posts), requests):
+        seconds, status = server.moderate(post)
+        if status == 200:
+            latencies.append(seconds)
+        else:
+            errors += 1
+    return dict(percentiles(latencies), errors=errors)
+
+
+def measure_throughput(server, posts, concurrency, duration):
+    """Closed-loop load: concurrency clients sending back-to-back for duration seconds"""
+    next_post = itertools.cycle(posts)
+    post_lock = threading.Lock()
+    latencies = []
+    statuses = {}
+    results_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            with post_lock:
+                post = next(next_post)
+            seconds, status = server.moderate(post)
+            with results_lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(seconds)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    elapsed = time.perf_counter() - started
+
+    return dict(
+        percentiles(latencies),
+        concurrency=concurrency,
+        duration_s=elapsed,
+        requests_per_s=len(latencies) / elapsed,
+        status_counts={str(status): count for status, count in sorted(statuses.items())},
+    )
+
+
+def measure_cli_cold_start(env, post, runs):
+    """Wall time and peak RSS of one-shot moderate_cli.py invocations"""
+    wall = []
+    peak_rss = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, str(AUTOMOD_DIR / "moderate_cli.py")],
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        process.stdin.write(json.dumps(post).encode("utf-8"))
+        process.stdin.close()
+        # wait4 gives this child's own rusage rather than the max over all children
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        wall.append(time.perf_counter() - started)
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        peak_rss.append(usage.ru_maxrss * scale)
+
+    return dict(
+        percentiles(wall),
+        runs=runs,
+        peak_rss_bytes=max(peak_rss, default=0),
+    )
+
+
+def environment_info(model_path):
+    """What the numbers were measured on"""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "model": model_path,
+    }
+    try:
+        import torch
+        import transformers
+
+        info["torch"] = torch.__version__
+        info["transformers"] = transformers.__version__
+    except ImportError:
+        pass
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=AUTOMOD_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_commit"] = None
+    return info
+
+
+def parse_env_overrides(pairs):
+    """KEY=VALUE strings from --env"""
+    overrides = {}
+    for pair in pairs:
+        key, separator, value = pair.partition("=")
+        if not separator:
+            raise SystemExit(f"--env expects KEY=VALUE, got {pair!r}")
+        overrides[key] = value
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the moderation service")
+    parser.add_argument("--model", help="Local model directory (default: build a stand-in)")
+    parser.add_argument("--posts", type=int, default=500, help="Synthetic corpus size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-requests", type=int, default=200)
+    parser.add_argument(
+        "--concurrency", default="1,4,16,64", help="Comma-separated client counts"
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--cli-runs", type=int, default=3)
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Keep the prediction cache on (default off, so every request runs inference)",
+    )
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Extra server/CLI setting, e.g. --env WORKER_PROCESSES=2 (repeatable)",
+    )
+    parser.add_argument(
+        "--skip", action="append", default=[], choices=["latency", "throughput", "cli"]
+    )
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="moderation-benchmark-")
+    model_path = args.model or build_stand_in_model(
+        os.path.join(work_dir, "stand-in-model"), seed=args.seed
+    )
+    posts = synthetic_corpus(args.posts, seed=args.seed)
+
+    # Offline, isolated from any local .env cache/store/shortcut tiers, unless overridden
+    env = dict(
+        os.environ,
+        MODEL=model_path,
+        MODEL_OFFLINE="true",
+        MODEL_CACHE_DIR=os.path.join(work_dir, "models"),
+        VERDICT_STORE_PATH="",
+        CACHE_MAX_ENTRIES=os.environ.get("CACHE_MAX_ENTRIES", "10000") if args.cache else "0",
+        # Every post reaches the backend being measured
+        PREFILTER_MODE="off",
+        NEAR_DUPLICATE_MODE="off",
+        MODERATION_IDLE_TIMEOUT="600",
+        LOG_LEVEL="WARNING",
+        PYTHONUNBUFFERED="1",
+    )
+    env.update(parse_env_overrides(args.env))
+
+    report = {
+        "environment": environment_info(model_path),
+        "settings": {
+            "posts": args.posts,
+            "seed": args.seed,
+            "cache": args.cache,
+            "overrides": parse_env_overrides(args.env),
+        },
+    }
+
+    try:
+        if not {"latency", "throughput"} <= set(args.skip):
+            with ServerUnderTest(env, free_port()) as server:
+                report["server_startup_s"] = server.startup_seconds
+                if "latency" not in args.skip:
+                    report["latency"] = measure_latency(server, posts, args.latency_requests)
+                if "throughput" not in args.skip:
+                    report["throughput"] = [
+                        measure_throughput(server, posts, int(level), args.duration)
+                        for level in args.concurrency.split(",")
+                    ]
+                report["server_peak_rss_bytes"] = server.peak_rss_bytes
+
+        if "cli" not in args.skip:
+            report["cli_cold_start"] = measure_cli_cold_start(env, posts[0], args.cli_runs)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
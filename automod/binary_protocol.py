@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Length-prefixed moderation protocol over a Unix domain socket
+For a same-host caller (the Node server) this skips TCP and HTTP parsing: one
+persistent connection carries many concurrent requests, each a frame tagged with
+a request id, and responses come back as frames with the same id in whatever
+order they finish
+
+Frame: 9-byte header (big-endian u32 payload length, u32 request id, u8 code)
+followed by a UTF-8 JSON payload
+    request code: flag bits FLAG_BATCH (payload is a list of posts) and
+        FLAG_ECHO_TEXT (keep the input text in each prediction)
+    response code: STATUS_OK, STATUS_BUSY (at the in-flight cap, retry later)
+        or STATUS_ERROR (payload is {"error": ...}; single posts fail open)
+"""
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ModerationConfig
+from metrics import REGISTRY
+from moderationService import without_text
+from structured_logging import get_logger
+
+HEADER = struct.Struct(">IIB")
+FLAG_BATCH = 0x01
+FLAG_ECHO_TEXT = 0x02
+STATUS_OK = 0
+STATUS_BUSY = 1
+STATUS_ERROR = 2
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+logger = get_logger("socket")
+
+
+def encode_frame(request_id, code, payload):
+    """Header and payload bytes of one frame"""
+    return HEADER.pack(len(payload), request_id, code), payload
+
+
+def read_frame(stream):
+    """
+    Next (request_id, code, payload) from a buffered binary stream, or None at EOF
+    The payload is read straight into one preallocated buffer
+    """
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    length, request_id, code = HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {length} bytes exceeds {MAX_FRAME_BYTES}")
+    payload = bytearray(length)
+    view = memoryview(payload)
+    received = 0
+    while received < length:
+        count = stream.readinto(view[received:])
+        if not count:
+            return None
+        received += count
+    return request_id, code, payload
+
+
+class FramedModerationHandler(socketserver.StreamRequestHandler):
+    """One persistent connection; frames are moderated concurrently on a shared pool"""
+
+    def setup(self):
+        super().setup()
+        self._send_lock = threading.Lock()
+
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                frame = read_frame(self.rfile)
+            except (OSError, ValueError) as e:
+                logger.warning("Closing moderation socket connection: %s", e)
+                return
+            if frame is None:
+                return
+            request_id, code, payload = frame
+
+            limiter = server.http_server.limiter
+            if not limiter.try_acquire():
+                self.send(request_id, STATUS_BUSY, b"{}")
+                continue
+            server.executor.submit(self.moderate, request_id, code, payload)
+
+    def moderate(self, request_id, code, payload):
+        """Score one frame and answer it; runs on the server's executor"""
+        http_server = self.server.http_server
+        try:
+            with REGISTRY.stage("parse"):
+                data = json.loads(payload)
+            items = data if code & FLAG_BATCH else [data]
+            if not isinstance(items, list):
+                raise ValueError("Expected a list of posts")
+            if len(items) > ModerationConfig.BATCH_MAX_ITEMS:
+                raise ValueError(
+                    f"Too many items ({len(items)}), limit is {ModerationConfig.BATCH_MAX_ITEMS}"
+                )
+
+            # Held so a hot reload can't retire the model while this frame uses it
+            moderator = http_server.hold_moderator()
+            try:
+                results = http_server.moderate(moderator, items)
+            finally:
+                moderator.release_hold()
+            if not code & FLAG_ECHO_TEXT:
+                results = [without_text(result) for result in results]
+            with REGISTRY.stage("serialize"):
+                body = json.dumps(results if code & FLAG_BATCH else results[0]).encode("utf-8")
+            self.send(request_id, STATUS_OK, body)
+        except Exception as e:
+            REGISTRY.inc("moderation_requests_total", outcome="error")
+            error = {"allowed": True, "error": str(e), "reason": "Moderation service error"}
+            self.send(request_id, STATUS_ERROR, json.dumps(error).encode("utf-8"))
+        finally:
+            http_server.limiter.release()
+
+    def send(self, request_id, code, payload):
+        """Write one frame; responses from concurrent frames are serialized per connection"""
+        header, body = encode_frame(request_id, code, payload)
+        try:
+            with self._send_lock:
+                self.connection.sendmsg([header, body])
+        except OSError:
+            # The client went away; nothing left to answer
+            pass
+
+
+class FramedModerationServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket front end sharing the HTTP server's moderator, limits and shadowing"""
+
+    daemon_threads = True
+
+    def __init__(self, path, http_server, max_workers):
+        """
+        Args:
+            path: socket file (a stale one is replaced; created mode 0600)
+            http_server: ModerationServer whose moderate() and limiter are used
+            max_workers: threads moderating frames concurrently
+        """
+        self.path = path
+        self.http_server = http_server
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="socket")
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, FramedModerationHandler)
+        os.chmod(path, 0o600)
+
+    def start(self):
+        """Serve on a background thread"""
+        threading.Thread(target=self.serve_forever, name="moderation-socket", daemon=True).start()
+
+    def stop(self):
+        """Stop accepting, let queued frames finish and remove the socket file"""
+        self.shutdown()
+        self.server_close()
+        self.executor.shutdown(wait=True)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def unix_sockets_supported():
+    return hasattr(socket, "AF_UNIX")
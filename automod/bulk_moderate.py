@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Resumable bulk moderation of an exported post corpus
+Streams a JSONL or CSV export, moderates it in large batches with the same
+ContentModerator the online service uses (across a forked worker pool when
+--workers > 1) and appends verdicts to a JSONL or CSV output in input order.
+Progress is checkpointed after every written batch, so rerunning the same
+command after an interruption continues where it stopped.
+
+  python3 bulk_moderate.py posts.jsonl verdicts.jsonl --workers 4
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add the automod directory to Python path
+sys.path.append(str(Path(__file__).parent))
+
+from config import ModerationConfig
+from moderationService import get_moderator, without_text
+
+CSV_FIELDS = [
+    "index",
+    "id",
+    "allowed",
+    "blocked_reason",
+    "overall_confidence",
+    "title_label",
+    "title_confidence",
+    "content_label",
+    "content_confidence",
+    "error",
+]
+
+
+def input_format(path, requested):
+    """jsonl or csv, from --format or the file extension"""
+    if requested:
+        return requested
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def read_records(path, fmt, start_offset, skip_records):
+    """
+    Yield (record, offset) pairs; offset is the input byte position after the record
+    JSONL resumes by seeking to start_offset; CSV (whose quoted fields may span
+    lines) re-reads and skips the first skip_records rows
+    """
+    if fmt == "jsonl":
+        with open(path, "rb") as source:
+            source.seek(start_offset)
+            offset = start_offset
+            for line in source:
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    record = {"_invalid": f"Invalid JSON: {e}"}
+                yield record, offset
+        return
+
+    with open(path, "rb") as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        for position, row in enumerate(csv.DictReader(text)):
+            if position < skip_records:
+                continue
+            # Position of the underlying reader; a chunk ahead of the row, fine for ETA
+            yield row, raw.tell()
+
+
+def record_id(record, id_field, index):
+    """Caller's id for a record, falling back to its position in the input"""
+    if isinstance(record, dict):
+        fields = [id_field] if id_field else ["_id", "id"]
+        for field in fields:
+            if record.get(field) not in (None, ""):
+                return record[field]
+    return index
+
+
+def batches(records, batch_size):
+    """Group (record, offset) pairs into lists of batch_size"""
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def moderate_batch(records):
+    """Verdicts for one batch, exactly as the online path would produce them"""
+    posts = [
+        record if isinstance(record, dict) and "_invalid" not in record else None
+        for record in records
+    ]
+    valid = [post for post in posts if post is not None]
+    results = iter(get_moderator().moderate_contents(valid) if valid else [])
+    return [
+        next(results) if post is not None else {"allowed": True, "error": invalid_reason(record)}
+        for post, record in zip(posts, records)
+    ]
+
+
+def invalid_reason(record):
+    """Error recorded for a line that isn't a post object"""
+    if isinstance(record, dict):
+        return record["_invalid"]
+    return "Record is not an object"
+
+
+class VerdictWriter:
+    """Appends verdicts as JSONL or CSV rows and reports the durable byte offset"""
+
+    def __init__(self, path, offset, echo_text):
+        self.fmt = "csv" if path.lower().endswith(".csv") else "jsonl"
+        self.echo_text = echo_text
+        # Anything after the last checkpoint is from an interrupted batch; drop it
+        mode = "r+" if os.path.exists(path) else "w"
+        self.file = open(path, mode, encoding="utf-8", newline="")
+        self.file.seek(offset)
+        self.file.truncate()
+        self.csv = None
+        if self.fmt == "csv":
+            self.csv = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+            if offset == 0:
+                self.csv.writeheader()
+
+    def write(self, index, identifier, result):
+        if self.csv is None:
+            if not self.echo_text:
+                result = without_text(result)
+            self.file.write(json.dumps({"index": index, "id": identifier, **result}) + "\n")
+            return
+        predictions = result.get("predictions") or {}
+        row = {
+            "index": index,
+            "id": identifier,
+            "allowed": result.get("allowed"),
+            "blocked_reason": result.get("blocked_reason") or "",
+            "overall_confidence": result.get("overall_confidence", ""),
+            "error": result.get("error") or "",
+        }
+        for field in ("title", "content"):
+            prediction = predictions.get(field) or {}
+            row[f"{field}_label"] = prediction.get("label", "")
+            row[f"{field}_confidence"] = prediction.get("confidence", "")
+        self.csv.writerow(row)
+
+    def commit(self):
+        """Flush to disk; returns the offset a resumed run restarts from"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def load_checkpoint(path, input_path, restart):
+    """Saved progress for this input, or a fresh start"""
+    fresh = {
+        "input": os.path.abspath(input_path),
+        "records_done": 0,
+        "input_offset": 0,
+        "output_offset": 0,
+        "blocked": 0,
+        "errors": 0,
+        "elapsed_s": 0.0,
+    }
+    if restart or not os.path.exists(path):
+        return fresh
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input") != fresh["input"]:
+        raise SystemExit(
+            f"Checkpoint {path} belongs to {checkpoint.get('input')}; use --restart to start over"
+        )
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    """Write the checkpoint atomically so a crash never leaves half of one"""
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+
+def run(args):
+    fmt = input_format(args.input, args.format)
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    checkpoint = load_checkpoint(checkpoint_path, args.input, args.restart)
+    if checkpoint["records_done"]:
+        print(
+            f"Resuming after {checkpoint['records_done']} records "
+            f"({format_duration(checkpoint['elapsed_s'])} elapsed so far)",
+            file=sys.stderr,
+        )
+
+    moderator = get_moderator()
+    if not moderator.load_model():
+        raise SystemExit("Failed to load the moderation model")
+    if args.workers > 1:
+        moderator.enable_worker_pool(args.workers, max_batch_size=ModerationConfig.BATCH_MAX_SIZE)
+
+    total_bytes = os.path.getsize(args.input)
+    records = read_records(args.input, fmt, checkpoint["input_offset"], checkpoint["records_done"])
+    writer = VerdictWriter(args.output, checkpoint["output_offset"], args.echo_text)
+    started = time.monotonic()
+    elapsed_before = checkpoint["elapsed_s"]
+    done_at_start = checkpoint["records_done"]
+    start_offset = checkpoint["input_offset"]
+    last_report = started
+
+    # Several batches in flight keep every worker busy; results are written in order
+    in_flight = max(1, args.workers) * 2
+    pending = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=in_flight) as executor:
+            batch_source = batches(records, args.batch_size)
+            while True:
+                while len(pending) < in_flight:
+                    batch = next(batch_source, None)
+                    if batch is None:
+                        break
+                    future = executor.submit(moderate_batch, [record for record, _ in batch])
+                    pending.append((batch, future))
+                if not pending:
+                    break
+
+                batch, future = pending.popleft()
+                results = future.result()
+                for (record, _), result in zip(batch, results):
+                    index = checkpoint["records_done"]
+                    writer.write(index, record_id(record, args.id_field, index), result)
+                    checkpoint["records_done"] += 1
+                    checkpoint["blocked"] += 0 if result.get("allowed", True) else 1
+                    checkpoint["errors"] += 1 if result.get("error") else 0
+
+                checkpoint["input_offset"] = batch[-1][1]
+                checkpoint["output_offset"] = writer.commit()
+                checkpoint["elapsed_s"] = elapsed_before + time.monotonic() - started
+                save_checkpoint(checkpoint_path, checkpoint)
+
+                now = time.monotonic()
+                if now - last_report >= args.progress_interval:
+                    last_report = now
+                    report_progress(checkpoint, done_at_start, start_offset, now - started, total_bytes)
+    except KeyboardInterrupt:
+        print(
+            f"\nInterrupted after {checkpoint['records_done']} records; "
+            "rerun the same command to resume",
+            file=sys.stderr,
+        )
+        return 130
+    finally:
+        writer.close()
+        moderator.disable_worker_pool()
+
+    elapsed = time.monotonic() - started
+    report_progress(checkpoint, done_at_start, start_offset, elapsed, total_bytes)
+    print(
+        json.dumps(
+            {
+                "records": checkpoint["records_done"],
+                "blocked": checkpoint["blocked"],
+                "errors": checkpoint["errors"],
+                "elapsed_s": round(checkpoint["elapsed_s"], 2),
+                "output": args.output,
+            }
+        )
+    )
+    return 0
+
+
+def report_progress(checkpoint, done_at_start, start_offset, elapsed, total_bytes):
+    """records, posts/s and ETA, both from this run's progress through the input bytes"""
+    processed = checkpoint["records_done"] - done_at_start
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    offset = checkpoint["input_offset"]
+    fraction = offset / total_bytes if total_bytes else 1.0
+    eta = "?"
+    if offset > start_offset and elapsed > 0:
+        bytes_per_second = (offset - start_offset) / elapsed
+        eta = format_duration((total_bytes - offset) / bytes_per_second)
+    print(
+        f"{checkpoint['records_done']} records ({fraction:.1%}), {rate:.1f} posts/s, "
+        f"{checkpoint['blocked']} blocked, ETA {eta}",
+        file=sys.stderr,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moderate an exported post corpus in bulk")
+    parser.add_argument("input", help="JSONL or CSV export with title/content fields")
+    parser.add_argument("output", help="verdicts file (.jsonl or .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="input format (default: by extension)")
+    parser.add_argument("--batch-size", type=int, default=256, help="posts per batch (default: 256)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=max(1, ModerationConfig.WORKER_PROCESSES),
+        help="forked inference processes (default: WORKER_PROCESSES)",
+    )
+    parser.add_argument("--id-field", help="record field copied to each verdict (default: _id or id)")
+    parser.add_argument("--checkpoint", help="progress file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start over")
+    parser.add_argument("--echo-text", action="store_true", help="keep input text in JSONL verdicts")
+    parser.add_argument(
+        "--progress-interval", type=float, default=5.0, help="seconds between progress lines"
+    )
+    args = parser.parse_args()
+    if args.batch_size < 1 or args.workers < 1:
+        parser.error("--batch-size and --workers must be at least 1")
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
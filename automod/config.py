@@ -2,12 +2,49 @@
 """
 Production configuration for auto-moderation service
 """
+import json
 import os
 from dotenv import load_dotenv
 
+# Tunable settings a process loaded from .env, passed to the processes it starts
+# (which inherit them as ordinary environment variables) as {name: value}
+DOTENV_SETTINGS_VAR = "MODERATION_DOTENV_SETTINGS"
+
+
+def _explicit_env():
+    """
+    Variables set by the process environment rather than .env, here or in the
+    launching process; a tuning profile never overrides these
+    A setting inherited from a parent's .env counts only while it still has the
+    value the parent loaded
+    """
+    inherited = json.loads(os.environ.get(DOTENV_SETTINGS_VAR) or "{}")
+    return frozenset(name for name, value in os.environ.items() if inherited.get(name) != value)
+
+
+_EXPLICIT_ENV = _explicit_env()
+
 # Load environment variables
 load_dotenv()
 
+# Settings a tuning profile written by autotune.py may set
+TUNABLE_SETTINGS = (
+    "MODERATION_BACKEND",
+    "TORCH_THREADS",
+    "TORCH_INTEROP_THREADS",
+    "BATCH_MAX_SIZE",
+    "BATCH_MAX_WAIT_MS",
+    "MAX_SEQUENCE_LENGTH",
+)
+
+os.environ[DOTENV_SETTINGS_VAR] = json.dumps(
+    {
+        name: os.environ[name]
+        for name in TUNABLE_SETTINGS
+        if name in os.environ and name not in _EXPLICIT_ENV
+    }
+)
+
 
 class ModerationConfig:
     """Configuration class for moderation service"""
@@ -16,19 +53,155 @@ class ModerationConfig:
     MODEL_NAME = os.getenv("MODEL", "irlab-udc/MetaHateBERT")
     HATE_THRESHOLD = float(os.getenv("HATE_THRESHOLD", "0.7"))
 
+    # Inference backend: eager (fp32 PyTorch), int8 (dynamic quantization) or onnx
+    MODERATION_BACKEND = os.getenv("MODERATION_BACKEND", "eager").lower()
+    MODEL_CACHE_DIR = os.getenv(
+        "MODEL_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+    )
+
+    # Cold start: load only from local files (a snapshot made with
+    # `model_tools.py snapshot` is used automatically when present)
+    MODEL_OFFLINE = os.getenv("MODEL_OFFLINE", "false").lower() == "true"
+    MODEL_REVISION = os.getenv("MODEL_REVISION", "")  # commit pinned by `snapshot`
+    WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() == "true"
+
     # Service configuration
     ENABLE_MODERATION = os.getenv("ENABLE_MODERATION", "true").lower() == "true"
     SERVICE_PORT = int(os.getenv("MODERATION_SERVICE_PORT", "8001"))
     IDLE_TIMEOUT = int(os.getenv("MODERATION_IDLE_TIMEOUT", "30"))  # minutes
+    # What an idle server does: "exit", or "warm" (free the model, keep the port,
+    # reload in the background when a request next needs inference)
+    IDLE_MODE = os.getenv("MODERATION_IDLE_MODE", "exit").lower()
+    # How long a request waits for a warm reload before failing open
+    IDLE_RELOAD_WAIT_SECONDS = float(os.getenv("IDLE_RELOAD_WAIT_SECONDS", "30"))
+    # How long shutdown waits for in-flight requests to finish
+    SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "10"))
 
-    # Logging configuration
-    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
-    LOG_FILE = os.getenv("LOG_FILE", "moderation.log")
+    # Logging configuration: JSON lines written by a background thread, size-rotated
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+    LOG_FILE = os.getenv("LOG_FILE", "/tmp/moderation.log")
+    LOG_MAX_MB = float(os.getenv("LOG_MAX_MB", "10"))
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "3"))
+    # Fraction of successful requests written to the access log (errors always are)
+    ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "0.01"))
 
     # Performance configuration
+    # Characters of each text kept in truncate mode (see LONG_TEXT_MODE)
     MAX_TEXT_LENGTH = int(os.getenv("MAX_TEXT_LENGTH", "2048"))
+    # Seconds an HTTP connection may stall while sending a request before it is closed
     REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "10"))  # seconds
 
+    # Torch threads for in-process inference (0 = torch default; workers use
+    # WORKER_TORCH_THREADS)
+    TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0"))
+    TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+
+    # Machine-specific profile written by `autotune.py`, applied by the server at
+    # startup; it overrides .env values and defaults but not the process environment
+    TUNING_PROFILE = os.getenv(
+        "TUNING_PROFILE",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "tuning_profile.json"),
+    )
+
+    # Sequence length cap in tokens (512 is the model maximum)
+    MAX_SEQUENCE_LENGTH = int(os.getenv("MAX_SEQUENCE_LENGTH", "512"))
+
+    # Length-bucketed padding: each batch is split into buckets of similar token length
+    PADDING_BUCKETS = os.getenv("PADDING_BUCKETS", "true").lower() == "true"
+    BUCKET_LENGTH_RATIO = float(os.getenv("BUCKET_LENGTH_RATIO", "1.5"))
+    BUCKET_MIN_GAP_TOKENS = int(os.getenv("BUCKET_MIN_GAP_TOKENS", "32"))
+    MAX_BATCH_TOKENS = int(os.getenv("MAX_BATCH_TOKENS", "16384"))  # 0 = unlimited
+
+    # Long posts: "truncate" scores the first 512 tokens, "chunk" scores overlapping
+    # 512-token windows and combines them with CHUNK_AGGREGATION (max or mean)
+    LONG_TEXT_MODE = os.getenv("LONG_TEXT_MODE", "truncate").lower()
+    CHUNK_AGGREGATION = os.getenv("CHUNK_AGGREGATION", "max").lower()
+    CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+    CHUNK_MAX_WINDOWS = int(os.getenv("CHUNK_MAX_WINDOWS", "16"))
+
+    # Edit-aware re-moderation (POST /moderate/edit): post bodies are split into
+    # paragraph/sentence segments of up to SEGMENT_MAX_CHARS and only changed
+    # segments are re-scored; segment scores of EDIT_TRACKER_MAX_POSTS recent
+    # post versions are kept in memory (0 disables reuse)
+    SEGMENT_MAX_CHARS = int(os.getenv("SEGMENT_MAX_CHARS", "1200"))
+    EDIT_TRACKER_MAX_POSTS = int(os.getenv("EDIT_TRACKER_MAX_POSTS", "10000"))
+
+    # Asynchronous jobs (POST /jobs, GET /jobs/<id>): durable SQLite queue, "" disables
+    JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "")
+    JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "32"))
+    JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+    JOB_WEBHOOK_URL = os.getenv("JOB_WEBHOOK_URL", "")  # POSTed each finished job
+
+    # Pre-filter tier: "on" answers confidently benign texts (emoji/numbers/links,
+    # short allowlisted replies) without the model, "audit" also scores them with
+    # the model to measure disagreement, "off" sends everything to the model
+    PREFILTER_MODE = os.getenv("PREFILTER_MODE", "off").lower()
+    PREFILTER_DENYLIST_PATH = os.getenv("PREFILTER_DENYLIST_PATH") or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "server",
+        "utils",
+        "bannedWords.js",
+    )
+    PREFILTER_ALLOWLIST_PATH = os.getenv("PREFILTER_ALLOWLIST_PATH", "")  # "" = built-in list
+    PREFILTER_MAX_WORDS = int(os.getenv("PREFILTER_MAX_WORDS", "4"))
+    PREFILTER_BENIGN_CONFIDENCE = float(os.getenv("PREFILTER_BENIGN_CONFIDENCE", "0.99"))
+
+    # Concurrency configuration: requests beyond the cap get 503 + Retry-After
+    MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "64"))
+    RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+
+    # Admission control: an AIMD limit on concurrent inference adapts to the latency
+    # target; requests over it are answered from the cache, then the pre-filter,
+    # then fail open with an X-Moderation-Degraded header
+    ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "false").lower() == "true"
+    ADMISSION_INITIAL_LIMIT = int(os.getenv("ADMISSION_INITIAL_LIMIT", "8"))
+    ADMISSION_MIN_LIMIT = int(os.getenv("ADMISSION_MIN_LIMIT", "1"))
+    ADMISSION_TARGET_LATENCY_MS = float(os.getenv("ADMISSION_TARGET_LATENCY_MS", "500"))
+
+    # Unix socket for the framed binary protocol (see binary_protocol.py); empty disables
+    SOCKET_PATH = os.getenv("MODERATION_SOCKET_PATH", "")
+    # Whether predictions repeat the input text; callers can override per request
+    ECHO_TEXT = os.getenv("ECHO_TEXT", "true").lower() == "true"
+
+    # Admin endpoints (/admin/reload, /admin/shadow): X-Admin-Token must match when
+    # set; when empty only local clients may use them
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+    # Sampled requests buffered for a shadow model before further samples are skipped
+    SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "256"))
+
+    # Near-duplicate reuse: lightly edited copies of a recently scored text (SimHash
+    # within NEAR_DUPLICATE_MAX_DISTANCE bits) reuse its verdict. "blocked" only
+    # fast-tracks copies of blocked texts, "all" also reuses benign verdicts
+    NEAR_DUPLICATE_MODE = os.getenv("NEAR_DUPLICATE_MODE", "off").lower()
+    NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "3"))
+    NEAR_DUPLICATE_MIN_TOKENS = int(os.getenv("NEAR_DUPLICATE_MIN_TOKENS", "5"))
+    NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "50000"))
+    NEAR_DUPLICATE_TTL_SECONDS = int(os.getenv("NEAR_DUPLICATE_TTL_SECONDS", "3600"))
+
+    # Worker pool configuration (WORKER_PROCESSES=1 serves in-process)
+    WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+    WORKER_TORCH_THREADS = int(os.getenv("WORKER_TORCH_THREADS", "0"))  # 0 = cores / workers
+
+    # Batching configuration: max texts per forward pass (1 disables micro-batching)
+    BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+    BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))  # milliseconds
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "256"))  # posts per POST /batch
+
+    # Pipelined inference: tokenize, forward and post-process batches on separate
+    # threads with PIPELINE_QUEUE_SIZE batches buffered between stages
+    INFERENCE_PIPELINE = os.getenv("INFERENCE_PIPELINE", "false").lower() == "true"
+    PIPELINE_TOKENIZER_THREADS = int(os.getenv("PIPELINE_TOKENIZER_THREADS", "1"))
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
+
+    # Result cache: probabilities keyed by model + normalized text (0 entries disables)
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+    CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "0"))  # 0 = no expiry
+    CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", "64"))  # 0 = no memory cap
+
+    # Persistent verdict store shared by the server, CLI and library (empty path disables)
+    VERDICT_STORE_PATH = os.getenv("VERDICT_STORE_PATH", "")
+    VERDICT_STORE_MAX_ENTRIES = int(os.getenv("VERDICT_STORE_MAX_ENTRIES", "200000"))
+
     # Security configuration
     ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
 
@@ -40,22 +213,172 @@ class ModerationConfig:
         if not 0.0 <= cls.HATE_THRESHOLD <= 1.0:
             errors.append("HATE_THRESHOLD must be between 0.0 and 1.0")
 
+        if cls.MODERATION_BACKEND not in ("eager", "int8", "onnx"):
+            errors.append("MODERATION_BACKEND must be one of: eager, int8, onnx")
+
         if cls.SERVICE_PORT < 1024 or cls.SERVICE_PORT > 65535:
             errors.append("SERVICE_PORT must be between 1024 and 65535")
 
         if cls.IDLE_TIMEOUT < 1:
             errors.append("IDLE_TIMEOUT must be at least 1 minute")
 
+        if cls.IDLE_MODE not in ("exit", "warm"):
+            errors.append("MODERATION_IDLE_MODE must be 'exit' or 'warm'")
+
+        if cls.IDLE_RELOAD_WAIT_SECONDS <= 0 or cls.SHUTDOWN_DRAIN_SECONDS < 0:
+            errors.append(
+                "IDLE_RELOAD_WAIT_SECONDS must be positive and SHUTDOWN_DRAIN_SECONDS non-negative"
+            )
+
+        if not 16 <= cls.MAX_SEQUENCE_LENGTH <= 512:
+            errors.append("MAX_SEQUENCE_LENGTH must be between 16 and 512")
+
+        if cls.BUCKET_LENGTH_RATIO < 1.0:
+            errors.append("BUCKET_LENGTH_RATIO must be at least 1.0")
+
+        if not 0.0 <= cls.ACCESS_LOG_SAMPLE_RATE <= 1.0:
+            errors.append("ACCESS_LOG_SAMPLE_RATE must be between 0.0 and 1.0")
+
+        if cls.LOG_MAX_MB <= 0 or cls.LOG_BACKUP_COUNT < 0:
+            errors.append("LOG_MAX_MB must be positive and LOG_BACKUP_COUNT non-negative")
+
+        if not 1 <= cls.ADMISSION_MIN_LIMIT <= cls.ADMISSION_INITIAL_LIMIT <= cls.MAX_IN_FLIGHT:
+            errors.append(
+                "Admission limits must satisfy 1 <= ADMISSION_MIN_LIMIT <= "
+                "ADMISSION_INITIAL_LIMIT <= MAX_IN_FLIGHT"
+            )
+
+        if cls.ADMISSION_TARGET_LATENCY_MS <= 0:
+            errors.append("ADMISSION_TARGET_LATENCY_MS must be positive")
+
+        if cls.NEAR_DUPLICATE_MODE not in ("off", "blocked", "all"):
+            errors.append("NEAR_DUPLICATE_MODE must be one of: off, blocked, all")
+
+        if not 0 <= cls.NEAR_DUPLICATE_MAX_DISTANCE < 16:
+            errors.append("NEAR_DUPLICATE_MAX_DISTANCE must be between 0 and 15")
+
+        if cls.NEAR_DUPLICATE_MAX_ENTRIES < 1 or cls.NEAR_DUPLICATE_TTL_SECONDS < 0:
+            errors.append(
+                "NEAR_DUPLICATE_MAX_ENTRIES must be positive and NEAR_DUPLICATE_TTL_SECONDS "
+                "non-negative"
+            )
+
+        if cls.SHADOW_MAX_PENDING < 1:
+            errors.append("SHADOW_MAX_PENDING must be at least 1")
+
+        if cls.JOB_BATCH_SIZE < 1:
+            errors.append("JOB_BATCH_SIZE must be at least 1")
+
+        if cls.PREFILTER_MODE not in ("off", "on", "audit"):
+            errors.append("PREFILTER_MODE must be 'off', 'on' or 'audit'")
+
+        if not 0.5 < cls.PREFILTER_BENIGN_CONFIDENCE <= 1.0:
+            errors.append("PREFILTER_BENIGN_CONFIDENCE must be between 0.5 and 1.0")
+
+        if cls.LONG_TEXT_MODE not in ("truncate", "chunk"):
+            errors.append("LONG_TEXT_MODE must be 'truncate' or 'chunk'")
+
+        if cls.CHUNK_AGGREGATION not in ("max", "mean"):
+            errors.append("CHUNK_AGGREGATION must be 'max' or 'mean'")
+
+        if not 0 <= cls.CHUNK_OVERLAP_TOKENS < cls.MAX_SEQUENCE_LENGTH // 2:
+            errors.append("CHUNK_OVERLAP_TOKENS must be less than half of MAX_SEQUENCE_LENGTH")
+
+        if cls.CHUNK_MAX_WINDOWS < 1:
+            errors.append("CHUNK_MAX_WINDOWS must be at least 1")
+
+        if cls.SEGMENT_MAX_CHARS < 1 or cls.EDIT_TRACKER_MAX_POSTS < 0:
+            errors.append(
+                "SEGMENT_MAX_CHARS must be positive and EDIT_TRACKER_MAX_POSTS non-negative"
+            )
+
+        if cls.MAX_IN_FLIGHT < 1:
+            errors.append("MAX_IN_FLIGHT must be at least 1")
+
+        if cls.WORKER_PROCESSES < 1:
+            errors.append("WORKER_PROCESSES must be at least 1")
+
+        if cls.WORKER_PROCESSES > 1 and cls.MODERATION_BACKEND == "onnx":
+            # An ONNX Runtime session's thread pools don't survive fork()
+            errors.append("WORKER_PROCESSES must be 1 with MODERATION_BACKEND=onnx")
+
+        if cls.WORKER_TORCH_THREADS < 0:
+            errors.append("WORKER_TORCH_THREADS must not be negative")
+
+        if cls.BATCH_MAX_SIZE < 1:
+            errors.append("BATCH_MAX_SIZE must be at least 1")
+
+        if cls.BATCH_MAX_WAIT_MS < 0:
+            errors.append("BATCH_MAX_WAIT_MS must not be negative")
+
+        if cls.TORCH_THREADS < 0 or cls.TORCH_INTEROP_THREADS < 0:
+            errors.append("TORCH_THREADS and TORCH_INTEROP_THREADS must not be negative")
+
+        if cls.MAX_TEXT_LENGTH < 1 or cls.REQUEST_TIMEOUT < 1:
+            errors.append("MAX_TEXT_LENGTH and REQUEST_TIMEOUT must be at least 1")
+
+        if cls.PIPELINE_TOKENIZER_THREADS < 1 or cls.PIPELINE_QUEUE_SIZE < 1:
+            errors.append("PIPELINE_TOKENIZER_THREADS and PIPELINE_QUEUE_SIZE must be at least 1")
+
+        if cls.BATCH_MAX_ITEMS < 1:
+            errors.append("BATCH_MAX_ITEMS must be at least 1")
+
+        if cls.CACHE_MAX_ENTRIES < 0:
+            errors.append("CACHE_MAX_ENTRIES must not be negative")
+
+        if cls.CACHE_TTL_SECONDS < 0 or cls.CACHE_MAX_MB < 0:
+            errors.append("CACHE_TTL_SECONDS and CACHE_MAX_MB must not be negative")
+
+        if cls.VERDICT_STORE_MAX_ENTRIES < 1:
+            errors.append("VERDICT_STORE_MAX_ENTRIES must be at least 1")
+
         return errors
 
+    @classmethod
+    def apply_tuning_profile(cls, path=None):
+        """
+        Apply the settings of a profile written by autotune.py (TUNING_PROFILE by
+        default), skipping any set explicitly in the process environment
+        Returns: {setting: value} actually applied ({} without a profile)
+        """
+        path = cls.TUNING_PROFILE if path is None else path
+        if not path or not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+
+        applied = {}
+        for name, value in profile.get("settings", {}).items():
+            if name not in TUNABLE_SETTINGS or name in _EXPLICIT_ENV:
+                continue
+            value = type(getattr(cls, name))(value)
+            setattr(cls, name, value)
+            applied[name] = value
+        return applied
+
     @classmethod
     def get_summary(cls):
         """Get configuration summary for logging"""
         return {
             "model": cls.MODEL_NAME,
             "threshold": cls.HATE_THRESHOLD,
+            "backend": cls.MODERATION_BACKEND,
             "enabled": cls.ENABLE_MODERATION,
             "port": cls.SERVICE_PORT,
             "timeout": cls.IDLE_TIMEOUT,
+            "idle_mode": cls.IDLE_MODE,
             "log_level": cls.LOG_LEVEL,
+            "long_text_mode": cls.LONG_TEXT_MODE,
+            "max_in_flight": cls.MAX_IN_FLIGHT,
+            "admission_control": cls.ADMISSION_CONTROL,
+            "near_duplicates": cls.NEAR_DUPLICATE_MODE,
+            "worker_processes": cls.WORKER_PROCESSES,
+            "batch_max_size": cls.BATCH_MAX_SIZE,
+            "batch_max_wait_ms": cls.BATCH_MAX_WAIT_MS,
+            "torch_threads": cls.TORCH_THREADS,
+            "inference_pipeline": cls.INFERENCE_PIPELINE,
+            "cache_max_entries": cls.CACHE_MAX_ENTRIES,
+            "verdict_store": cls.VERDICT_STORE_PATH or None,
+            "prefilter": cls.PREFILTER_MODE,
+            "job_queue": cls.JOB_QUEUE_PATH or None,
         }
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Per-post segment scores for incremental re-moderation of edited posts
+Post bodies are split into stable segments (paragraphs, with long paragraphs
+packed sentence by sentence); when a post is edited only the segments whose text
+changed need the model, the rest reuse the probabilities kept from the previous
+version
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from prediction_cache import normalize_text
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_segments(text, max_chars):
+    """
+    Paragraphs of text; paragraphs longer than max_chars are packed into runs of
+    whole sentences up to max_chars (a single longer sentence stays whole)
+    An edit only moves segment boundaries inside the paragraph it touches
+    """
+    segments = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            segments.append(paragraph)
+            continue
+        current = ""
+        for sentence in _SENTENCE_END.split(paragraph):
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                segments.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            segments.append(current)
+    return segments
+
+
+def content_hash(text):
+    """Model-independent hash of a post body, returned to callers as its version"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EditTracker:
+    """Thread-safe LRU of post versions -> {segment key: probabilities}"""
+
+    def __init__(self, max_posts=10000):
+        """
+        Args:
+            max_posts: post versions kept; least recently edited are evicted first
+        """
+        self.max_posts = max_posts
+        self._versions = OrderedDict()
+        self._posts = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.segments_reused = 0
+        self.segments_scored = 0
+        self.evictions = 0
+
+    def get(self, post_id=None, previous_hash=None):
+        """Segment probabilities of the post's previous version, or None if unknown"""
+        with self._lock:
+            self.lookups += 1
+            version = previous_hash
+            if version is None and post_id is not None:
+                version = self._posts.get(str(post_id))
+            segments = self._versions.get(version) if version is not None else None
+            if segments is None:
+                return None
+            self._versions.move_to_end(version)
+            self.hits += 1
+            return segments
+
+    def put(self, post_id, version, segments, reused):
+        """
+        Record the segments of a post's current version
+        Args:
+            segments: {segment key: probabilities} for every segment of the version
+            reused: how many of them came from the previous version
+        """
+        with self._lock:
+            self.segments_reused += reused
+            self.segments_scored += len(segments) - reused
+            self._versions[version] = segments
+            self._versions.move_to_end(version)
+            if post_id is not None:
+                self._posts[str(post_id)] = version
+                self._posts.move_to_end(str(post_id))
+            while len(self._versions) > self.max_posts:
+                self._versions.popitem(last=False)
+                self.evictions += 1
+            while len(self._posts) > self.max_posts:
+                self._posts.popitem(last=False)
+
+    def clear(self):
+        """Drop every version (segment keys belong to the current model)"""
+        with self._lock:
+            self._versions.clear()
+            self._posts.clear()
+
+    def get_stats(self):
+        """Size, previous-version hit rate and segment reuse counters"""
+        with self._lock:
+            segments = self.segments_reused + self.segments_scored
+            return {
+                "versions": len(self._versions),
+                "max_posts": self.max_posts,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "segments_reused": self.segments_reused,
+                "segments_scored": self.segments_scored,
+                "segment_reuse_rate": self.segments_reused / segments if segments else 0.0,
+                "evictions": self.evictions,
+            }
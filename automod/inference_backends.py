@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Pluggable inference backends for the moderation model
+eager: full-precision PyTorch (default), int8: dynamic int8 quantized PyTorch,
+onnx: exported model run with ONNX Runtime (optional dependency)
+torch and transformers are imported on first use so importing this module stays cheap
+"""
+import hashlib
+import inspect
+import json
+import os
+import re
+import shutil
+import time
+from collections import OrderedDict
+
+BACKENDS = ("eager", "int8", "onnx")
+
+
+def artifact_dir(cache_dir, model_name, backend):
+    """Local directory holding the converted artifact for a model/backend pair"""
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name).strip("-")
+    return os.path.join(cache_dir, safe_name, backend)
+
+
+def snapshot_dir(cache_dir, model_name):
+    """Local directory holding the pinned safetensors snapshot of a model"""
+    return artifact_dir(cache_dir, model_name, "snapshot")
+
+
+def model_source(model_name, cache_dir, offline=False):
+    """
+    Where to load model_name from
+    A local snapshot is used whenever one exists; otherwise the Hugging Face cache
+    (never the network when offline)
+    Returns: (path or hub name, from_pretrained kwargs)
+    """
+    snapshot = snapshot_dir(cache_dir, model_name)
+    if os.path.exists(os.path.join(snapshot, "snapshot.json")):
+        return snapshot, {"local_files_only": True}
+    if offline:
+        return model_name, {"local_files_only": True}
+    return model_name, {}
+
+
+def source_revision(model_name, cache_dir, offline=False):
+    """
+    Identity of the weights a converted artifact is built from: the snapshot's
+    pinned revision, the Hugging Face commit, or for a plain local directory a
+    hash of its weight files' names, sizes and modification times
+    """
+    source, load_kwargs = model_source(model_name, cache_dir, offline)
+    manifest_path = os.path.join(source, "snapshot.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        return f"snapshot:{manifest.get('revision')}:{manifest.get('created_at')}"
+    if os.path.isdir(source):
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(source)):
+            if name.endswith((".safetensors", ".bin", ".json")):
+                stat = os.stat(os.path.join(source, name))
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+        return f"files:{digest.hexdigest()}"
+
+    from transformers import AutoConfig
+
+    commit = getattr(AutoConfig.from_pretrained(source, **load_kwargs), "_commit_hash", None)
+    return f"hub:{commit}"
+
+
+def _recorded_revision(target):
+    """Source revision an artifact directory was exported from, or None"""
+    try:
+        with open(os.path.join(target, "source.json")) as f:
+            return json.load(f).get("revision")
+    except (OSError, ValueError):
+        return None
+
+
+def _record_revision(target, revision):
+    path = os.path.join(target, "source.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump({"revision": revision, "exported_at": time.time()}, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def save_snapshot(model_name, cache_dir, revision=None):
+    """
+    Download model_name (optionally pinned to revision) and save model + tokenizer
+    as a self-contained safetensors snapshot that loads offline via mmap
+    Returns: snapshot directory
+    """
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    target = snapshot_dir(cache_dir, model_name)
+    staging = target + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    kwargs = {"revision": revision} if revision else {}
+    tokenizer = AutoTokenizer.from_pretrained(model_name, **kwargs)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, **kwargs)
+    tokenizer.save_pretrained(staging)
+    model.save_pretrained(staging, safe_serialization=True)
+    manifest = {
+        "model": model_name,
+        "revision": revision or getattr(model.config, "_commit_hash", None),
+        "created_at": time.time(),
+    }
+    with open(os.path.join(staging, "snapshot.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished snapshot in so a reader never sees a partial directory
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    return target
+
+
+class TorchBackend:
+    """Runs a PyTorch sequence-classification model (fp32 or quantized)"""
+
+    tensor_type = "pt"
+
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model.eval()
+
+    def predict_proba(self, inputs):
+        """Class probabilities for a tokenized batch"""
+        return self.probabilities(self.forward(inputs))
+
+    def forward(self, inputs):
+        """Logits for a tokenized batch"""
+        import torch
+
+        with torch.no_grad():
+            return self.model(**inputs).logits
+
+    def probabilities(self, logits):
+        """Softmax over forward() output as nested lists"""
+        import torch.nn.functional as F
+
+        return F.softmax(logits, dim=-1).tolist()
+
+
+class OnnxBackend:
+    """Runs an exported model with ONNX Runtime"""
+
+    tensor_type = "np"
+
+    def __init__(self, session):
+        self.name = "onnx"
+        self.model = session
+        self.input_names = [model_input.name for model_input in session.get_inputs()]
+
+    def predict_proba(self, inputs):
+        """Class probabilities for a tokenized batch"""
+        return self.probabilities(self.forward(inputs))
+
+    def forward(self, inputs):
+        """Logits for a tokenized batch"""
+        import numpy as np
+
+        feed = {name: inputs[name].astype(np.int64) for name in self.input_names}
+        return self.model.run(["logits"], feed)[0]
+
+    def probabilities(self, logits):
+        """Softmax over forward() output as nested lists"""
+        import numpy as np
+
+        shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return (shifted / shifted.sum(axis=-1, keepdims=True)).tolist()
+
+
+def load_backend(backend, model_name, cache_dir, offline=False, tokenizer=None):
+    """
+    Load the requested backend, using a cached converted artifact when it was
+    exported from the current weights (a stale one is re-exported)
+    Args:
+        tokenizer: needed to re-export a stale or missing ONNX artifact
+    Returns: backend object with name, model, tensor_type, forward(), probabilities()
+    and predict_proba()
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown MODERATION_BACKEND '{backend}', expected one of {BACKENDS}")
+
+    if backend == "onnx":
+        return _load_onnx(model_name, cache_dir, offline, tokenizer)
+
+    import torch
+    from transformers import AutoConfig, AutoModelForSequenceClassification
+
+    source, load_kwargs = model_source(model_name, cache_dir, offline)
+    if backend == "eager":
+        model = AutoModelForSequenceClassification.from_pretrained(source, **load_kwargs)
+        return TorchBackend("eager", model)
+
+    target = artifact_dir(cache_dir, model_name, "int8")
+    path = os.path.join(target, "model.pt")
+    revision = source_revision(model_name, cache_dir, offline)
+    if os.path.exists(path) and _recorded_revision(target) == revision:
+        # Rebuild the quantized module structure from the config, then load the
+        # int8 weights; the fp32 checkpoint is never read
+        config = AutoConfig.from_pretrained(target)
+        model = quantize_int8(AutoModelForSequenceClassification.from_config(config))
+        saved = torch.load(path, weights_only=True, **_mmap_option(torch))
+        model.load_state_dict(_restore_state_dict(saved))
+        return TorchBackend("int8", model)
+    # No current artifact: quantizing at load time gives the same model, which is
+    # saved for the next start where the cache directory is writable
+    model = AutoModelForSequenceClassification.from_pretrained(source, **load_kwargs)
+    quantized = quantize_int8(model)
+    try:
+        _save_int8(quantized, target, revision)
+    except OSError:
+        pass
+    return TorchBackend("int8", quantized)
+
+
+def _load_onnx(model_name, cache_dir, offline=False, tokenizer=None):
+    """ONNX Runtime session over the exported artifact, re-exported if stale"""
+    target = artifact_dir(cache_dir, model_name, "onnx")
+    path = os.path.join(target, "model.onnx")
+    if _recorded_revision(target) != source_revision(model_name, cache_dir, offline):
+        if tokenizer is None:
+            state = "from different weights" if os.path.exists(path) else "missing"
+            raise FileNotFoundError(
+                f"ONNX export at {path} is {state}; "
+                "run: python model_tools.py export --backend onnx"
+            )
+        export_backend("onnx", model_name, tokenizer, cache_dir, offline)
+    try:
+        import onnxruntime
+    except ImportError:
+        raise ImportError("MODERATION_BACKEND=onnx requires: pip install onnxruntime")
+    import torch
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = torch.get_num_threads()
+    session = onnxruntime.InferenceSession(
+        path, sess_options=options, providers=["CPUExecutionProvider"]
+    )
+    return OnnxBackend(session)
+
+
+def _mmap_option(torch):
+    """mmap=True for torch.load where supported (torch >= 2.1); older versions read eagerly"""
+    return {"mmap": True} if "mmap" in inspect.signature(torch.load).parameters else {}
+
+
+def _legacy_exporter_option(torch):
+    """
+    dynamo=False on torch versions whose export() has the flag (newer ones default
+    to the dynamo exporter); older versions only have the TorchScript exporter
+    """
+    parameters = inspect.signature(torch.onnx.export).parameters
+    return {"dynamo": False} if "dynamo" in parameters else {}
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of the Linear layers (weights int8, activations fp32)"""
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _portable_state_dict(model):
+    """
+    Quantized state dict as plain tensors and numbers
+    Pickling qint8 tensors and dtypes by reference is fragile across installs,
+    so quantized weights are stored as int8 values plus scale/zero point
+    """
+    import torch
+
+    state_dict = model.state_dict()
+    entries = {}
+    for key, value in state_dict.items():
+        if isinstance(value, torch.dtype):
+            entries[key] = {"dtype": str(value).replace("torch.", "")}
+        elif isinstance(value, tuple):
+            weight, bias = value
+            if weight.qscheme() != torch.per_tensor_affine:
+                raise ValueError(f"Unsupported quantization scheme for {key}")
+            entries[key] = {
+                "int8_weight": weight.int_repr(),
+                "scale": weight.q_scale(),
+                "zero_point": weight.q_zero_point(),
+                "bias": bias,
+            }
+        else:
+            entries[key] = value
+    return {"entries": entries, "metadata": dict(getattr(state_dict, "_metadata", {}))}
+
+
+def _restore_state_dict(saved):
+    """Inverse of _portable_state_dict, keeping the per-module version metadata"""
+    import torch
+
+    state_dict = OrderedDict()
+    for key, value in saved["entries"].items():
+        if isinstance(value, dict) and "dtype" in value:
+            state_dict[key] = getattr(torch, value["dtype"])
+        elif isinstance(value, dict):
+            weight = torch._make_per_tensor_quantized_tensor(
+                value["int8_weight"], value["scale"], value["zero_point"]
+            )
+            state_dict[key] = (weight, value["bias"])
+        else:
+            state_dict[key] = value
+    state_dict._metadata = saved["metadata"]
+    return state_dict
+
+
+def export_backend(backend, model_name, tokenizer, cache_dir, offline=False):
+    """
+    Produce and cache the converted artifact for backend
+    Returns: path of the written artifact
+    """
+    if backend not in ("int8", "onnx"):
+        raise ValueError("Only the int8 and onnx backends have an exported artifact")
+
+    import torch
+    from transformers import AutoModelForSequenceClassification
+
+    target = artifact_dir(cache_dir, model_name, backend)
+    os.makedirs(target, exist_ok=True)
+    revision = source_revision(model_name, cache_dir, offline)
+    source, load_kwargs = model_source(model_name, cache_dir, offline)
+    model = AutoModelForSequenceClassification.from_pretrained(source, **load_kwargs).eval()
+
+    if backend == "int8":
+        return _save_int8(quantize_int8(model), target, revision)
+
+    path = os.path.join(target, "model.onnx")
+    sample = tokenizer(
+        ["export sample text", "a second, longer sample sentence"],
+        return_tensors="pt",
+        padding=True,
+    )
+    input_names = list(sample.keys())
+
+    class _LogitsOnly(torch.nn.Module):
+        """Positional-argument wrapper so the exported graph returns only logits"""
+
+        def __init__(self, wrapped):
+            super().__init__()
+            self.wrapped = wrapped
+
+        def forward(self, *args):
+            return self.wrapped(**dict(zip(input_names, args))).logits
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    torch.onnx.export(
+        _LogitsOnly(model),
+        tuple(sample[name] for name in input_names),
+        path + ".tmp",
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=17,
+        **_legacy_exporter_option(torch),
+    )
+    os.replace(path + ".tmp", path)
+    _record_revision(target, revision)
+    return path
+
+
+def _save_int8(quantized, target, revision):
+    """Write a quantized model's config and int8 weights as the int8 artifact"""
+    import torch
+
+    os.makedirs(target, exist_ok=True)
+    path = os.path.join(target, "model.pt")
+    quantized.config.save_pretrained(target)
+    torch.save(_portable_state_dict(quantized), path + ".tmp")
+    os.replace(path + ".tmp", path)
+    _record_revision(target, revision)
+    return path
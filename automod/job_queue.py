@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Durable queue of asynchronous moderation jobs
+POST /jobs enqueues a post and returns at once; a runner thread moderates queued
+jobs in priority order (edits, then new posts, then backfills) and results are
+polled with GET /jobs/<id> or pushed to a local webhook
+"""
+import json
+import os
+from queue import Full, Queue
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+
+from structured_logging import get_logger
+
+# Lower runs first
+PRIORITIES = {"edit": 0, "new": 1, "backfill": 2}
+
+logger = get_logger("jobs")
+
+_STOP = object()
+
+
+class JobQueue:
+    """SQLite-backed job table; survives restarts and idle shutdowns"""
+
+    def __init__(self, path, retention_seconds=86400):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            retention_seconds: finished jobs older than this are purged
+        """
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )"""
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority, created_at)"
+        )
+        conn.commit()
+
+    def enqueue(self, payload, priority="new"):
+        """Queue one post for moderation; returns the job id"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {list(PRIORITIES)}")
+        job_id = uuid.uuid4().hex
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO jobs (id, priority, status, payload, created_at) "
+                "VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, PRIORITIES[priority], json.dumps(payload), time.time()),
+            )
+            conn.commit()
+        return job_id
+
+    def claim(self, limit):
+        """Mark up to limit queued jobs as running and return them, most urgent first"""
+        with self._write_lock:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT id, priority, payload FROM jobs WHERE status = 'queued' "
+                "ORDER BY priority, created_at LIMIT ?",
+                (limit,),
+            ).fetchall()
+            if rows:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    [(now, job_id) for job_id, _, _ in rows],
+                )
+                conn.commit()
+        return [
+            {"id": job_id, "priority": _priority_name(priority), "payload": json.loads(payload)}
+            for job_id, priority, payload in rows
+        ]
+
+    def complete(self, job_id, result):
+        """Store a job's moderation result"""
+        self._finish(job_id, "done", json.dumps(result), None)
+
+    def fail(self, job_id, error):
+        """Record a job that could not be moderated"""
+        self._finish(job_id, "failed", None, str(error))
+
+    def get(self, job_id):
+        """Job status and result as a dict, or None if unknown"""
+        row = self._connection().execute(
+            "SELECT id, priority, status, result, error, attempts, created_at, started_at, "
+            "finished_at FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, priority, status, result, error, attempts, created, started, finished = row
+        return {
+            "id": job_id,
+            "priority": _priority_name(priority),
+            "status": status,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "attempts": attempts,
+            "created_at": created,
+            "started_at": started,
+            "finished_at": finished,
+        }
+
+    def requeue_running(self):
+        """Return jobs left running by a previous process to the queue; returns how many"""
+        with self._write_lock:
+            conn = self._connection()
+            count = conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            ).rowcount
+            conn.commit()
+        return count
+
+    def purge(self):
+        """Delete finished jobs past the retention period"""
+        cutoff = time.time() - self.retention_seconds
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (cutoff,),
+            )
+            conn.commit()
+
+    def get_stats(self):
+        """Job counts by status, and queued jobs by priority"""
+        conn = self._connection()
+        by_status = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        queued = conn.execute(
+            "SELECT priority, COUNT(*) FROM jobs WHERE status = 'queued' GROUP BY priority"
+        )
+        return {
+            "path": self.path,
+            "by_status": by_status,
+            "queued_by_priority": {_priority_name(priority): count for priority, count in queued},
+        }
+
+    def _finish(self, job_id, status, result, error):
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+            conn.commit()
+
+    def _connection(self):
+        """Per-thread SQLite connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+
+class JobRunner:
+    """Background thread that moderates queued jobs in batches"""
+
+    def __init__(
+        self,
+        queue,
+        moderator,
+        batch_size=32,
+        webhook_url="",
+        poll_interval=1.0,
+        webhook_queue_size=1000,
+        admission=None,
+    ):
+        """
+        Args:
+            queue: JobQueue to drain
+            moderator: ContentModerator used for moderate_contents()
+            batch_size: jobs claimed (and moderated together) at a time
+            webhook_url: POSTed {"id", "status", "result"} for every finished job
+            poll_interval: seconds between checks when the queue is empty
+            webhook_queue_size: finished jobs awaiting webhook delivery before
+                further notifications are dropped
+            admission: AdmissionController the jobs share with live requests;
+                a batch waits while live traffic needs every slot
+        """
+        self.queue = queue
+        self.moderator = moderator
+        self.batch_size = batch_size
+        self.webhook_url = webhook_url
+        self.poll_interval = poll_interval
+        self.admission = admission
+        self.processed = 0
+        self.webhook_failures = 0
+        self.webhooks_dropped = 0
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        # Deliveries run on their own thread so a slow endpoint never stalls the queue
+        self._webhooks = Queue(maxsize=webhook_queue_size)
+        self._webhook_thread = None
+
+    def start(self):
+        """Resume jobs interrupted by the last shutdown and start the runner thread"""
+        requeued = self.queue.requeue_running()
+        if requeued:
+            logger.info("Requeued %s interrupted moderation jobs", requeued)
+        self._thread = threading.Thread(target=self._run, name="job-runner", daemon=True)
+        self._thread.start()
+        if self.webhook_url:
+            self._webhook_thread = threading.Thread(
+                target=self._deliver_webhooks, name="job-webhooks", daemon=True
+            )
+            self._webhook_thread.start()
+
+    def notify(self):
+        """Wake the runner after an enqueue"""
+        self._wake.set()
+
+    def stop(self, timeout=10.0):
+        """Finish the current batch and stop; unclaimed jobs stay queued"""
+        self._stopping.set()
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._webhook_thread is not None:
+            # Deliver what is already queued, within what is left of the timeout
+            try:
+                self._webhooks.put(_STOP, timeout=max(0.0, deadline - time.monotonic()))
+            except Full:
+                pass
+            self._webhook_thread.join(max(0.0, deadline - time.monotonic()))
+
+    def get_stats(self):
+        """Queue counts plus runner counters"""
+        stats = self.queue.get_stats()
+        stats["processed"] = self.processed
+        stats["webhook_failures"] = self.webhook_failures
+        stats["webhooks_pending"] = self._webhooks.qsize()
+        stats["webhooks_dropped"] = self.webhooks_dropped
+        return stats
+
+    def _run(self):
+        last_purge = 0.0
+        while not self._stopping.is_set():
+            if time.monotonic() - last_purge > 3600:
+                last_purge = time.monotonic()
+                self.queue.purge()
+
+            jobs = self.queue.claim(self.batch_size)
+            if not jobs:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+
+            # Queued work waits while live traffic needs every inference slot; jobs
+            # claimed when stop() interrupts the wait are requeued by the next start()
+            admission = self.admission
+            while admission is not None and not admission.try_acquire_background():
+                if self._stopping.wait(self.poll_interval):
+                    return
+
+            started = time.perf_counter()
+            ok = False
+            try:
+                results = self.moderator.moderate_contents([job["payload"] for job in jobs])
+                ok = True
+            except Exception as e:
+                logger.error("Moderation job batch failed: %s", e)
+                for job in jobs:
+                    self.queue.fail(job["id"], e)
+                    self._notify_webhook(job["id"], "failed", None)
+                continue
+            finally:
+                if admission is not None:
+                    admission.release(time.perf_counter() - started, ok)
+
+            for job, result in zip(jobs, results):
+                self.queue.complete(job["id"], result)
+                self.processed += 1
+                self._notify_webhook(job["id"], "done", result)
+
+    def _notify_webhook(self, job_id, status, result):
+        """Queue a best-effort push of a finished job; pollers still see it either way"""
+        if not self.webhook_url:
+            return
+        try:
+            self._webhooks.put_nowait((job_id, status, result))
+        except Full:
+            self.webhooks_dropped += 1
+            logger.warning("Job webhook queue full; dropped notification for %s", job_id)
+
+    def _deliver_webhooks(self):
+        """Webhook thread: POST queued notifications until stop()"""
+        while True:
+            notification = self._webhooks.get()
+            if notification is _STOP:
+                return
+            self._post_webhook(*notification)
+
+    def _post_webhook(self, job_id, status, result):
+        body = json.dumps({"id": job_id, "status": status, "result": result}).encode("utf-8")
+        request = urllib.request.Request(
+            self.webhook_url, data=body, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5):
+                pass
+        except Exception as e:
+            self.webhook_failures += 1
+            logger.warning("Job webhook %s failed for %s: %s", self.webhook_url, job_id, e)
+
+
+def _priority_name(priority):
+    for name, value in PRIORITIES.items():
+        if value == priority:
+            return name
+    return str(priority)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style metrics for the moderation service
+Counters and histograms live in a process-wide registry that ContentModerator
+records into, so library users get the same data as the /metrics endpoint
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans a cached lookup (sub-millisecond) up to a cold long-post forward pass
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+STAGES = ("parse", "tokenize", "forward", "postprocess", "serialize")
+
+
+class MetricsRegistry:
+    """Thread-safe counters and fixed-bucket histograms with optional labels"""
+
+    def __init__(self):
+        self._definitions = {}
+        self._local = threading.local()
+        self.reset()
+
+    def counter(self, name, help_text):
+        """Declare a counter"""
+        self._definitions[name] = ("counter", help_text, None)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        """Declare a histogram with the given upper bounds"""
+        self._definitions[name] = ("histogram", help_text, tuple(buckets))
+
+    def reset(self):
+        """Zero every series (used by forked workers, which start their own counts)"""
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        """Add amount to a counter series"""
+        if getattr(self._local, "suppressed", False):
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Record one histogram observation"""
+        if getattr(self._local, "suppressed", False):
+            return
+        buckets = self._definitions[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for position, bound in enumerate(buckets):
+                if value <= bound:
+                    series[0][position] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Observe the duration of the with-block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def suppressed(self):
+        """Drop everything recorded on this thread inside the with-block"""
+        previous = getattr(self._local, "suppressed", False)
+        self._local.suppressed = True
+        try:
+            yield
+        finally:
+            self._local.suppressed = previous
+
+    def stage(self, stage):
+        """Time one request-processing stage (see STAGES)"""
+        return self.time("moderation_stage_seconds", stage=stage)
+
+    def snapshot(self):
+        """Picklable copy of every series, e.g. to send from a worker process"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {
+                    key: [list(series[0]), series[1], series[2]]
+                    for key, series in self._histograms.items()
+                },
+            }
+
+    def render(self, snapshots=None, gauges=()):
+        """
+        Prometheus text exposition of this registry merged with other processes'
+        snapshots, followed by point-in-time gauges
+        Args:
+            snapshots: extra snapshot() results to add in (e.g. from workers)
+            gauges: iterable of (name, type, help, value, labels) tuples
+        """
+        counters = {}
+        histograms = {}
+        for snapshot in [self.snapshot()] + list(snapshots or []):
+            for key, value in snapshot["counters"].items():
+                counters[key] = counters.get(key, 0) + value
+            for key, (bucket_counts, total, count) in snapshot["histograms"].items():
+                merged = histograms.setdefault(key, [[0] * len(bucket_counts), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], bucket_counts)]
+                merged[1] += total
+                merged[2] += count
+
+        lines = []
+        for name, (kind, help_text, buckets) in self._definitions.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (series_name, labels), value in sorted(counters.items()):
+                    if series_name == name:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+
+            for (series_name, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, bucket_counts):
+                    cumulative += bucket_count
+                    bucket_labels = labels + (("le", _format_value(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        declared = set()
+        # Series of one metric must be contiguous
+        for name, kind, help_text, value, labels in sorted(gauges, key=lambda gauge: gauge[0]):
+            if value is None:
+                continue
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{_format_labels(_label_key(labels or {}))} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def process_gauges(include_children=True):
+    """RSS and CPU time of this process (and its worker children) via psutil"""
+    try:
+        import psutil
+    except ImportError:
+        return []
+
+    process = psutil.Process()
+    gauges = []
+    processes = [("main", process)]
+    if include_children:
+        processes += [("worker", child) for child in process.children()]
+    for role, proc in processes:
+        try:
+            with proc.oneshot():
+                rss = proc.memory_info().rss
+                cpu = proc.cpu_times()
+        except psutil.Error:
+            continue
+        labels = {"role": role, "pid": str(proc.pid)}
+        gauges.append(
+            ("process_resident_memory_bytes", "gauge", "Resident memory size in bytes", rss, labels)
+        )
+        gauges.append(
+            (
+                "process_cpu_seconds_total",
+                "counter",
+                "Total user and system CPU time spent in seconds",
+                cpu.user + cpu.system,
+                labels,
+            )
+        )
+    return gauges
+
+
+def _label_key(labels):
+    """Canonical hashable form of a label dict"""
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels):
+    """{name="value",...} with Prometheus escaping"""
+    if not labels:
+        return ""
+    pairs = (
+        '%s="%s"' % (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.counter(
+    "moderation_requests_total", "Posts moderated, by outcome (allowed, blocked, error)"
+)
+REGISTRY.counter(
+    "moderation_degraded_total",
+    "Posts answered without a full model verdict, by stage (cache, prefilter, fail_open, error)",
+)
+REGISTRY.counter(
+    "moderation_predictions_total",
+    "Texts scored, by source (cache, store, near_duplicate, edit, prefilter, model)",
+)
+REGISTRY.histogram(
+    "moderation_stage_seconds",
+    "Time spent per stage: parse, tokenize, forward, postprocess, serialize",
+)
+REGISTRY.histogram("moderation_predict_seconds", "predict_hate_speech(_batch) call duration")
+REGISTRY.histogram("moderation_moderate_seconds", "moderate_content(s) call duration")
+REGISTRY.histogram(
+    "moderation_forward_batch_size", "Texts per forward pass", buckets=BATCH_SIZE_BUCKETS
+)
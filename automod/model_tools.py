@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Model conversion and parity tooling for the moderation service
+  snapshot: save a pinned safetensors copy of MODEL for fast offline loading
+  export: produce and cache the int8 / ONNX artifact for MODEL
+  parity: compare a backend's labels and confidences against fp32
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add the automod directory to Python path
+sys.path.append(str(Path(__file__).parent))
+
+from config import ModerationConfig
+from moderationService import ContentModerator
+from inference_backends import export_backend, model_source, save_snapshot
+
+# Used when no --corpus is given; covers short replies, questions and long bodies
+DEFAULT_PARITY_TEXTS = [
+    "Thank you so much, this helped a lot!",
+    "Does anyone know a good respite care service near the city?",
+    "My mum has started forgetting our names and I don't know how to cope.",
+    "This advice is useless and so are the people giving it.",
+    "Get lost, nobody wants you here.",
+    "I've been caring for my dad for three years now. Some days are fine, "
+    "others are exhausting, and I feel guilty for wanting a break.",
+    "ok",
+    "What time does the support group meet on Thursdays?",
+]
+
+
+def load_corpus(path):
+    """Texts from a JSONL file of {title, content} posts or a plain-text file (one per line)"""
+    texts = []
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                post = json.loads(line)
+            except json.JSONDecodeError:
+                texts.append(line)
+                continue
+            if isinstance(post, dict):
+                texts.extend(post[field] for field in ("title", "content") if post.get(field))
+            else:
+                texts.append(str(post))
+    return texts
+
+
+def create_moderator(backend):
+    """
+    A moderator on the given backend with caching and the shortcut tiers
+    (pre-filter, near-duplicates) disabled so every text reaches the backend
+    """
+    moderator = ContentModerator()
+    moderator.backend_name = backend
+    moderator.cache = None
+    if moderator.verdict_store is not None:
+        moderator.verdict_store.close()
+        moderator.verdict_store = None
+    moderator.prefilter = None
+    moderator.near_duplicates = None
+    if not moderator.load_model():
+        raise RuntimeError(f"Failed to load {moderator.model_name} with the {backend} backend")
+    return moderator
+
+
+def score_texts(moderator, texts, batch_size):
+    """Predictions for texts plus mean latency per text in milliseconds"""
+    predictions = []
+    start = time.perf_counter()
+    for offset in range(0, len(texts), batch_size):
+        predictions.extend(moderator.predict_hate_speech_batch(texts[offset : offset + batch_size]))
+    elapsed = time.perf_counter() - start
+    return predictions, elapsed * 1000.0 / max(1, len(texts))
+
+
+def hate_probability(prediction):
+    """Probability of the HATE class recovered from label + confidence"""
+    if prediction["label"] == "HATE":
+        return prediction["confidence"]
+    return 1.0 - prediction["confidence"]
+
+
+def run_parity(backend, texts, batch_size):
+    """Compare backend against eager fp32 on texts and return a drift report"""
+    reference_predictions, reference_ms = score_texts(create_moderator("eager"), texts, batch_size)
+    candidate_predictions, candidate_ms = score_texts(create_moderator(backend), texts, batch_size)
+
+    label_mismatches = 0
+    errors = 0
+    block_flips = []
+    diffs = []
+    for text, reference, candidate in zip(texts, reference_predictions, candidate_predictions):
+        if "ERROR" in (reference["label"], candidate["label"]):
+            errors += 1
+            continue
+        if reference["label"] != candidate["label"]:
+            label_mismatches += 1
+        if reference["should_block"] != candidate["should_block"]:
+            block_flips.append(
+                {
+                    "text": text[:120],
+                    "eager_hate_probability": hate_probability(reference),
+                    f"{backend}_hate_probability": hate_probability(candidate),
+                }
+            )
+        diffs.append(abs(hate_probability(reference) - hate_probability(candidate)))
+
+    count = len(diffs)
+    return {
+        "model": ModerationConfig.MODEL_NAME,
+        "backend": backend,
+        "threshold": ModerationConfig.HATE_THRESHOLD,
+        "texts": len(texts),
+        "errors": errors,
+        "label_agreement": (count - label_mismatches) / count if count else 1.0,
+        "label_mismatches": label_mismatches,
+        "block_decision_flips": len(block_flips),
+        "max_abs_confidence_diff": max(diffs, default=0.0),
+        "mean_abs_confidence_diff": sum(diffs) / count if count else 0.0,
+        "eager_ms_per_text": reference_ms,
+        f"{backend}_ms_per_text": candidate_ms,
+        "flipped_examples": block_flips[:20],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert and validate moderation model backends")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    snapshot_parser = subparsers.add_parser(
+        "snapshot", help="Save a local safetensors snapshot of the model"
+    )
+    snapshot_parser.add_argument(
+        "--revision",
+        default=ModerationConfig.MODEL_REVISION or None,
+        help="Hub commit/tag to pin (default: MODEL_REVISION or latest)",
+    )
+
+    export_parser = subparsers.add_parser("export", help="Produce and cache a converted model")
+    export_parser.add_argument("--backend", choices=["int8", "onnx"], required=True)
+
+    parity_parser = subparsers.add_parser("parity", help="Measure drift from the fp32 model")
+    parity_parser.add_argument("--backend", choices=["int8", "onnx"], required=True)
+    parity_parser.add_argument("--corpus", help="JSONL of {title, content} posts or one text per line")
+    parity_parser.add_argument("--batch-size", type=int, default=ModerationConfig.BATCH_MAX_SIZE)
+    parity_parser.add_argument(
+        "--strict", action="store_true", help="Exit with status 1 if any block decision flips"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        path = save_snapshot(
+            ModerationConfig.MODEL_NAME, ModerationConfig.MODEL_CACHE_DIR, args.revision
+        )
+        print(f"Saved snapshot of {ModerationConfig.MODEL_NAME} to {path}")
+        print("It is loaded automatically; set MODEL_OFFLINE=true to forbid network lookups")
+        return
+
+    if args.command == "export":
+        from transformers import AutoTokenizer
+
+        offline = ModerationConfig.MODEL_OFFLINE
+        source, load_kwargs = model_source(
+            ModerationConfig.MODEL_NAME, ModerationConfig.MODEL_CACHE_DIR, offline
+        )
+        tokenizer = AutoTokenizer.from_pretrained(source, **load_kwargs)
+        path = export_backend(
+            args.backend,
+            ModerationConfig.MODEL_NAME,
+            tokenizer,
+            ModerationConfig.MODEL_CACHE_DIR,
+            offline,
+        )
+        print(f"Exported {args.backend} model to {path}")
+        print(f"Enable it with MODERATION_BACKEND={args.backend}")
+        return
+
+    texts = load_corpus(args.corpus) if args.corpus else DEFAULT_PARITY_TEXTS
+    report = run_parity(args.backend, texts, max(1, args.batch_size))
+    print(json.dumps(report, indent=2))
+    if args.strict and report["block_decision_flips"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
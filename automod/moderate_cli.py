@@ -2,22 +2,45 @@
 """
 Standalone moderation script for Node.js integration
 Reads content from stdin, performs moderation, outputs result to stdout
+With --stream, stays alive and answers newline-delimited JSON requests:
+  in:  {"id": "1", "title": "...", "content": "..."}
+  out: {"id": "1", "allowed": true, ...}
 """
+import argparse
 import sys
 import json
 import os
+import queue
+import threading
 from pathlib import Path
 
 # Add the automod directory to Python path
 sys.path.append(str(Path(__file__).parent))
 
-from moderationService import moderate_forum_content, initialize_moderation_service
+from config import ModerationConfig
+from moderationService import (
+    get_moderator,
+    moderate_forum_content,
+    moderate_forum_contents,
+    initialize_moderation_service,
+)
 
 
-def main():
+def prepare_moderator():
+    """Load the model, or defer loading when a verdict store can answer repeats"""
+    moderator = get_moderator()
+    # With a verdict store, texts seen before are answered without loading the model
+    if moderator.verdict_store is not None:
+        moderator.load_on_demand = True
+        return True
+    return initialize_moderation_service()
+
+
+def run_once():
+    """Moderate the single JSON document on stdin"""
     try:
         # Initialize the moderation service
-        if not initialize_moderation_service():
+        if not prepare_moderator():
             print(
                 json.dumps(
                     {"allowed": True, "reason": "Failed to load moderation model"}
@@ -42,5 +65,100 @@ def main():
         sys.exit(0)
 
 
+def _read_lines(stream, lines):
+    """Feed stdin lines to the moderation loop; None marks end of input"""
+    for line in stream:
+        if line.strip():
+            lines.put(line)
+    lines.put(None)
+
+
+def _parse_request(line):
+    """Split an NDJSON request line into (id, content_data or None, error)"""
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as e:
+        return None, None, f"Invalid JSON: {e}"
+    if not isinstance(request, dict):
+        return None, None, "Request must be a JSON object"
+    request_id = request.pop("id", None)
+    return request_id, request, None
+
+
+def run_stream(max_batch):
+    """
+    Answer NDJSON requests until stdin closes
+    Every line already buffered when the model frees up goes into one batch
+    """
+    # Results own stdout; anything else printed to it (logging, progress bars)
+    # is redirected to stderr so it can't corrupt the stream
+    output = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    loaded = prepare_moderator()
+
+    lines = queue.Queue()
+    reader = threading.Thread(target=_read_lines, args=(sys.stdin, lines), daemon=True)
+    reader.start()
+
+    finished = False
+    while not finished:
+        batch = [lines.get()]
+        while len(batch) < max_batch:
+            try:
+                batch.append(lines.get_nowait())
+            except queue.Empty:
+                break
+        if None in batch:
+            finished = True
+            batch = batch[: batch.index(None)]
+        if not batch:
+            continue
+
+        requests = [_parse_request(line) for line in batch]
+        valid = [content_data for _, content_data, error in requests if error is None]
+        if not loaded:
+            results = iter(
+                [{"allowed": True, "reason": "Failed to load moderation model"}] * len(valid)
+            )
+        else:
+            try:
+                results = iter(moderate_forum_contents(valid))
+            except Exception as e:
+                results = iter(
+                    [{"allowed": True, "reason": f"Moderation error: {str(e)}"}] * len(valid)
+                )
+
+        for request_id, _, error in requests:
+            if error is not None:
+                result = {"allowed": True, "reason": f"Moderation error: {error}"}
+            else:
+                result = next(results)
+            output.write(json.dumps({"id": request_id, **result}) + "\n")
+        output.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moderate forum content read from stdin")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stay alive and answer newline-delimited JSON requests tagged with an id",
+    )
+    parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=ModerationConfig.BATCH_MAX_ITEMS,
+        help="Most buffered requests moderated together in --stream mode",
+    )
+    args = parser.parse_args()
+
+    if args.stream:
+        run_stream(max(1, args.max_batch))
+    else:
+        run_once()
+
+
 if __name__ == "__main__":
     main()
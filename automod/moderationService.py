@@ -1,149 +1,927 @@
 # Auto-Moderation Service for Forum Content
 import os
-import sys
 import json
-import logging
+import threading
+import time
 from pathlib import Path
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-import torch.nn.functional as F
 from dotenv import load_dotenv
 
+from admission import worst_stage
+from batching import MicroBatcher, PipelinedBatcher
+from config import ModerationConfig
+from inference_backends import load_backend, model_source
+from edit_tracker import EditTracker, content_hash, split_segments
+from metrics import REGISTRY, process_gauges
+from near_duplicates import create_near_duplicate_index
+from prefilter import create_prefilter
+from prediction_cache import PredictionCache, content_key
+from structured_logging import configure_logging, get_logger
+from verdict_store import VerdictStore
+from worker_pool import WorkerPool, fork_supported
+
 # Load environment variables
 load_dotenv()
 
+# Index of the HATE class in the model's logits
+HATE_CLASS = 1
+
+# Error of a post that is not a JSON object (rejected before the model)
+INVALID_INPUT_ERROR = "Invalid input format"
+
 
 class ContentModerator:
-    def __init__(self):
-        self.model_name = os.getenv("MODEL", "irlab-udc/MetaHateBERT")
-        self.confidence_threshold = float(os.getenv("HATE_THRESHOLD", "0.7"))
+    def __init__(self, model_name=None, confidence_threshold=None, backend=None):
+        """
+        Args (each defaults to its environment setting):
+            model_name: Hugging Face id or local path (MODEL)
+            confidence_threshold: HATE probability needed to block (HATE_THRESHOLD)
+            backend: eager, int8 or onnx (MODERATION_BACKEND)
+        """
+        self.model_name = model_name or os.getenv("MODEL", "irlab-udc/MetaHateBERT")
+        if confidence_threshold is None:
+            confidence_threshold = float(os.getenv("HATE_THRESHOLD", "0.7"))
+        self.confidence_threshold = confidence_threshold
+        self.backend_name = backend or ModerationConfig.MODERATION_BACKEND
+        self.long_text_mode = ModerationConfig.LONG_TEXT_MODE
+        self._stats_lock = threading.Lock()
+        self._padding = {
+            "forward_passes": 0,
+            "real_tokens": 0,
+            "padded_tokens": 0,
+            "unbucketed_padded_tokens": 0,
+        }
         self.tokenizer = None
         self.model = None
+        self.backend = None
         self.logger = self._setup_logger()
         self.model_loaded = False
+        self.batcher = None
+        self.batching_config = None
+        self.worker_pool = None
+        self.cache = None
+        if ModerationConfig.CACHE_MAX_ENTRIES > 0:
+            self.cache = PredictionCache(
+                max_entries=ModerationConfig.CACHE_MAX_ENTRIES,
+                ttl_seconds=ModerationConfig.CACHE_TTL_SECONDS,
+                max_bytes=int(ModerationConfig.CACHE_MAX_MB * 1024 * 1024),
+            )
+        self.verdict_store = None
+        if ModerationConfig.VERDICT_STORE_PATH:
+            try:
+                self.verdict_store = VerdictStore(
+                    ModerationConfig.VERDICT_STORE_PATH,
+                    max_entries=ModerationConfig.VERDICT_STORE_MAX_ENTRIES,
+                )
+            except Exception as e:
+                self.logger.warning("Verdict store disabled: %s", e)
+
+        self.prefilter = create_prefilter(
+            ModerationConfig.PREFILTER_MODE,
+            denylist_path=ModerationConfig.PREFILTER_DENYLIST_PATH,
+            allowlist_path=ModerationConfig.PREFILTER_ALLOWLIST_PATH,
+            max_words=ModerationConfig.PREFILTER_MAX_WORDS,
+            benign_confidence=ModerationConfig.PREFILTER_BENIGN_CONFIDENCE,
+        )
+        # Shed requests fall back to the pre-filter even when it is off for normal traffic
+        self.degraded_prefilter = self.prefilter or create_prefilter(
+            "on",
+            denylist_path=ModerationConfig.PREFILTER_DENYLIST_PATH,
+            allowlist_path=ModerationConfig.PREFILTER_ALLOWLIST_PATH,
+            max_words=ModerationConfig.PREFILTER_MAX_WORDS,
+            benign_confidence=ModerationConfig.PREFILTER_BENIGN_CONFIDENCE,
+        )
+        if self.prefilter is not None and not self.prefilter.denylist_size:
+            self.logger.warning(
+                "Pre-filter denylist %s not found; bypass decisions rely on the allowlist alone",
+                ModerationConfig.PREFILTER_DENYLIST_PATH,
+            )
+
+        # Lightly edited copies of recently scored texts reuse their probabilities
+        self.near_duplicates = create_near_duplicate_index(
+            ModerationConfig.NEAR_DUPLICATE_MODE,
+            max_distance=ModerationConfig.NEAR_DUPLICATE_MAX_DISTANCE,
+            min_tokens=ModerationConfig.NEAR_DUPLICATE_MIN_TOKENS,
+            max_entries=ModerationConfig.NEAR_DUPLICATE_MAX_ENTRIES,
+            ttl_seconds=ModerationConfig.NEAR_DUPLICATE_TTL_SECONDS,
+        )
+
+        # Segment probabilities of recent post versions, for moderate_edit()
+        self.edit_tracker = None
+        if ModerationConfig.EDIT_TRACKER_MAX_POSTS > 0:
+            self.edit_tracker = EditTracker(max_posts=ModerationConfig.EDIT_TRACKER_MAX_POSTS)
+
+        # When set, the model is only loaded once a text misses the cache and store
+        self.load_on_demand = False
+
+        self.model_source = None
+        # Phase name -> seconds, filled in by load_model() and warm_up()
+        self.startup_timings = {}
+        self._load_lock = threading.Lock()
+
+    @property
+    def model_id(self):
+        """Identity of the scoring model, part of every cache key"""
+        model_id = self.model_name
+        # Quantized/exported models score slightly differently from fp32
+        if self.backend_name != "eager":
+            model_id += f"#{self.backend_name}"
+        # A shorter sequence cap sees less of each text
+        if ModerationConfig.MAX_SEQUENCE_LENGTH != 512:
+            model_id += f"#len{ModerationConfig.MAX_SEQUENCE_LENGTH}"
+        # Chunked long texts get different scores from truncated ones
+        if self.long_text_mode == "chunk":
+            model_id += (
+                f"#chunk:{ModerationConfig.CHUNK_AGGREGATION}"
+                f":{ModerationConfig.CHUNK_OVERLAP_TOKENS}:{ModerationConfig.CHUNK_MAX_WINDOWS}"
+            )
+        return model_id
 
     def _setup_logger(self):
-        """Setup logging for production use"""
-        log_level = os.getenv("LOG_LEVEL", "WARNING").upper()  # Changed default to WARNING
-        
-        # Only log to file in production, reduce console noise
-        handlers = []
-        if os.getenv("NODE_ENV") == "development":
-            handlers.append(logging.StreamHandler(sys.stdout))
-        
-        # Always log errors to file
-        handlers.append(logging.FileHandler("/tmp/moderation.log", mode="a"))
-        
-        logging.basicConfig(
-            level=getattr(logging, log_level, logging.WARNING),
-            format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            handlers=handlers,
+        """Service logger; records are written as JSON lines by a background thread"""
+        configure_logging(
+            level=ModerationConfig.LOG_LEVEL,
+            path=ModerationConfig.LOG_FILE,
+            max_bytes=int(ModerationConfig.LOG_MAX_MB * 1024 * 1024),
+            backup_count=ModerationConfig.LOG_BACKUP_COUNT,
+            # Console output is for local development; production reads the file
+            console=os.getenv("NODE_ENV") == "development",
         )
-        return logging.getLogger(__name__)
+        return get_logger("service")
 
     def load_model(self):
         """Load the hate speech detection model"""
         try:
-            self.logger.info(f"Loading model: {self.model_name}")
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModelForSequenceClassification.from_pretrained(
-                self.model_name
+            self.logger.info("Loading model: %s (%s backend)", self.model_name, self.backend_name)
+            offline = ModerationConfig.MODEL_OFFLINE
+            if offline:
+                # Keep transformers/huggingface_hub from making any network lookups
+                os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+            timings = {}
+            started = time.perf_counter()
+            import torch  # timed separately from reading weights
+            from transformers import AutoTokenizer
+
+            timings["torch_import_s"] = time.perf_counter() - started
+            self._configure_torch_threads(torch)
+
+            phase = time.perf_counter()
+            source, load_kwargs = model_source(
+                self.model_name, ModerationConfig.MODEL_CACHE_DIR, offline
+            )
+            self.tokenizer = AutoTokenizer.from_pretrained(source, **load_kwargs)
+            timings["tokenizer_s"] = time.perf_counter() - phase
+
+            phase = time.perf_counter()
+            self.backend = load_backend(
+                self.backend_name,
+                self.model_name,
+                ModerationConfig.MODEL_CACHE_DIR,
+                offline,
+                tokenizer=self.tokenizer,
             )
+            self.model = self.backend.model
+            timings["weights_s"] = time.perf_counter() - phase
+
             self.model_loaded = True
-            self.logger.info("Model loaded successfully")
+            self.model_source = source
+            self.startup_timings = timings
+            # Cached probabilities belong to the previous weights
+            if self.cache is not None:
+                self.cache.clear()
+            if self.near_duplicates is not None:
+                self.near_duplicates.clear()
+            if self.edit_tracker is not None:
+                self.edit_tracker.clear()
+            self.logger.info(
+                "Model loaded successfully from %s "
+                "(torch import %.2fs, tokenizer %.2fs, weights %.2fs)",
+                source,
+                timings["torch_import_s"],
+                timings["tokenizer_s"],
+                timings["weights_s"],
+            )
             return True
         except Exception as e:
-            self.logger.error(f"Failed to load model: {e}")
+            self.logger.error("Failed to load model: %s", e)
             self.model_loaded = False
             return False
 
+    def _configure_torch_threads(self, torch):
+        """Apply TORCH_THREADS / TORCH_INTEROP_THREADS (the ONNX backend follows TORCH_THREADS)"""
+        if ModerationConfig.TORCH_THREADS:
+            torch.set_num_threads(ModerationConfig.TORCH_THREADS)
+        interop = ModerationConfig.TORCH_INTEROP_THREADS
+        if interop and torch.get_num_interop_threads() != interop:
+            try:
+                torch.set_num_interop_threads(interop)
+            except RuntimeError as e:
+                # Only possible before the first parallel op of the process
+                self.logger.warning("TORCH_INTEROP_THREADS not applied: %s", e)
+
+    def warm_up(self):
+        """
+        Run throwaway forward passes so the first real request doesn't pay for
+        lazy initialization (kernel selection, allocator growth, tokenizer caches)
+        Returns: seconds spent
+        """
+        started = time.perf_counter()
+        # A short and a long input so both small and large shapes have been seen
+        self._forward(["warm-up", "warm-up " * (self.window_tokens // 2)])
+        elapsed = time.perf_counter() - started
+        self.startup_timings["warmup_s"] = elapsed
+        return elapsed
+
     def is_ready(self):
         """Check if the moderation service is ready"""
         return (
             self.model_loaded and self.model is not None and self.tokenizer is not None
         )
 
+    def enable_batching(self, max_batch_size=None, max_wait_ms=None):
+        """Route predictions through a micro-batching engine shared by all callers"""
+        if max_batch_size is None:
+            max_batch_size = ModerationConfig.BATCH_MAX_SIZE
+        if max_wait_ms is None:
+            max_wait_ms = ModerationConfig.BATCH_MAX_WAIT_MS
+
+        self.disable_batching()
+        self.batching_config = {"max_batch_size": max_batch_size, "max_wait_ms": max_wait_ms}
+        if ModerationConfig.INFERENCE_PIPELINE:
+            # Tokenization of the next batch overlaps the forward pass of this one
+            self.batcher = PipelinedBatcher(
+                self._tokenize_batch,
+                self._forward_inputs,
+                self._logits_to_probabilities,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_wait_ms,
+                prepare_threads=ModerationConfig.PIPELINE_TOKENIZER_THREADS,
+                queue_size=ModerationConfig.PIPELINE_QUEUE_SIZE,
+            )
+        else:
+            self.batcher = MicroBatcher(
+                self._forward, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms
+            )
+        self.logger.info(
+            "Micro-batching enabled (max_batch_size=%s, max_wait_ms=%s, pipelined=%s)",
+            max_batch_size,
+            max_wait_ms,
+            ModerationConfig.INFERENCE_PIPELINE,
+        )
+
+    def disable_batching(self):
+        """Stop the micro-batching engine and score requests directly"""
+        self.batching_config = None
+        if self.batcher is not None:
+            self.batcher.stop()
+            self.batcher = None
+
+    def enable_worker_pool(self, num_workers, torch_threads=None, max_batch_size=None):
+        """
+        Fork worker processes that share this process's loaded model copy-on-write
+        Each worker runs its own micro-batcher; requests go to the least-loaded worker
+        Returns: True if the pool started, False if forking is unsupported
+        """
+        if not self.is_ready():
+            raise RuntimeError("Load the model before starting the worker pool")
+        if not fork_supported():
+            self.logger.warning("Worker pool needs fork(); serving in-process instead")
+            return False
+        if self.backend_name == "onnx":
+            # The ONNX Runtime session and its thread pools are not fork-safe
+            self.logger.warning("Worker pool can't share an ONNX session; serving in-process instead")
+            return False
+
+        if max_batch_size is None:
+            max_batch_size = ModerationConfig.BATCH_MAX_SIZE
+
+        # The parent only routes; batching happens inside each worker
+        self.disable_batching()
+        if max_batch_size > 1:
+            self.batching_config = {
+                "max_batch_size": max_batch_size,
+                "max_wait_ms": ModerationConfig.BATCH_MAX_WAIT_MS,
+            }
+
+        pool = WorkerPool(
+            self,
+            num_workers,
+            torch_threads=torch_threads,
+            worker_concurrency=max(1, max_batch_size),
+        )
+        pool.start()
+        self.worker_pool = pool
+        self.logger.info(
+            "Worker pool started (%s workers, %s torch threads each)", num_workers, pool.torch_threads
+        )
+        return True
+
+    def disable_worker_pool(self):
+        """Stop the worker processes and score requests in-process"""
+        if self.worker_pool is not None:
+            self.worker_pool.stop()
+            self.worker_pool = None
+
+    def render_metrics(self, gauges=()):
+        """
+        Prometheus text exposition of this process's metrics (plus the worker
+        processes') with queue, cache and process gauges added
+        """
+        snapshots = self.worker_pool.metrics_snapshots() if self.worker_pool is not None else []
+        gauges = list(gauges) + process_gauges()
+        if self.batcher is not None:
+            gauges.append(
+                (
+                    "moderation_batch_queue_depth",
+                    "gauge",
+                    "Texts waiting for the micro-batcher",
+                    self.batcher.queue_depth(),
+                    None,
+                )
+            )
+        pipeline = self.batcher.get_stats().get("pipeline") if self.batcher is not None else None
+        if pipeline is not None:
+            for stage, stage_stats in pipeline["stages"].items():
+                gauges.append(
+                    (
+                        "moderation_pipeline_queue_depth",
+                        "gauge",
+                        "Units waiting for an inference pipeline stage",
+                        stage_stats["queue_depth"],
+                        {"stage": stage},
+                    )
+                )
+                gauges.append(
+                    (
+                        "moderation_pipeline_utilization",
+                        "gauge",
+                        "Share of a pipeline stage's thread time spent working since start",
+                        stage_stats["utilization"],
+                        {"stage": stage},
+                    )
+                )
+        if self.worker_pool is not None:
+            for worker in self.worker_pool.workers:
+                gauges.append(
+                    (
+                        "moderation_worker_in_flight",
+                        "gauge",
+                        "Texts assigned to a worker and not yet scored",
+                        worker.in_flight,
+                        {"worker": worker.index},
+                    )
+                )
+        if self.prefilter is not None:
+            prefilter_stats = self.prefilter.get_stats()
+            gauges.append(
+                (
+                    "moderation_prefilter_audit_disagreements_total",
+                    "counter",
+                    "Audited bypass candidates the model scored as HATE",
+                    prefilter_stats["audit_disagreements"],
+                    None,
+                )
+            )
+        if self.cache is not None:
+            cache_stats = self.cache.get_stats()
+            gauges.append(
+                ("moderation_cache_entries", "gauge", "Cached texts", cache_stats["entries"], None)
+            )
+            gauges.append(
+                (
+                    "moderation_cache_hit_ratio",
+                    "gauge",
+                    "Cache hits / lookups since start",
+                    cache_stats["hit_rate"],
+                    None,
+                )
+            )
+        padding = self._padding_stats()
+        gauges.append(
+            (
+                "moderation_padding_efficiency",
+                "gauge",
+                "Real tokens / padded tokens since start",
+                padding["efficiency"],
+                None,
+            )
+        )
+        return REGISTRY.render(snapshots, gauges)
+
+    def get_stats(self):
+        """Runtime statistics for the inference path"""
+        return {
+            "batching": self.batcher.get_stats() if self.batcher is not None else None,
+            "worker_pool": (
+                self.worker_pool.get_stats() if self.worker_pool is not None else None
+            ),
+            "startup": dict(self.startup_timings),
+            "padding": self._padding_stats(),
+            "prefilter": self.prefilter.get_stats() if self.prefilter is not None else None,
+            "cache": self.cache.get_stats() if self.cache is not None else None,
+            "near_duplicates": (
+                self.near_duplicates.get_stats() if self.near_duplicates is not None else None
+            ),
+            "verdict_store": (
+                self.verdict_store.get_stats() if self.verdict_store is not None else None
+            ),
+            "edits": self.edit_tracker.get_stats() if self.edit_tracker is not None else None,
+        }
+
     def predict_hate_speech(self, text):
         """
         Predict hate speech for given text
         Returns: dict with prediction results
         """
-        if not self.is_ready():
+        return self.predict_hate_speech_batch([text])[0]
+
+    def predict_hate_speech_batch(self, texts, allow_inference=True):
+        """
+        Predict hate speech for several texts in one padded batch
+        allow_inference=False answers from the cache/store and pre-filter only,
+        failing open for the rest (used when the server sheds load)
+        Returns: list of prediction dicts in input order
+        """
+        with REGISTRY.time("moderation_predict_seconds"):
+            return self._predict_batch(texts, allow_inference)
+
+    def _predict_batch(self, texts, allow_inference=True):
+        """predict_hate_speech_batch without the timing hook"""
+        if not self.is_ready() and not self.load_on_demand:
             self.logger.warning("Model not ready. Call load_model() first.")
-            return {
-                "text": text,
-                "label": "ERROR",
-                "confidence": 0.0,
-                "is_hate": False,
-                "should_block": False,
-                "error": "Model not loaded",
-            }
+            return [self._error_result(text, "Model not loaded") for text in texts]
+
+        texts = [self._prepare_text(text) for text in texts]
+        results = [None] * len(texts)
+
+        pending = []
+        for index, text in enumerate(texts):
+            if text:
+                pending.append(index)
+            else:
+                results[index] = {
+                    "text": text,
+                    "label": "NOT_HATE",
+                    "confidence": 0.0,
+                    "is_hate": False,
+                    "should_block": False,
+                }
+
+        if not allow_inference:
+            return self._predict_degraded(texts, results, pending)
+
+        # Cheap first tier: confidently benign texts skip the model (in audit mode
+        # they are still scored so the bypass can be checked against the model)
+        audited = set()
+        if self.prefilter is not None and pending:
+            bypassed, audited = self._prefilter_tier({index: texts[index] for index in pending})
+            for index, probs in bypassed.items():
+                results[index] = self._build_result(texts[index], probs)
+            pending = [index for index in pending if index not in bypassed]
+
+        if not pending:
+            return results
 
-        # Input validation and sanitization
+        try:
+            probabilities = self._lookup_or_score([texts[index] for index in pending])
+            for index, probs in zip(pending, probabilities):
+                results[index] = self._build_result(texts[index], probs)
+                if index in audited:
+                    self.prefilter.record_audit(texts[index], results[index])
+        except Exception as e:
+            self.logger.error("Error during prediction: %s", e)
+            for index in pending:
+                results[index] = self._error_result(texts[index], str(e))
+
+        return results
+
+    def _prefilter_tier(self, texts_by_key):
+        """
+        Run texts past the pre-filter, by key
+        Returns: ({key: probabilities} of texts that skip the model, set of keys
+        the pre-filter would have skipped but which are scored for its audit)
+        """
+        bypassed = {}
+        audited = set()
+        for key, text in texts_by_key.items():
+            probs = self.prefilter.benign_probabilities(text)
+            if probs is None:
+                continue
+            if self.prefilter.audit:
+                audited.add(key)
+            else:
+                bypassed[key] = probs
+        REGISTRY.inc("moderation_predictions_total", len(bypassed), source="prefilter")
+        return bypassed, audited
+
+    def _prepare_text(self, text):
+        """Input validation and sanitization"""
         if not isinstance(text, str):
             text = str(text)
 
         text = text.strip()
-        if not text:
-            return {
-                "text": text,
-                "label": "NOT_HATE",
-                "confidence": 0.0,
-                "is_hate": False,
-                "should_block": False,
-            }
 
-        # Truncate very long text
-        max_length = 512
-        if len(text) > max_length * 4:  # Rough estimate for tokenization
-            text = text[: max_length * 4]
+        # Truncate very long text (chunk mode scores the whole text instead)
+        max_length = ModerationConfig.MAX_TEXT_LENGTH
+        if self.long_text_mode != "chunk" and len(text) > max_length:
+            text = text[:max_length]
 
-        try:
-            # Tokenize input
-            inputs = self.tokenizer(
-                text, return_tensors="pt", truncation=True, padding=True, max_length=512
-            )
-
-            # Get model predictions
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                predictions = F.softmax(outputs.logits, dim=-1)
-
-            # Get predicted class and confidence
-            predicted_class = torch.argmax(predictions, dim=-1).item()
-            confidence = predictions[0][predicted_class].item()
-
-            # Map class to label (MetaHateBERT specific)
-            label_map = {0: "NOT_HATE", 1: "HATE"}
-            label = label_map.get(predicted_class, f"CLASS_{predicted_class}")
-
-            result = {
-                "text": text,
-                "label": label,
-                "confidence": confidence,
-                "is_hate": label == "HATE",
-                "should_block": label == "HATE"
-                and confidence >= self.confidence_threshold,
-            }
+        return text
+
+    def _predict_degraded(self, texts, results, pending):
+        """
+        Answer pending texts without the model, in stages: cached or stored
+        probabilities, then the pre-filter, then an explicit fail-open
+        Each result records the stage that produced it under "degraded"
+        """
+        known = self._lookup_known([texts[index] for index in pending])
+        for index, probs in zip(pending, known):
+            text = texts[index]
+            stage = "cache"
+            if probs is None and self.near_duplicates is not None:
+                probs = self._lookup_near_duplicates({index: text}).get(index)
+            if probs is None and self.degraded_prefilter is not None:
+                probs = self.degraded_prefilter.benign_probabilities(text)
+                stage = "prefilter"
+            if probs is None:
+                results[index] = self._unscored_result(text)
+            else:
+                results[index] = self._build_result(text, probs)
+                results[index]["degraded"] = stage
+        return results
+
+    def _lookup_near_duplicates(self, texts_by_key):
+        """
+        Probabilities reused from recently scored near-duplicates, by key
+        In "blocked" mode only matches that still block are reused; anything
+        else goes to the model
+        """
+        accept = self._blocks if ModerationConfig.NEAR_DUPLICATE_MODE == "blocked" else None
+        reused = {}
+        for key, text in texts_by_key.items():
+            probs = self.near_duplicates.lookup(text, accept)
+            if probs is not None:
+                reused[key] = probs
+        REGISTRY.inc("moderation_predictions_total", len(reused), source="near_duplicate")
+        return reused
+
+    def _lookup_known(self, texts, keys=None):
+        """Cached or stored probabilities for texts (None where unknown), without inference"""
+        cache = self.cache
+        store = self.verdict_store
+        if cache is None and store is None:
+            return [None] * len(texts)
+
+        if keys is None:
+            keys = [content_key(self.model_id, text) for text in texts]
+        known = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            probs = cache.get(key) if cache is not None else None
+            if probs is None:
+                missing.append(key)
+            else:
+                known[key] = probs
+        REGISTRY.inc("moderation_predictions_total", len(known), source="cache")
+
+        # Consult the on-disk store before paying for a forward pass
+        if missing and store is not None:
+            try:
+                stored = store.get_many(missing)
+            except Exception as e:
+                self.logger.warning("Verdict store lookup failed: %s", e)
+                stored = {}
+            REGISTRY.inc("moderation_predictions_total", len(stored), source="store")
+            for key, probs in stored.items():
+                known[key] = probs
+                if cache is not None:
+                    cache.put(key, probs)
+
+        return [known.get(key) for key in keys]
+
+    def _lookup_or_score(self, texts):
+        """Class probabilities for texts, served from the cache or verdict store where possible"""
+        cache = self.cache
+        store = self.verdict_store
+        near_duplicates = self.near_duplicates
+        if cache is None and store is None and near_duplicates is None:
+            REGISTRY.inc("moderation_predictions_total", len(texts), source="model")
+            return self._score(texts)
+
+        model_id = self.model_id
+        keys = [content_key(model_id, text) for text in texts]
+        probabilities = self._lookup_known(texts, keys)
+        known = {key: probs for key, probs in zip(keys, probabilities) if probs is not None}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in known:
+                missing[key] = text
+
+        if missing and near_duplicates is not None:
+            for key, probs in self._lookup_near_duplicates(missing).items():
+                known[key] = probs
+                del missing[key]
+
+        # Score each distinct unknown text once
+        if missing:
+            REGISTRY.inc("moderation_predictions_total", len(missing), source="model")
+            scored = dict(zip(missing, self._score(list(missing.values()))))
+            known.update(scored)
+            if near_duplicates is not None:
+                for key, probs in scored.items():
+                    near_duplicates.add(missing[key], probs)
+            if cache is not None:
+                for key, probs in scored.items():
+                    cache.put(key, probs)
+            if store is not None:
+                try:
+                    store.put_many(scored, model_id)
+                except Exception as e:
+                    self.logger.warning("Verdict store write failed: %s", e)
+
+        return [known[key] for key in keys]
+
+    def _load_on_demand(self):
+        """Load the model the first time a text actually needs inference"""
+        with self._load_lock:
+            if not self.is_ready() and not (self.load_on_demand and self.load_model()):
+                raise RuntimeError("Model not loaded")
+
+    def _score(self, texts):
+        """Class probabilities for non-empty texts, via the worker pool or batcher when enabled"""
+        if not self.is_ready():
+            self._load_on_demand()
+
+        if self.worker_pool is not None:
+            # Workers run this same method, including long-text chunking
+            return self.worker_pool.score(texts)
+
+        if self.long_text_mode != "chunk":
+            return self._score_windows(texts)
+
+        # Every WordPiece token covers at least one character, so short texts
+        # can skip the length check; longer ones are tokenized once to decide
+        probabilities = [None] * len(texts)
+        short = []
+        for index, text in enumerate(texts):
+            if len(text) > self.window_tokens:
+                with REGISTRY.stage("tokenize"):
+                    token_ids = self.tokenizer(text, add_special_tokens=False)["input_ids"]
+                if len(token_ids) > self.window_tokens:
+                    probabilities[index] = self._score_long(token_ids)
+                    continue
+            short.append(index)
+
+        if short:
+            scored = self._score_windows([texts[index] for index in short])
+            for index, probs in zip(short, scored):
+                probabilities[index] = probs
+        return probabilities
+
+    def _score_windows(self, texts):
+        """Class probabilities for texts that fit in one model window"""
+        batcher = self.batcher
+        if batcher is None:
+            # Bound memory on large bulk requests
+            size = ModerationConfig.BATCH_MAX_SIZE
+            probabilities = []
+            for start in range(0, len(texts), size):
+                probabilities.extend(self._forward(texts[start : start + size]))
+            return probabilities
+
+        futures = [batcher.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    @property
+    def window_tokens(self):
+        """Content tokens per model window ([CLS] and [SEP] take two of the sequence cap)"""
+        return ModerationConfig.MAX_SEQUENCE_LENGTH - self.tokenizer.num_special_tokens_to_add()
+
+    def _score_long(self, token_ids):
+        """
+        Score a long text as overlapping windows and combine them with the
+        configured policy, stopping early once a window crosses the block threshold
+        """
+        window = self.window_tokens
+        overlap = ModerationConfig.CHUNK_OVERLAP_TOKENS
+        starts = range(0, max(1, len(token_ids) - overlap), max(1, window - overlap))
+        windows = [token_ids[start : start + window] for start in starts]
+        windows = windows[: ModerationConfig.CHUNK_MAX_WINDOWS]
+
+        aggregation = ModerationConfig.CHUNK_AGGREGATION
+        window_probs = []
+        size = ModerationConfig.BATCH_MAX_SIZE
+        for start in range(0, len(windows), size):
+            scored = self._forward_ids(windows[start : start + size])
+            window_probs.extend(scored)
+            # Under max aggregation one blocking window decides the verdict
+            if aggregation == "max" and any(self._blocks(probs) for probs in scored):
+                break
+
+        if aggregation == "mean":
+            return [sum(column) / len(window_probs) for column in zip(*window_probs)]
+        return max(window_probs, key=lambda probs: probs[HATE_CLASS])
+
+    def _special_token_template(self):
+        """
+        Special tokens the tokenizer puts before and after content (e.g. [CLS] ... [SEP]),
+        derived by encoding a probe text with and without them
+        """
+        with_special = self.tokenizer("a")["input_ids"]
+        plain = self.tokenizer("a", add_special_tokens=False)["input_ids"]
+        for start in range(len(with_special) - len(plain) + 1):
+            if with_special[start : start + len(plain)] == plain:
+                return with_special[:start], with_special[start + len(plain) :]
+        raise RuntimeError("Could not locate content tokens in the tokenizer template")
+
+    def _blocks(self, probs):
+        """Whether probabilities would produce a blocking verdict"""
+        predicted_class = max(range(len(probs)), key=probs.__getitem__)
+        return predicted_class == HATE_CLASS and probs[HATE_CLASS] >= self.confidence_threshold
+
+    def _forward(self, texts):
+        """Tokenize texts and return per-text class probabilities"""
+        started = time.perf_counter()
+        features = self._encode(texts)
+        return self._forward_features(features, time.perf_counter() - started)
+
+    def _encode(self, texts):
+        """Token features per text, truncated to the model's sequence cap"""
+        encodings = self.tokenizer(
+            texts, truncation=True, max_length=ModerationConfig.MAX_SEQUENCE_LENGTH
+        )
+        names = list(encodings.keys())
+        return [{name: encodings[name][index] for name in names} for index in range(len(texts))]
+
+    def _tokenize_batch(self, texts):
+        """Pipeline prepare stage: one padded model input per length bucket"""
+        with REGISTRY.stage("tokenize"):
+            return self._pad_buckets(self._encode(texts))
+
+    def _forward_inputs(self, inputs):
+        """Pipeline forward stage: logits for one padded bucket"""
+        with REGISTRY.stage("forward"):
+            return self.backend.forward(inputs)
+
+    def _logits_to_probabilities(self, logits):
+        """Pipeline finish stage: per-text class probabilities"""
+        with REGISTRY.stage("postprocess"):
+            return self.backend.probabilities(logits)
+
+    def _forward_ids(self, windows):
+        """Forward pass over already-tokenized windows (without special tokens)"""
+        features = []
+        prefix, suffix = self._special_token_template()
+        for window in windows:
+            input_ids = prefix + list(window) + suffix
+            feature = {"input_ids": input_ids, "attention_mask": [1] * len(input_ids)}
+            if "token_type_ids" in self.tokenizer.model_input_names:
+                feature["token_type_ids"] = [0] * len(input_ids)
+            features.append(feature)
+        return self._forward_features(features)
+
+    def _forward_features(self, features, tokenize_seconds=0.0):
+        """
+        Run tokenized inputs through the model, one padded batch per length bucket
+        tokenize_seconds: time already spent tokenizing, reported with the padding time
+        """
+        backend = self.backend
+        started = time.perf_counter()
+        padded = self._pad_buckets(features)
 
-            # Log high-confidence detections (only in debug mode)
-            if result["should_block"]:
-                self.logger.debug(
-                    f"Blocking content - Label: {label}, Confidence: {confidence:.3f}"
+        probabilities = [None] * len(features)
+        # Stage time summed over the buckets of this call
+        elapsed = {
+            "tokenize": tokenize_seconds + time.perf_counter() - started,
+            "forward": 0.0,
+            "postprocess": 0.0,
+        }
+        for bucket, inputs in padded:
+            started = time.perf_counter()
+            logits = backend.forward(inputs)
+            forwarded = time.perf_counter()
+            for index, probs in zip(bucket, backend.probabilities(logits)):
+                probabilities[index] = probs
+            elapsed["forward"] += forwarded - started
+            elapsed["postprocess"] += time.perf_counter() - forwarded
+
+        for stage, seconds in elapsed.items():
+            REGISTRY.observe("moderation_stage_seconds", seconds, stage=stage)
+        return probabilities
+
+    def _pad_buckets(self, features):
+        """
+        Pad features into one model input per length bucket
+        Returns: list of (indices, inputs)
+        """
+        lengths = [len(feature["input_ids"]) for feature in features]
+        buckets = self._length_buckets(lengths)
+        self._record_padding(lengths, buckets)
+        padded = []
+        for bucket in buckets:
+            inputs = self.tokenizer.pad(
+                [features[index] for index in bucket], return_tensors=self.backend.tensor_type
+            )
+            padded.append((bucket, inputs))
+            REGISTRY.observe("moderation_forward_batch_size", len(bucket))
+        return padded
+
+    def _length_buckets(self, lengths):
+        """
+        Group indices of similar token length so short titles aren't padded up to
+        long bodies; a new bucket starts once a text is both BUCKET_LENGTH_RATIO times
+        and BUCKET_MIN_GAP_TOKENS longer than the bucket's shortest text
+        """
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+        if not ModerationConfig.PADDING_BUCKETS:
+            return [order]
+
+        buckets = []
+        current = []
+        for index in order:
+            length = lengths[index]
+            if current:
+                shortest = lengths[current[0]]
+                too_long = (
+                    length > shortest * ModerationConfig.BUCKET_LENGTH_RATIO
+                    and length - shortest >= ModerationConfig.BUCKET_MIN_GAP_TOKENS
+                )
+                over_budget = (
+                    ModerationConfig.MAX_BATCH_TOKENS
+                    and (len(current) + 1) * length > ModerationConfig.MAX_BATCH_TOKENS
                 )
+                if too_long or over_budget:
+                    buckets.append(current)
+                    current = []
+            current.append(index)
+        if current:
+            buckets.append(current)
+        return buckets
 
-            return result
+    def _record_padding(self, lengths, buckets):
+        """Track real vs padded tokens to report padding efficiency"""
+        padded = sum(len(bucket) * max(lengths[index] for index in bucket) for bucket in buckets)
+        with self._stats_lock:
+            self._padding["forward_passes"] += len(buckets)
+            self._padding["real_tokens"] += sum(lengths)
+            self._padding["padded_tokens"] += padded
+            # What a single padded batch would have cost, to show what bucketing saves
+            self._padding["unbucketed_padded_tokens"] += len(lengths) * max(lengths)
 
-        except Exception as e:
-            self.logger.error(f"Error during prediction: {e}")
-            return {
-                "text": text,
-                "label": "ERROR",
-                "confidence": 0.0,
-                "is_hate": False,
-                "should_block": False,
-                "error": str(e),
-            }
+    def _padding_stats(self):
+        """Padding efficiency: real tokens / padded tokens"""
+        with self._stats_lock:
+            stats = dict(self._padding)
+        padded = stats["padded_tokens"]
+        unbucketed = stats["unbucketed_padded_tokens"]
+        stats["efficiency"] = stats["real_tokens"] / padded if padded else 1.0
+        stats["unbucketed_efficiency"] = stats["real_tokens"] / unbucketed if unbucketed else 1.0
+        return stats
+
+    def _build_result(self, text, probs):
+        """Turn class probabilities into a prediction dict"""
+        predicted_class = max(range(len(probs)), key=probs.__getitem__)
+        confidence = probs[predicted_class]
+
+        # Map class to label (MetaHateBERT specific)
+        label_map = {0: "NOT_HATE", HATE_CLASS: "HATE"}
+        label = label_map.get(predicted_class, f"CLASS_{predicted_class}")
+
+        result = {
+            "text": text,
+            "label": label,
+            "confidence": confidence,
+            "is_hate": label == "HATE",
+            "should_block": label == "HATE" and confidence >= self.confidence_threshold,
+        }
+
+        # Log high-confidence detections (only in debug mode)
+        if result["should_block"]:
+            self.logger.debug("Blocking content - Label: %s, Confidence: %.3f", label, confidence)
+
+        return result
+
+    def _unscored_result(self, text):
+        """Explicit fail-open for a text shed without a verdict"""
+        return {
+            "text": text,
+            "label": "UNSCORED",
+            "confidence": 0.0,
+            "is_hate": False,
+            "should_block": False,
+            "degraded": "fail_open",
+        }
+
+    def _error_result(self, text, error):
+        """Prediction dict used when inference could not run"""
+        return {
+            "text": text,
+            "label": "ERROR",
+            "confidence": 0.0,
+            "is_hate": False,
+            "should_block": False,
+            "error": error,
+        }
 
     def moderate_content(self, content_data):
         """
@@ -153,16 +931,177 @@ class ContentModerator:
         Returns:
             dict with moderation results
         """
-        if not isinstance(content_data, dict):
-            self.logger.error("Invalid content_data: must be a dictionary")
-            return {
-                "allowed": True,  # Fail-safe: allow on error
-                "blocked_reason": None,
-                "predictions": {},
-                "overall_confidence": 0.0,
-                "error": "Invalid input format",
-            }
+        return self.moderate_contents([content_data])[0]
+
+    def moderate_contents(self, content_items, allow_inference=True):
+        """
+        Moderate several forum posts in as few forward passes as possible
+        Args:
+            content_items: list of dicts with 'title', 'content', 'author' etc.
+            allow_inference: False answers without the model (see predict_hate_speech_batch);
+                affected results carry "degraded": cache | prefilter | fail_open
+        Returns:
+            list of moderation result dicts in input order
+        """
+        with REGISTRY.time("moderation_moderate_seconds"):
+            results = self._moderate_items(content_items, allow_inference)
+        for result in results:
+            REGISTRY.inc("moderation_requests_total", outcome=moderation_outcome(result))
+        return results
+
+    def _moderate_items(self, content_items, allow_inference=True):
+        """moderate_contents without the metrics hooks"""
+        # Collect every title and content into one prediction batch
+        texts = []
+        fields_per_item = []
+        for content_data in content_items:
+            if not isinstance(content_data, dict):
+                fields_per_item.append(None)
+                continue
+
+            fields = {}
+            for field in ("title", "content"):
+                if content_data.get(field):
+                    fields[field] = len(texts)
+                    texts.append(content_data[field])
+            fields_per_item.append(fields)
+
+        try:
+            predictions = (
+                self.predict_hate_speech_batch(texts, allow_inference) if texts else []
+            )
+        except Exception as e:
+            self.logger.error("Error during content moderation: %s", e)
+            predictions = None
+            prediction_error = str(e)
+
+        results = []
+        for fields in fields_per_item:
+            if fields is None:
+                self.logger.error("Invalid content_data: must be a dictionary")
+                results.append(
+                    {
+                        "allowed": True,  # Fail-safe: allow on error
+                        "blocked_reason": None,
+                        "predictions": {},
+                        "overall_confidence": 0.0,
+                        "error": INVALID_INPUT_ERROR,
+                    }
+                )
+            elif predictions is None:
+                results.append(self._failed_moderation_result(prediction_error))
+            else:
+                field_predictions = {field: predictions[index] for field, index in fields.items()}
+                result = self._build_moderation_result(field_predictions)
+                stage = worst_stage(
+                    prediction.get("degraded") for prediction in field_predictions.values()
+                )
+                if stage:
+                    result["degraded"] = stage
+                results.append(result)
+
+        return results
+
+    def moderate_edit(self, content_data, post_id=None, previous_hash=None):
+        """
+        Re-moderate an edited post, running the model only on changed parts of its body
+        The content is split into segments (see edit_tracker.split_segments);
+        segments unchanged since the version identified by post_id or
+        previous_hash reuse their probabilities and the segment scores are combined
+        with CHUNK_AGGREGATION, like the windows of a long text. Each segment is
+        scored without its neighbours as context, so verdicts can differ slightly
+        from moderate_content() on the same post
+        Returns:
+            moderation result dict plus "content_hash" (pass it as previous_hash
+            for the next edit) and "segments" counts
+        """
+        with REGISTRY.time("moderation_moderate_seconds"):
+            result = self._moderate_edit(content_data, post_id, previous_hash)
+        REGISTRY.inc("moderation_requests_total", outcome=moderation_outcome(result))
+        return result
+
+    def _moderate_edit(self, content_data, post_id, previous_hash):
+        """moderate_edit without the metrics hooks"""
+        content = content_data.get("content") if isinstance(content_data, dict) else None
+        if not content:
+            return self._moderate_items([content_data])[0]
+
+        try:
+            field_predictions = {}
+            if content_data.get("title"):
+                title = content_data["title"]
+                field_predictions["title"] = self.predict_hate_speech_batch([title])[0]
+
+            text = self._prepare_text(content)
+            version = content_hash(text)
+            segments = split_segments(text, ModerationConfig.SEGMENT_MAX_CHARS)
+            model_id = self.model_id
+            keys = [content_key(model_id, segment) for segment in segments]
+            changed = {}
+            if segments:
+                tracker = self.edit_tracker
+                previous = tracker.get(post_id, previous_hash) if tracker is not None else None
+                known = {key: previous[key] for key in keys if previous and key in previous}
+                changed = {key: segment for key, segment in zip(keys, segments) if key not in known}
+                REGISTRY.inc(
+                    "moderation_predictions_total", len(set(keys)) - len(changed), source="edit"
+                )
+                if changed:
+                    known.update(self._score_segments(changed))
+                if tracker is not None:
+                    tracker.put(post_id, version, known, reused=len(known) - len(changed))
+
+                probs = self._combine_segments([known[key] for key in keys], segments)
+                field_predictions["content"] = self._build_result(text, probs)
+            else:
+                # Whitespace only: answered without the model, like any empty text
+                field_predictions["content"] = self.predict_hate_speech_batch([text])[0]
+        except Exception as e:
+            self.logger.error("Error during edit moderation: %s", e)
+            return self._failed_moderation_result(str(e))
+
+        result = self._build_moderation_result(field_predictions)
+        result["content_hash"] = version
+        result["segments"] = {
+            "total": len(segments),
+            "reused": len(segments) - sum(1 for key in keys if key in changed),
+            "scored": len(changed),
+        }
+        return result
+
+    def _score_segments(self, segments_by_key):
+        """
+        Probabilities of changed segments, by key, through the same tiers as
+        predict_hate_speech_batch: pre-filter, then cache/store/near-duplicates,
+        then the model
+        """
+        scored = {}
+        audited = set()
+        pending = segments_by_key
+        if self.prefilter is not None:
+            scored, audited = self._prefilter_tier(segments_by_key)
+            pending = {key: segment for key, segment in pending.items() if key not in scored}
+        if pending:
+            scored.update(zip(pending, self._lookup_or_score(list(pending.values()))))
+        for key in audited:
+            segment = segments_by_key[key]
+            self.prefilter.record_audit(segment, self._build_result(segment, scored[key]))
+        return scored
+
+    def _combine_segments(self, probabilities, segments):
+        """Post-level probabilities from segment scores under CHUNK_AGGREGATION"""
+        if ModerationConfig.CHUNK_AGGREGATION == "mean":
+            # Weighted by length so a short edited line doesn't outweigh the body
+            weights = [len(segment) for segment in segments]
+            total = sum(weights)
+            return [
+                sum(weight * probs[column] for weight, probs in zip(weights, probabilities)) / total
+                for column in range(len(probabilities[0]))
+            ]
+        return max(probabilities, key=lambda probs: probs[HATE_CLASS])
 
+    def _build_moderation_result(self, field_predictions):
+        """Apply the blocking rules to the title/content predictions of one post"""
         results = {
             "allowed": True,
             "blocked_reason": None,
@@ -173,8 +1112,8 @@ class ContentModerator:
 
         try:
             # Check title if present
-            if content_data.get("title"):
-                title_result = self.predict_hate_speech(content_data["title"])
+            if "title" in field_predictions:
+                title_result = field_predictions["title"]
                 results["predictions"]["title"] = title_result
 
                 if title_result["should_block"]:
@@ -182,12 +1121,12 @@ class ContentModerator:
                     results["blocked_reason"] = (
                         f"Inappropriate title detected (confidence: {title_result['confidence']:.2f})"
                     )
-                    self.logger.debug(f"Blocked content - Title moderation")
+                    self.logger.debug("Blocked content - Title moderation")
                     return results
 
             # Check content
-            if content_data.get("content"):
-                content_result = self.predict_hate_speech(content_data["content"])
+            if "content" in field_predictions:
+                content_result = field_predictions["content"]
                 results["predictions"]["content"] = content_result
 
                 if content_result["should_block"]:
@@ -195,7 +1134,7 @@ class ContentModerator:
                     results["blocked_reason"] = (
                         f"Inappropriate content detected (confidence: {content_result['confidence']:.2f})"
                     )
-                    self.logger.debug(f"Blocked content - Content moderation")
+                    self.logger.debug("Blocked content - Content moderation")
                     return results
 
             # Calculate overall confidence
@@ -209,21 +1148,24 @@ class ContentModerator:
 
             # Log successful moderation
             self.logger.debug(
-                f"Content allowed - Max confidence: {results['overall_confidence']:.3f}"
+                "Content allowed - Max confidence: %.3f", results["overall_confidence"]
             )
             return results
 
         except Exception as e:
-            self.logger.error(f"Error during content moderation: {e}")
-            # Fail-safe: allow content on error
-            return {
-                "allowed": True,
-                "blocked_reason": None,
-                "predictions": {},
-                "overall_confidence": 0.0,
-                "error": str(e),
-                "timestamp": self._get_timestamp(),
-            }
+            self.logger.error("Error during content moderation: %s", e)
+            return self._failed_moderation_result(str(e))
+
+    def _failed_moderation_result(self, error):
+        """Fail-safe: allow content on error"""
+        return {
+            "allowed": True,
+            "blocked_reason": None,
+            "predictions": {},
+            "overall_confidence": 0.0,
+            "error": error,
+            "timestamp": self._get_timestamp(),
+        }
 
     def _get_timestamp(self):
         """Get current timestamp for logging"""
@@ -232,13 +1174,58 @@ class ContentModerator:
         return datetime.now().isoformat()
 
 
-# Initialize global moderator instance
-moderator = ContentModerator()
+def inference_failed(result):
+    """
+    Whether the model path failed for a moderation result (prediction error or
+    model unavailable); a rejected input is the caller's mistake, not overload
+    """
+    if result.get("error") and result["error"] != INVALID_INPUT_ERROR:
+        return True
+    return any(
+        prediction.get("label") == "ERROR" for prediction in result.get("predictions", {}).values()
+    )
+
+
+def moderation_outcome(result):
+    """allowed / blocked / error label of a moderation result, for metrics"""
+    if result.get("error") or any(
+        prediction.get("label") == "ERROR" for prediction in result.get("predictions", {}).values()
+    ):
+        return "error"
+    return "allowed" if result["allowed"] else "blocked"
+
+
+def without_text(result):
+    """Copy of a moderation result without the input text echoed in each prediction"""
+    predictions = result.get("predictions")
+    if not predictions:
+        return result
+    compact = dict(result)
+    compact["predictions"] = {
+        field: {key: value for key, value in prediction.items() if key != "text"}
+        for field, prediction in predictions.items()
+    }
+    return compact
+
+
+# Process-wide moderator for the CLI and bulk entry points, created on first use
+# so importing this module doesn't open the verdict store or start logging
+_moderator = None
+_moderator_lock = threading.Lock()
+
+
+def get_moderator():
+    """The shared ContentModerator, constructed on first call"""
+    global _moderator
+    with _moderator_lock:
+        if _moderator is None:
+            _moderator = ContentModerator()
+        return _moderator
 
 
 def initialize_moderation_service():
     """Initialize the moderation service - call this on server startup"""
-    return moderator.load_model()
+    return get_moderator().load_model()
 
 
 def moderate_forum_content(content_data):
@@ -246,4 +1233,12 @@ def moderate_forum_content(content_data):
     Main function to moderate forum content
     Usage in your forum routes
     """
-    return moderator.moderate_content(content_data)
+    return get_moderator().moderate_content(content_data)
+
+
+def moderate_forum_contents(content_items):
+    """
+    Moderate a list of forum posts in one call
+    Usage for bulk imports and backfills
+    """
+    return get_moderator().moderate_contents(content_items)
@@ -3,74 +3,520 @@
 Persistent moderation service that keeps the model loaded in memory
 Runs as a background service to provide fast moderation responses
 """
+import time
+
+# Taken before the remaining imports so the startup breakdown covers them
+_PROCESS_START = time.perf_counter()
+
 import sys
 import os
+import gc
+import hmac
 import json
-import time
+import logging
+import random
 import signal
 import threading
 from datetime import datetime, timedelta
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import urllib.parse
 
 # Add current directory to path
 sys.path.append(os.path.dirname(__file__))
 
-from moderationService import ContentModerator, initialize_moderation_service
+from admission import AdmissionController, worst_stage
+from binary_protocol import FramedModerationServer, unix_sockets_supported
+from config import ModerationConfig
+from inference_backends import BACKENDS
+from job_queue import PRIORITIES, JobQueue, JobRunner
+from metrics import REGISTRY
+from moderationService import ContentModerator, inference_failed, without_text
+from shadow import ShadowScorer
+from structured_logging import get_logger
+from structured_logging import get_stats as logging_stats
+
+access_logger = get_logger("access")
+# Access log volume is governed by ACCESS_LOG_SAMPLE_RATE rather than LOG_LEVEL
+access_logger.setLevel(logging.INFO)
 
 # Global variables for graceful shutdown
 server_instance = None
 shutdown_requested = False
 
 
+class InFlightLimiter:
+    """Caps concurrent moderation requests so overload is rejected instead of queued invisibly"""
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Reserve a slot, returning False when the cap is reached"""
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return True
+
+    def release(self):
+        """Free a slot reserved by try_acquire"""
+        with self._lock:
+            self.in_flight -= 1
+
+    def get_stats(self):
+        """Current load for the stats endpoint"""
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "max_in_flight": self.max_in_flight,
+                "rejected": self.rejected,
+            }
+
+
+class ModerationServer(ThreadingHTTPServer):
+    """Thread-per-request HTTP server so health checks never wait behind inference"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        server_address,
+        handler_class,
+        max_in_flight,
+        moderator=None,
+        job_runner=None,
+        admission=None,
+    ):
+        # Each connection serves with the moderator current when it arrived
+        self.moderator = moderator
+        self.limiter = InFlightLimiter(max_in_flight)
+        self.job_runner = job_runner
+        self.admission = admission
+        self.shadow = None
+        self.model_manager = ModelManager(self)
+        self.idle_shutdown = False
+        super().__init__(server_address, handler_class)
+
+    def swap_moderator(self, moderator):
+        """Serve new connections (and queued jobs) with moderator; returns the old one"""
+        previous = self.moderator
+        self.moderator = moderator
+        if self.job_runner is not None:
+            self.job_runner.moderator = moderator
+        return previous
+
+    def hold_moderator(self):
+        """
+        The current moderator, held against retire() until release_hold()
+        Re-checked after holding so a swap in between can't hand out a retired one
+        """
+        while True:
+            moderator = self.moderator
+            moderator.hold()
+            if self.moderator is moderator:
+                return moderator
+            moderator.release_hold()
+
+    def drain(self, timeout):
+        """Wait for in-flight requests to finish; returns how many were left"""
+        deadline = time.monotonic() + timeout
+        while self.limiter.get_stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.limiter.get_stats()["in_flight"]
+
+    def moderate(self, moderator, items):
+        """
+        Moderate items through the model when the admission controller has room,
+        otherwise answer them degraded and record each degraded verdict
+        (shared by the HTTP handler and the framed socket protocol)
+        """
+        admission = self.admission
+        if admission is not None and not admission.try_acquire():
+            results = moderator.moderate_contents(items, allow_inference=False)
+            for item, result in zip(items, results):
+                self.record_degraded(moderator, item, result)
+            return results
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            results = moderator.moderate_contents(items)
+            ok = not any(inference_failed(result) for result in results)
+        finally:
+            latency = time.perf_counter() - started
+            if admission is not None:
+                admission.release(latency, ok)
+
+        shadow = self.shadow
+        if shadow is not None:
+            shadow.offer(items, results, latency)
+        return results
+
+    def moderate_edit(self, moderator, item, post_id=None, previous_hash=None):
+        """
+        Re-moderate an edited post through moderator.moderate_edit when the
+        admission controller has room, otherwise answer it degraded like moderate()
+        """
+        admission = self.admission
+        if admission is not None and not admission.try_acquire():
+            result = moderator.moderate_contents([item], allow_inference=False)[0]
+            self.record_degraded(moderator, item, result)
+            return result
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = moderator.moderate_edit(item, post_id=post_id, previous_hash=previous_hash)
+            ok = not inference_failed(result)
+        finally:
+            if admission is not None:
+                admission.release(time.perf_counter() - started, ok)
+        return result
+
+    def record_degraded(self, moderator, item, result):
+        """Count and log a degraded verdict, queueing unscored posts for re-moderation"""
+        stage = result.get("degraded")
+        if not stage:
+            return
+        REGISTRY.inc("moderation_degraded_total", stage=stage)
+        if stage == "cache":
+            # A cached verdict is the model's own; nothing to redo
+            return
+
+        job_id = None
+        runner = self.job_runner
+        if runner is not None and isinstance(item, dict):
+            try:
+                job_id = runner.queue.enqueue(item, "backfill")
+                runner.notify()
+                result["remoderation_job"] = job_id
+            except Exception as e:
+                moderator.logger.warning("Could not queue degraded post for re-moderation: %s", e)
+        moderator.logger.warning(
+            "Degraded verdict (%s)",
+            stage,
+            extra={
+                "stage": stage,
+                "allowed": result.get("allowed"),
+                "remoderation_job": job_id,
+                "post": json.dumps(item)[:500],
+            },
+        )
+
+
 class ModerationHandler(BaseHTTPRequestHandler):
+    # A client that stalls mid-request is disconnected instead of holding a thread
+    timeout = ModerationConfig.REQUEST_TIMEOUT
+
     def __init__(self, *args, moderator=None, **kwargs):
         self.moderator = moderator
         super().__init__(*args, **kwargs)
 
     def do_POST(self):
         """Handle POST requests for moderation"""
+        # Enqueueing is cheap, so it isn't subject to the in-flight cap
+        if self.path == "/jobs":
+            self.handle_job_submit()
+            return
+        if self.path in ("/admin/reload", "/admin/shadow"):
+            self.handle_admin()
+            return
+
+        limiter = self.server.limiter
+        if not limiter.try_acquire():
+            self.send_busy()
+            return
+
+        try:
+            if self.path == "/batch":
+                self.handle_batch()
+            elif self.path == "/moderate/edit":
+                self.handle_edit()
+            else:
+                self.handle_single()
+        finally:
+            limiter.release()
+
+    def handle_single(self):
+        """Moderate one {title, content} post"""
         try:
             # Parse content length
             content_length = int(self.headers["Content-Length"])
             post_data = self.rfile.read(content_length)
 
             # Parse JSON data
-            data = json.loads(post_data.decode("utf-8"))
-
-            # Update last used time
-            self.moderator.last_used = datetime.now()
+            with REGISTRY.stage("parse"):
+                data = json.loads(post_data.decode("utf-8"))
 
-            # Moderate content
-            result = self.moderator.moderate_content(data)
+            # Moderate content (degraded when the admission controller sheds it)
+            result = self.server.moderate(self.moderator, [data])[0]
+            if not self.echo_text():
+                result = without_text(result)
 
             # Send response
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps(result).encode("utf-8"))
+            self.send_json(200, result, headers=self.degraded_headers([result]), timed=True)
 
         except Exception as e:
+            REGISTRY.inc("moderation_requests_total", outcome="error")
+            REGISTRY.inc("moderation_degraded_total", stage="error")
             # Send error response
-            self.send_response(500)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
             error_response = {
                 "allowed": True,  # Default to allowing on error
                 "error": str(e),
                 "reason": "Moderation service error",
             }
-            self.wfile.write(json.dumps(error_response).encode("utf-8"))
+            self.send_json(500, error_response, headers={"X-Moderation-Degraded": "error"})
+
+    def handle_batch(self):
+        """Moderate a list of posts: {"items": [{title, content}, ...]} or a bare list"""
+        items = None
+        try:
+            content_length = int(self.headers["Content-Length"])
+            post_data = self.rfile.read(content_length)
+            with REGISTRY.stage("parse"):
+                data = json.loads(post_data.decode("utf-8"))
+            items = data.get("items") if isinstance(data, dict) else data
+
+            if not isinstance(items, list):
+                self.send_json(400, {"error": "Expected a list of items"})
+                return
+            if len(items) > ModerationConfig.BATCH_MAX_ITEMS:
+                self.send_json(
+                    400,
+                    {
+                        "error": f"Too many items ({len(items)}), "
+                        f"limit is {ModerationConfig.BATCH_MAX_ITEMS}"
+                    },
+                )
+                return
+
+            results = self.server.moderate(self.moderator, items)
+            if not self.echo_text():
+                results = [without_text(result) for result in results]
+            self.send_json(
+                200,
+                {"count": len(results), "results": results},
+                headers=self.degraded_headers(results),
+                timed=True,
+            )
+
+        except Exception as e:
+            REGISTRY.inc("moderation_requests_total", outcome="error")
+            REGISTRY.inc("moderation_degraded_total", stage="error")
+            error_result = {
+                "allowed": True,  # Default to allowing on error
+                "error": str(e),
+                "reason": "Moderation service error",
+            }
+            count = len(items) if isinstance(items, list) else 0
+            self.send_json(
+                500,
+                {"count": count, "results": [error_result] * count, "error": str(e)},
+                headers={"X-Moderation-Degraded": "error"},
+            )
+
+    def handle_edit(self):
+        """
+        Re-moderate an edited post: {post_id?, previous_hash?, title, content}
+        Only changed segments of the content are scored; the response adds
+        content_hash (the previous_hash for the next edit) and segment counts
+        """
+        try:
+            content_length = int(self.headers["Content-Length"])
+            post_data = self.rfile.read(content_length)
+            with REGISTRY.stage("parse"):
+                data = json.loads(post_data.decode("utf-8"))
+            if not isinstance(data, dict):
+                self.send_json(400, {"error": "Expected a post object"})
+                return
+
+            post_id = data.pop("post_id", None)
+            previous_hash = data.pop("previous_hash", None)
+            result = self.server.moderate_edit(self.moderator, data, post_id, previous_hash)
+            if not self.echo_text():
+                result = without_text(result)
+            self.send_json(200, result, headers=self.degraded_headers([result]), timed=True)
+
+        except Exception as e:
+            REGISTRY.inc("moderation_requests_total", outcome="error")
+            REGISTRY.inc("moderation_degraded_total", stage="error")
+            error_response = {
+                "allowed": True,  # Default to allowing on error
+                "error": str(e),
+                "reason": "Moderation service error",
+            }
+            self.send_json(500, error_response, headers={"X-Moderation-Degraded": "error"})
+
+    def echo_text(self):
+        """Whether predictions repeat the input text (ECHO_TEXT, or X-Moderation-Echo-Text)"""
+        header = self.headers.get("X-Moderation-Echo-Text")
+        if header is None:
+            return ModerationConfig.ECHO_TEXT
+        return header.lower() not in ("0", "false", "no")
+
+    def degraded_headers(self, results):
+        """X-Moderation-Degraded with the most severe degraded stage, if any"""
+        stage = worst_stage(result.get("degraded") for result in results)
+        return {"X-Moderation-Degraded": stage} if stage else None
+
+    def handle_admin(self):
+        """
+        POST /admin/reload {"model", "backend", "threshold"}: load a model in the
+        background and swap it in once warm (a threshold alone applies at once)
+        POST /admin/shadow {"model", "backend", "percent"}: shadow-score a share of
+        traffic with a candidate model; percent 0 stops shadowing
+        """
+        content_length = int(self.headers.get("Content-Length") or 0)
+        post_data = self.rfile.read(content_length)
+        if not self.admin_authorized():
+            self.send_json(403, {"error": "Admin endpoints need X-Admin-Token (or a local client)"})
+            return
+
+        manager = self.server.model_manager
+        try:
+            data = json.loads(post_data.decode("utf-8") or "{}")
+            if not isinstance(data, dict):
+                raise ValueError("Expected a JSON object")
+            backend = data.get("backend")
+            if backend is not None and backend not in BACKENDS:
+                raise ValueError(f"backend must be one of {list(BACKENDS)}")
+
+            if self.path == "/admin/reload":
+                threshold = data.get("threshold")
+                if threshold is not None and not 0.0 <= float(threshold) <= 1.0:
+                    raise ValueError("threshold must be between 0.0 and 1.0")
+                if not data.get("model") and backend is None:
+                    if threshold is None:
+                        raise ValueError("Give a model, backend or threshold")
+                    # Verdicts are thresholded per request, so no reload is needed
+                    self.moderator.confidence_threshold = float(threshold)
+                    self.send_json(200, {"status": "applied", "threshold": float(threshold)})
+                    return
+                started = manager.reload(
+                    data.get("model"),
+                    backend,
+                    float(threshold) if threshold is not None else None,
+                )
+            else:
+                percent = float(data.get("percent", 0))
+                if not 0.0 <= percent <= 100.0:
+                    raise ValueError("percent must be between 0 and 100")
+                if percent == 0:
+                    manager.stop_shadow()
+                    self.send_json(200, {"status": "stopped"})
+                    return
+                if not data.get("model"):
+                    raise ValueError("model is required")
+                started = manager.start_shadow(data["model"], backend, percent)
+        except (TypeError, ValueError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        if not started:
+            self.send_json(409, {"error": "A model load is already in progress", **manager.get_stats()})
+            return
+        self.send_json(202, manager.get_stats(), headers={"Location": self.path})
+
+    def admin_authorized(self):
+        """ADMIN_TOKEN when configured, otherwise loopback clients only"""
+        token = ModerationConfig.ADMIN_TOKEN
+        if token:
+            return hmac.compare_digest(self.headers.get("X-Admin-Token", ""), token)
+        return self.client_address[0] in ("127.0.0.1", "::1")
+
+    def handle_job_submit(self):
+        """Queue a post for asynchronous moderation: {"post": {...}, "priority": "new"}"""
+        runner = self.server.job_runner
+        content_length = int(self.headers.get("Content-Length") or 0)
+        post_data = self.rfile.read(content_length)
+        if runner is None:
+            self.send_json(404, {"error": "Asynchronous jobs are disabled (set JOB_QUEUE_PATH)"})
+            return
+
+        try:
+            data = json.loads(post_data.decode("utf-8"))
+            if not isinstance(data, dict):
+                raise ValueError("Expected a JSON object")
+            priority = data.get("priority", "new")
+            post = data.get("post", data)
+            if priority not in PRIORITIES:
+                raise ValueError(f"priority must be one of {list(PRIORITIES)}")
+            if not isinstance(post, dict):
+                raise ValueError("post must be a JSON object")
+            post = {key: value for key, value in post.items() if key != "priority"}
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        job_id = runner.queue.enqueue(post, priority)
+        runner.notify()
+        self.send_json(
+            202,
+            {"id": job_id, "status": "queued", "priority": priority},
+            headers={"Location": f"/jobs/{job_id}"},
+        )
+
+    def handle_job_status(self):
+        """Poll an asynchronous job"""
+        runner = self.server.job_runner
+        if runner is None:
+            self.send_json(404, {"error": "Asynchronous jobs are disabled (set JOB_QUEUE_PATH)"})
+            return
+
+        job = runner.queue.get(self.path[len("/jobs/"):])
+        if job is None:
+            self.send_json(404, {"error": "Unknown job"})
+        else:
+            self.send_json(200, job)
+
+    def send_busy(self):
+        """Reject a request with 503 once the in-flight cap is reached"""
+        # Drain the body so the client sees the response rather than a reset
+        content_length = int(self.headers.get("Content-Length") or 0)
+        if content_length:
+            self.rfile.read(content_length)
+
+        retry_after = ModerationConfig.RETRY_AFTER_SECONDS
+        self.send_json(
+            503,
+            {"error": "Moderation service busy", "retry_after": retry_after},
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    def send_json(self, status, payload, headers=None, timed=False):
+        """Write a JSON response (timed=True records the serialize stage)"""
+        if timed:
+            with REGISTRY.stage("serialize"):
+                body = json.dumps(payload).encode("utf-8")
+        else:
+            body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
 
     def do_GET(self):
         """Handle GET requests for health checks"""
         if self.path == "/health":
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
             health_data = {
                 "status": "healthy",
                 "model_loaded": self.moderator.model is not None,
+                "released_at": (
+                    self.moderator.released_at.isoformat()
+                    if self.moderator.released_at
+                    else None
+                ),
                 "last_used": (
                     self.moderator.last_used.isoformat()
                     if self.moderator.last_used
@@ -78,73 +524,492 @@ class ModerationHandler(BaseHTTPRequestHandler):
                 ),
                 "uptime": str(datetime.now() - self.moderator.start_time),
             }
-            self.wfile.write(json.dumps(health_data).encode("utf-8"))
+            self.send_json(200, health_data)
+        elif self.path == "/stats":
+            stats = self.moderator.get_stats()
+            stats["server"] = self.server.limiter.get_stats()
+            if self.server.job_runner is not None:
+                stats["jobs"] = self.server.job_runner.get_stats()
+            stats["logging"] = logging_stats()
+            if self.server.admission is not None:
+                stats["admission"] = self.server.admission.get_stats()
+            stats["model_manager"] = self.server.model_manager.get_stats()
+            if self.server.shadow is not None:
+                stats["shadow"] = self.server.shadow.get_stats()
+            self.send_json(200, stats)
+        elif self.path == "/metrics":
+            self.send_metrics()
+        elif self.path in ("/admin/reload", "/admin/shadow"):
+            if not self.admin_authorized():
+                self.send_json(403, {"error": "Admin endpoints need X-Admin-Token (or a local client)"})
+                return
+            stats = self.server.model_manager.get_stats()
+            if self.server.shadow is not None:
+                stats["shadow"] = self.server.shadow.get_stats()
+            self.send_json(200, stats)
+        elif self.path.startswith("/jobs/"):
+            self.handle_job_status()
         else:
             self.send_response(404)
             self.end_headers()
 
+    def send_metrics(self):
+        """Prometheus text exposition of request, stage, queue and process metrics"""
+        limiter_stats = self.server.limiter.get_stats()
+        admission = self.server.admission
+        admission_stats = admission.get_stats() if admission is not None else {}
+        gauges = [
+            (
+                "moderation_admission_limit",
+                "gauge",
+                "Adaptive limit on concurrent inference requests",
+                admission_stats.get("limit"),
+                None,
+            ),
+            (
+                "moderation_admission_shed_total",
+                "counter",
+                "Requests answered degraded by the admission controller",
+                admission_stats.get("shed"),
+                None,
+            ),
+            (
+                "moderation_in_flight_requests",
+                "gauge",
+                "HTTP moderation requests being processed",
+                limiter_stats["in_flight"],
+                None,
+            ),
+            (
+                "moderation_rejected_requests_total",
+                "counter",
+                "Requests rejected with 503 at the in-flight cap",
+                limiter_stats["rejected"],
+                None,
+            ),
+        ]
+        body = self.moderator.render_metrics(gauges).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-type", "text/plain; version=0.0.4; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_one_request(self):
+        self._request_started = time.perf_counter()
+        super().handle_one_request()
+
+    def log_request(self, code="-", size="-"):
+        """Sampled structured access log; error responses are always recorded"""
+        status = code.value if isinstance(code, HTTPStatus) else code
+        if not isinstance(status, int):
+            status = 0
+        if status < 400 and random.random() >= ModerationConfig.ACCESS_LOG_SAMPLE_RATE:
+            return
+        started = getattr(self, "_request_started", None)
+        access_logger.log(
+            logging.WARNING if status >= 500 else logging.INFO,
+            "%s %s %s",
+            self.command,
+            self.path,
+            status,
+            extra={
+                "method": self.command,
+                "path": self.path,
+                "status": status,
+                "size": size,
+                "client": self.client_address[0],
+                "duration_ms": (
+                    round((time.perf_counter() - started) * 1000.0, 3) if started else None
+                ),
+            },
+        )
+
     def log_message(self, format, *args):
-        """Override to provide custom logging"""
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {format % args}")
+        """Protocol errors from BaseHTTPRequestHandler go to the access log"""
+        access_logger.warning(format, *args, extra={"client": self.client_address[0]})
 
 
 class PersistentModerator(ContentModerator):
-    def __init__(self, idle_timeout_minutes=30):
-        super().__init__()
+    def __init__(self, idle_timeout_minutes=30, **model_options):
+        """model_options: model_name, confidence_threshold, backend (see ContentModerator)"""
+        super().__init__(**model_options)
         self.start_time = datetime.now()
-        self.last_used = None
+        # Monotonic time of the last request; the idle monitor reads it
+        self.last_used_at = None
         self.idle_timeout = timedelta(minutes=idle_timeout_minutes)
         self.model_loaded = False
-        self.shutdown_timer = None
+        self.released_at = None
+        self.reloads = 0
+        self._ready = threading.Event()
+        self._reload_thread = None
+        # Connections and calls using this moderator; a retired one waits for 0
+        self.active = 0
+        self._active_lock = threading.Lock()
+
+    @property
+    def last_used(self):
+        """Wall-clock time of the last request, for /health"""
+        if self.last_used_at is None:
+            return None
+        return datetime.now() - timedelta(seconds=time.monotonic() - self.last_used_at)
+
+    def touch(self):
+        """Record activity; the only per-request work the idle lifecycle needs"""
+        self.last_used_at = time.monotonic()
+
+    def idle_seconds(self):
+        """Seconds since the last request (or since the model was loaded)"""
+        if self.last_used_at is None:
+            return 0.0
+        return time.monotonic() - self.last_used_at
 
     def load_model(self):
-        """Load the model and mark as loaded"""
+        """Load the model and start the idle clock"""
+        started = time.perf_counter()
         print(f"Loading moderation model at {datetime.now().strftime('%H:%M:%S')}...")
-        super().load_model()
-        self.model_loaded = True
-        self.last_used = datetime.now()
-        print(
-            f"Model loaded successfully in {(datetime.now() - self.start_time).total_seconds():.2f}s"
-        )
+        if not super().load_model():
+            return False
+        self.touch()
+        print(f"Model loaded successfully in {time.perf_counter() - started:.2f}s")
+        return True
 
-    def moderate_content(self, content_data):
-        """Override to track usage and reset idle timer"""
-        self.last_used = datetime.now()
+    def start_inference(self):
+        """
+        Fork inference workers, or group concurrent requests in-process, then warm up
+        Returns: phase name -> seconds
+        """
+        timings = {}
+        phase = time.perf_counter()
+        if ModerationConfig.WORKER_PROCESSES > 1 and self.enable_worker_pool(
+            ModerationConfig.WORKER_PROCESSES,
+            torch_threads=ModerationConfig.WORKER_TORCH_THREADS or None,
+        ):
+            print(
+                f"Worker pool: {ModerationConfig.WORKER_PROCESSES} processes, "
+                f"{self.worker_pool.torch_threads} torch threads each"
+            )
+        elif ModerationConfig.BATCH_MAX_SIZE > 1:
+            self.enable_batching(
+                max_batch_size=ModerationConfig.BATCH_MAX_SIZE,
+                max_wait_ms=ModerationConfig.BATCH_MAX_WAIT_MS,
+            )
+            print(
+                f"Micro-batching: up to {ModerationConfig.BATCH_MAX_SIZE} texts per batch, "
+                f"{ModerationConfig.BATCH_MAX_WAIT_MS:g} ms max wait"
+            )
+        timings["workers_s"] = time.perf_counter() - phase
 
-        # Reset shutdown timer
-        if self.shutdown_timer:
-            self.shutdown_timer.cancel()
+        # Workers warm themselves up after fork; otherwise warm up in-process
+        if ModerationConfig.WARMUP_ON_START and self.worker_pool is None:
+            timings["warmup_s"] = self.warm_up()
+        self._ready.set()
+        return timings
 
-        # Schedule shutdown check
-        self.schedule_idle_check()
+    def release_model(self, idle_seconds):
+        """
+        Scale to warm: free the model and workers but keep serving; the next text
+        that needs inference reloads them in the background
+        Returns: False if a request arrived in the meantime
+        """
+        with self._load_lock:
+            if not self.is_ready() or self.idle_seconds() < idle_seconds:
+                return False
+            self._free_model()
+            # Cached verdicts stay valid: the same model is reloaded
+            self.load_on_demand = True
+            self.released_at = datetime.now()
+        gc.collect()
+        self.logger.info("Model released after %.0fs idle", idle_seconds)
+        return True
 
-        return super().moderate_content(content_data)
+    def retire(self, timeout):
+        """
+        Free a moderator that has been swapped out, once the requests already
+        using it have finished (or timeout seconds have passed)
+        Returns: calls still active when it was freed
+        """
+        deadline = time.monotonic() + timeout
+        while self.active and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with self._load_lock:
+            self.load_on_demand = False
+            self._free_model()
+        # The replacement opened its own connection to the store
+        if self.verdict_store is not None:
+            self.verdict_store.close()
+        gc.collect()
+        return self.active
 
-    def schedule_idle_check(self):
-        """Schedule a check to see if we should shutdown due to inactivity"""
+    def _free_model(self):
+        """Stop workers and drop the model, tokenizer and backend"""
+        self._ready.clear()
+        self.disable_worker_pool()
+        self.disable_batching()
+        self.backend = None
+        self.model = None
+        self.tokenizer = None
+        self.model_loaded = False
 
-        def check_idle():
-            if self.last_used and datetime.now() - self.last_used > self.idle_timeout:
-                print(
-                    f"Model idle for {self.idle_timeout.total_seconds()/60:.0f} minutes, shutting down..."
+    def _load_on_demand(self):
+        """Reload a released model in the background and wait a bounded time for it"""
+        with self._load_lock:
+            if self.is_ready():
+                return
+            if self._reload_thread is None or not self._reload_thread.is_alive():
+                self._ready.clear()
+                self._reload_thread = threading.Thread(
+                    target=self._reload, name="model-reload", daemon=True
                 )
-                os._exit(0)  # Graceful shutdown
-            else:
-                # Schedule next check in 5 minutes
-                self.shutdown_timer = threading.Timer(300, check_idle)  # 5 minutes
-                self.shutdown_timer.start()
+                self._reload_thread.start()
+        if not self._ready.wait(ModerationConfig.IDLE_RELOAD_WAIT_SECONDS) or not self.is_ready():
+            raise RuntimeError("Model is reloading")
+
+    def _reload(self):
+        try:
+            if self.load_model():
+                self.start_inference()
+                self.reloads += 1
+                self.released_at = None
+        finally:
+            # Wake waiters even if loading failed; they re-check is_ready()
+            self._ready.set()
+
+    def moderate_contents(self, content_items, allow_inference=True):
+        """Override to track usage for the idle monitor and model swaps"""
+        self.touch()
+        self.hold()
+        try:
+            return super().moderate_contents(content_items, allow_inference)
+        finally:
+            self.release_hold()
+
+    def moderate_edit(self, content_data, post_id=None, previous_hash=None):
+        """Override to track usage for the idle monitor and model swaps"""
+        self.touch()
+        self.hold()
+        try:
+            return super().moderate_edit(content_data, post_id, previous_hash)
+        finally:
+            self.release_hold()
+
+    def hold(self):
+        """Keep retire() from freeing the model until release_hold()"""
+        with self._active_lock:
+            self.active += 1
+
+    def release_hold(self):
+        with self._active_lock:
+            self.active -= 1
+
+
+class ModelManager:
+    """
+    Background model loads for the admin endpoints: hot reloads that swap the
+    serving moderator atomically, and candidate models for shadow scoring
+    """
 
-        self.shutdown_timer = threading.Timer(
-            self.idle_timeout.total_seconds(), check_idle
+    def __init__(self, server):
+        self.server = server
+        self.state = "idle"
+        self.operation = None
+        self.target = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.load_seconds = None
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def reload(self, model_name=None, backend=None, threshold=None):
+        """Start loading a replacement for the serving model; False if a load is running"""
+        current = self.server.moderator
+        options = {
+            "model_name": model_name or current.model_name,
+            "backend": backend or current.backend_name,
+            "confidence_threshold": (
+                threshold if threshold is not None else current.confidence_threshold
+            ),
+        }
+        return self._start("reload", self._reload, options)
+
+    def start_shadow(self, model_name, backend=None, percent=10.0):
+        """Start loading a candidate model for shadow scoring; False if a load is running"""
+        current = self.server.moderator
+        options = {
+            "model_name": model_name,
+            "backend": backend or current.backend_name,
+            "confidence_threshold": current.confidence_threshold,
+        }
+        return self._start("shadow", self._load_shadow, options, percent)
+
+    def stop_shadow(self):
+        """Stop shadow scoring and free the candidate"""
+        shadow = self.server.shadow
+        self.server.shadow = None
+        if shadow is not None:
+            shadow.stop()
+            gc.collect()
+
+    def get_stats(self):
+        """State of the current or last background load"""
+        return {
+            "state": self.state,
+            "operation": self.operation,
+            "target": self.target,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "load_seconds": self.load_seconds,
+            "reloads": self.reloads,
+            "serving_model": self.server.moderator.model_id,
+            "threshold": self.server.moderator.confidence_threshold,
+        }
+
+    def _start(self, operation, target, options, *args):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self.state = "loading"
+            self.operation = operation
+            self.target = {**options, **({"percent": args[0]} if args else {})}
+            self.error = None
+            self.started_at = datetime.now().isoformat()
+            self.finished_at = None
+            self.load_seconds = None
+            self._thread = threading.Thread(
+                target=self._run, args=(target, options) + args, name="model-manager", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self, target, options, *args):
+        started = time.perf_counter()
+        try:
+            target(options, *args)
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            get_logger("admin").error("Model %s failed: %s", self.operation, e)
+        finally:
+            self.load_seconds = time.perf_counter() - started
+            self.finished_at = datetime.now().isoformat()
+
+    def _reload(self, options):
+        current = self.server.moderator
+        replacement = PersistentModerator(
+            idle_timeout_minutes=current.idle_timeout.total_seconds() / 60, **options
         )
-        self.shutdown_timer.start()
+        if not replacement.load_model():
+            raise RuntimeError(f"Could not load {options['model_name']}")
+        self.state = "warming"
+        replacement.start_inference()
+        self._check_scores(replacement)
+
+        previous = self.server.swap_moderator(replacement)
+        self.reloads += 1
+        self.state = "draining"
+        print(f"Now serving {replacement.model_id}; draining {previous.model_id}")
+        left = previous.retire(ModerationConfig.SHUTDOWN_DRAIN_SECONDS)
+        if left:
+            get_logger("admin").warning("%s requests still on the old model when it was freed", left)
+        self.state = "swapped"
+
+    def _load_shadow(self, options, percent):
+        candidate = ContentModerator(**options)
+        # Every mirrored request must reach the candidate model, and none of its
+        # verdicts may be persisted where production lookups would find them
+        candidate.cache = None
+        if candidate.verdict_store is not None:
+            candidate.verdict_store.close()
+            candidate.verdict_store = None
+        candidate.near_duplicates = None
+        if not candidate.load_model():
+            raise RuntimeError(f"Could not load {options['model_name']}")
+        self.state = "warming"
+        # Candidate inference stays out of the serving model's metrics
+        with REGISTRY.suppressed():
+            candidate.warm_up()
+            self._check_scores(candidate)
+
+        self.stop_shadow()
+        self.server.shadow = ShadowScorer(
+            candidate, percent, max_pending=ModerationConfig.SHADOW_MAX_PENDING
+        )
+        print(f"Shadow scoring {percent:g}% of traffic with {candidate.model_id}")
+        self.state = "shadowing"
+
+    def _check_scores(self, moderator):
+        """Refuse a model that can't score before it sees any traffic"""
+        probe = moderator.predict_hate_speech_batch(["Model reload check", "Thanks for sharing!"])
+        errors = [result["error"] for result in probe if result.get("error")]
+        if errors:
+            moderator.disable_worker_pool()
+            moderator.disable_batching()
+            raise RuntimeError(f"Model failed its scoring check: {errors[0]}")
+
+
+class IdleMonitor:
+    """
+    One background thread that checks the idle clock and either shuts the server
+    down gracefully or scales it to warm (model released, port kept open)
+    """
+
+    def __init__(self, server, idle_timeout, mode="exit"):
+        """
+        Args:
+            server: ModerationServer whose serving moderator's idle clock is read
+            idle_timeout: seconds without requests before acting
+            mode: "exit" or "warm"
+        """
+        self.server = server
+        self.idle_timeout = idle_timeout
+        self.mode = mode
+        # Act within ~10% of the timeout without waking more than needed
+        self.check_interval = min(60.0, max(1.0, idle_timeout / 10.0))
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="idle-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
 
+    def _run(self):
+        while not self._stopping.wait(self.check_interval):
+            moderator = self.server.moderator
+            idle = moderator.idle_seconds()
+            if idle < self.idle_timeout or self.server.limiter.get_stats()["in_flight"]:
+                continue
 
-def create_handler(moderator):
-    """Create a handler class with the moderator instance"""
+            if self.mode == "warm":
+                if moderator.is_ready() and moderator.release_model(self.idle_timeout):
+                    print(f"Model idle for {idle / 60:.0f} minutes, released (port stays open)")
+                continue
 
-    def handler(*args, **kwargs):
-        return ModerationHandler(*args, moderator=moderator, **kwargs)
+            print(f"Model idle for {idle / 60:.0f} minutes, shutting down...")
+            self.server.idle_shutdown = True
+            # serve_forever() returns on the main thread, which drains and cleans up
+            self.server.shutdown()
+            return
+
+
+def create_handler():
+    """
+    Create a handler class bound to the server's moderator at connection time
+    The moderator is held for the whole connection, including reading the body,
+    so a hot reload doesn't free it under a request that hasn't reached it yet
+    """
+
+    def handler(request, client_address, server):
+        moderator = server.hold_moderator()
+        try:
+            # The request is served entirely inside the constructor
+            return ModerationHandler(request, client_address, server, moderator=moderator)
+        finally:
+            moderator.release_hold()
 
     return handler
 
@@ -155,7 +1020,9 @@ def signal_handler(signum, frame):
     print(f"\nReceived signal {signum}, shutting down moderation service...")
     shutdown_requested = True
     if server_instance:
-        server_instance.shutdown()
+        # shutdown() blocks until serve_forever() returns, and serve_forever()
+        # runs on this (main) thread, so it must be called from another thread
+        threading.Thread(target=server_instance.shutdown, daemon=True).start()
 
 def main():
     global server_instance
@@ -166,30 +1033,113 @@ def main():
     
     # Configuration
     PORT = int(os.getenv("MODERATION_SERVICE_PORT", 8001))
-    IDLE_TIMEOUT = int(os.getenv("MODERATION_IDLE_TIMEOUT", 30))  # minutes
+    IDLE_TIMEOUT = ModerationConfig.IDLE_TIMEOUT  # minutes
+    try:
+        tuned = ModerationConfig.apply_tuning_profile()
+    except (OSError, ValueError) as e:
+        print(f"Ignoring tuning profile {ModerationConfig.TUNING_PROFILE}: {e}")
+        tuned = {}
 
     print("Starting Persistent Moderation Service")
     print(f"Port: {PORT}")
-    print(f"Idle timeout: {IDLE_TIMEOUT} minutes")
+    if tuned:
+        print(
+            f"Tuning profile {ModerationConfig.TUNING_PROFILE}: "
+            + ", ".join(f"{name}={value}" for name, value in tuned.items())
+        )
+    print(f"Idle timeout: {IDLE_TIMEOUT} minutes ({ModerationConfig.IDLE_MODE} when idle)")
+    print(f"Max in-flight requests: {ModerationConfig.MAX_IN_FLIGHT}")
     print("-" * 50)
 
-    # Initialize moderation service
-    if not initialize_moderation_service():
+    startup = {"server_imports_s": time.perf_counter() - _PROCESS_START}
+
+    # Load the model once, into the moderator that serves requests
+    moderator = PersistentModerator(idle_timeout_minutes=IDLE_TIMEOUT)
+    if not moderator.load_model():
         print("Failed to initialize moderation service")
         sys.exit(1)
+    startup.update(moderator.startup_timings)
+    startup.update(moderator.start_inference())
 
-    # Create persistent moderator
-    moderator = PersistentModerator(idle_timeout_minutes=IDLE_TIMEOUT)
-    moderator.load_model()
+    # Adaptive cap on concurrent inference; requests over it are answered degraded
+    admission = None
+    if ModerationConfig.ADMISSION_CONTROL:
+        admission = AdmissionController(
+            initial_limit=ModerationConfig.ADMISSION_INITIAL_LIMIT,
+            min_limit=ModerationConfig.ADMISSION_MIN_LIMIT,
+            max_limit=ModerationConfig.MAX_IN_FLIGHT,
+            target_latency=ModerationConfig.ADMISSION_TARGET_LATENCY_MS / 1000.0,
+        )
+        print(
+            f"Admission control: AIMD limit from {ModerationConfig.ADMISSION_INITIAL_LIMIT}, "
+            f"{ModerationConfig.ADMISSION_TARGET_LATENCY_MS:g} ms latency target"
+        )
+
+    # Asynchronous jobs resume from the durable queue
+    job_runner = None
+    if ModerationConfig.JOB_QUEUE_PATH:
+        job_runner = JobRunner(
+            JobQueue(
+                ModerationConfig.JOB_QUEUE_PATH,
+                retention_seconds=ModerationConfig.JOB_RETENTION_HOURS * 3600,
+            ),
+            moderator,
+            batch_size=ModerationConfig.JOB_BATCH_SIZE,
+            webhook_url=ModerationConfig.JOB_WEBHOOK_URL,
+            admission=admission,
+        )
+        job_runner.start()
+        print(f"Job queue: {ModerationConfig.JOB_QUEUE_PATH}")
 
     # Start HTTP server
-    handler = create_handler(moderator)
+    phase = time.perf_counter()
+    handler = create_handler()
     host = os.getenv("API_HOST", "0.0.0.0")  # Bind to all interfaces for Docker
-    server_instance = HTTPServer((host, PORT), handler)
+    server_instance = ModerationServer(
+        (host, PORT),
+        handler,
+        max_in_flight=ModerationConfig.MAX_IN_FLIGHT,
+        moderator=moderator,
+        job_runner=job_runner,
+        admission=admission,
+    )
+    startup["bind_s"] = time.perf_counter() - phase
+    startup["total_s"] = time.perf_counter() - _PROCESS_START
+    moderator.startup_timings = startup
+
+    # Same-host callers can skip HTTP: framed requests over a Unix socket
+    socket_server = None
+    if ModerationConfig.SOCKET_PATH:
+        if unix_sockets_supported():
+            socket_server = FramedModerationServer(
+                ModerationConfig.SOCKET_PATH,
+                server_instance,
+                max_workers=ModerationConfig.MAX_IN_FLIGHT,
+            )
+            socket_server.start()
+        else:
+            print("MODERATION_SOCKET_PATH ignored: Unix sockets aren't available on this platform")
+
+    idle_monitor = IdleMonitor(server_instance, IDLE_TIMEOUT * 60, mode=ModerationConfig.IDLE_MODE)
+    idle_monitor.start()
+
+    print(f"Model source: {moderator.model_source}")
+    print(
+        "Startup: "
+        + ", ".join(f"{name[:-2]} {seconds:.2f}s" for name, seconds in startup.items())
+    )
 
     print(f"Moderation service running on http://{host}:{PORT}")
     print(f"Health check: http://{host}:{PORT}/health")
+    print(f"Runtime stats: http://{host}:{PORT}/stats")
+    print(f"Prometheus metrics: http://{host}:{PORT}/metrics")
     print(f"POST moderation requests to http://{host}:{PORT}/")
+    print(f"POST bulk moderation requests to http://{host}:{PORT}/batch")
+    print(f"POST edited posts to http://{host}:{PORT}/moderate/edit")
+    if job_runner is not None:
+        print(f"POST asynchronous jobs to http://{host}:{PORT}/jobs")
+    if socket_server is not None:
+        print(f"Framed moderation requests on unix:{ModerationConfig.SOCKET_PATH}")
     print("-" * 50)
 
     try:
@@ -200,8 +1150,25 @@ def main():
         print(f"Server error: {e}")
     finally:
         print("Shutting down moderation service...")
+        idle_monitor.stop()
+        if socket_server is not None:
+            # Stops accepting and waits for frames already being moderated
+            socket_server.stop()
         if server_instance:
+            # No new connections are accepted; let admitted requests finish
+            left = server_instance.drain(ModerationConfig.SHUTDOWN_DRAIN_SECONDS)
+            if left:
+                print(f"{left} requests still in flight after drain timeout")
             server_instance.server_close()
+        if job_runner is not None:
+            job_runner.stop()
+        server_instance.model_manager.stop_shadow()
+        # The serving moderator may have been replaced by an admin reload
+        moderator = server_instance.moderator
+        moderator.disable_worker_pool()
+        moderator.disable_batching()
+        if moderator.verdict_store is not None:
+            moderator.verdict_store.close()
         print("Moderation service stopped.")
         sys.exit(0)
 
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate index over recently scored texts
+Raids arrive as lightly edited copies of one message (punctuation, usernames,
+emoji, numbers changed); the exact-text cache misses every copy. Texts are
+normalized and reduced to a 64-bit SimHash of their words and word pairs; a
+new text within NEAR_DUPLICATE_MAX_DISTANCE bits of a recently scored one can
+reuse its probabilities instead of running the model
+"""
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+FINGERPRINT_BITS = 64
+
+_URL_PATTERN = re.compile(r"(https?://\S+|www\.\S+|\S+@\S+\.\w+)", re.IGNORECASE)
+_MENTION_PATTERN = re.compile(r"@\w+")
+_WORD_PATTERN = re.compile(r"[^\W_]+")
+_DIGITS = re.compile(r"\d+")
+
+
+def normalized_tokens(text):
+    """Words with case, links, @mentions, digits, punctuation and emoji normalized away"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = _URL_PATTERN.sub(" ", text)
+    text = _MENTION_PATTERN.sub(" ", text)
+    text = _DIGITS.sub("0", text)
+    return _WORD_PATTERN.findall(text)
+
+
+class NearDuplicateIndex:
+    """SimHash fingerprints with banded lookup, LRU bound and TTL expiry"""
+
+    def __init__(self, max_distance=3, min_tokens=5, max_entries=50000, ttl_seconds=3600):
+        """
+        Args:
+            max_distance: most differing fingerprint bits still counted as a duplicate
+            min_tokens: shorter texts aren't indexed (too little signal to compare)
+            max_entries: fingerprints kept; least recently matched are evicted first
+            ttl_seconds: fingerprints older than this are ignored and dropped
+        """
+        import numpy as np
+
+        self._np = np
+        self.max_distance = max_distance
+        self.min_tokens = min_tokens
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Two fingerprints within max_distance bits agree exactly on at least one
+        # of max_distance + 1 bands, so candidates come from per-band tables
+        band_count = max_distance + 1
+        width = FINGERPRINT_BITS // band_count
+        self._bands = [
+            (start, (FINGERPRINT_BITS if band == band_count - 1 else start + width) - start)
+            for band, start in enumerate(range(0, width * band_count, width))
+        ]
+        self._tables = [{} for _ in self._bands]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.rejected = 0
+        self.skipped_short = 0
+        self.inserts = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def fingerprint(self, text):
+        """64-bit SimHash of text, or None if it is too short to index"""
+        tokens = normalized_tokens(text)
+        if len(tokens) < self.min_tokens:
+            return None
+        np = self._np
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        hashes = np.fromiter(
+            (
+                int.from_bytes(
+                    hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little"
+                )
+                for feature in features
+            ),
+            dtype=np.uint64,
+            count=len(features),
+        )
+        bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+        majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(features)
+        return int.from_bytes(np.packbits(majority, bitorder="little").tobytes(), "little")
+
+    def lookup(self, text, accept=None):
+        """
+        Probabilities of the closest recent near-duplicate of text, or None
+        Args:
+            accept: optional predicate on the matched probabilities; a match it
+                rejects (e.g. a benign verdict when only blocks are reused) is a miss
+        """
+        fingerprint = self.fingerprint(text)
+        with self._lock:
+            self.lookups += 1
+            if fingerprint is None:
+                self.skipped_short += 1
+                return None
+
+            now = time.monotonic()
+            best = None
+            best_distance = self.max_distance + 1
+            expired = set()
+            for table, band in zip(self._tables, self._bands):
+                for candidate in table.get(_band_value(fingerprint, band), ()):
+                    distance = bin(candidate ^ fingerprint).count("1")
+                    if distance >= best_distance:
+                        continue
+                    if self.ttl_seconds and now - self._entries[candidate][1] > self.ttl_seconds:
+                        expired.add(candidate)
+                        continue
+                    best, best_distance = candidate, distance
+            for candidate in expired:
+                self._remove(candidate)
+            self.expirations += len(expired)
+            if best is None:
+                return None
+
+            probs = self._entries[best][0]
+            if accept is not None and not accept(probs):
+                self.rejected += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return probs
+
+    def add(self, text, probs):
+        """Index the model's probabilities for a scored text"""
+        fingerprint = self.fingerprint(text)
+        if fingerprint is None:
+            return
+        with self._lock:
+            if fingerprint in self._entries:
+                self._entries.move_to_end(fingerprint)
+            else:
+                for table, band in zip(self._tables, self._bands):
+                    table.setdefault(_band_value(fingerprint, band), set()).add(fingerprint)
+            self._entries[fingerprint] = (list(probs), time.monotonic())
+            self.inserts += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for table in self._tables:
+                table.clear()
+
+    def get_stats(self):
+        """Size and hit-rate counters"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_distance": self.max_distance,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "rejected_matches": self.rejected,
+                "skipped_short": self.skipped_short,
+                "inserts": self.inserts,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, fingerprint):
+        self._entries.pop(fingerprint, None)
+        for table, band in zip(self._tables, self._bands):
+            value = _band_value(fingerprint, band)
+            members = table.get(value)
+            if members is not None:
+                members.discard(fingerprint)
+                if not members:
+                    del table[value]
+
+
+def _band_value(fingerprint, band):
+    start, width = band
+    return (fingerprint >> start) & ((1 << width) - 1)
+
+
+def create_near_duplicate_index(
+    mode, max_distance=3, min_tokens=5, max_entries=50000, ttl_seconds=3600
+):
+    """NearDuplicateIndex for NEAR_DUPLICATE_MODE (blocked/all), or None when off"""
+    if mode == "off":
+        return None
+    return NearDuplicateIndex(
+        max_distance=max_distance,
+        min_tokens=min_tokens,
+        max_entries=max_entries,
+        ttl_seconds=ttl_seconds,
+    )
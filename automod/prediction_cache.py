@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+In-memory cache of model probabilities keyed by normalized content hash
+Verdicts are derived from the cached probabilities, so threshold changes reuse them
+"""
+import hashlib
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Rough per-entry cost of the OrderedDict slot and entry tuple
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_text(text):
+    """Canonical form used for cache keys: NFC with whitespace runs collapsed"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def content_key(model_id, text):
+    """Hash of model identity plus normalized text"""
+    digest = hashlib.sha256()
+    digest.update(model_id.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Thread-safe LRU cache with optional TTL and a memory cap"""
+
+    def __init__(self, max_entries=10000, ttl_seconds=0, max_bytes=0):
+        """
+        Args:
+            max_entries: maximum number of cached texts
+            ttl_seconds: expire entries after this long (0 disables expiry)
+            max_bytes: approximate memory cap (0 disables the cap)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Cached probabilities for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            probs, stored_at, size = entry
+            if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(probs)
+
+    def put(self, key, probs):
+        """Store probabilities for key, evicting least recently used entries as needed"""
+        probs = tuple(probs)
+        size = _entry_size(key, probs)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (probs, time.monotonic(), size)
+            self._bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self):
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "approx_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, key):
+        """Remove an entry; caller holds the lock"""
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+def _entry_size(key, probs):
+    """Approximate memory used by one cache entry"""
+    return (
+        sys.getsizeof(key)
+        + sys.getsizeof(probs)
+        + sum(sys.getsizeof(p) for p in probs)
+        + _ENTRY_OVERHEAD_BYTES
+    )
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Cheap lexical pre-filter run before the transformer
+Texts with no letters (emoji, numbers, URLs) or short replies made only of
+allowlisted words are resolved as benign without inference; anything that
+matches the denylist, or is uncertain, goes on to the model
+"""
+import os
+import re
+import threading
+import unicodedata
+from collections import deque
+
+# Short replies that are benign on their own; the denylist still vetoes a bypass
+DEFAULT_ALLOWLIST = """
+thanks thank you ty thx ok okay k yes yep yeah no nope sure lol haha great nice cool
+good awesome brilliant lovely helpful useful agreed agree same me too welcome hi hello
+hey bye morning evening night congrats congratulations well done luck hugs sorry wow
+bump following update updated done noted cheers much so very a the and it this that
+for of to is
+""".split()
+
+_URL_PATTERN = re.compile(r"(https?://\S+|www\.\S+|\S+@\S+\.\w+)", re.IGNORECASE)
+_WORD_PATTERN = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every pattern occurrence in one pass over the text"""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build()
+
+    def _add(self, pattern):
+        node = 0
+        for character in pattern:
+            next_node = self._goto[node].get(character)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][character] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(pattern)
+
+    def _build(self):
+        """Breadth-first failure links, merging outputs along them"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for character, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and character not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(character, 0)
+                if self._fail[child] == child:
+                    self._fail[child] = 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, text):
+        """Yield (start, pattern) for every occurrence"""
+        node = 0
+        for position, character in enumerate(text):
+            while node and character not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(character, 0)
+            for pattern in self._output[node]:
+                yield position - len(pattern) + 1, pattern
+
+
+def load_terms(path):
+    """
+    Terms from a plain-text file (one per line, # comments) or a JS/JSON array of
+    quoted strings such as server/utils/bannedWords.js
+    """
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    if path.endswith((".js", ".json")):
+        # Drop // comments so a path or note in them isn't read as a term
+        source = re.sub(r"//[^\n]*", "", source)
+        return [term.lower() for term in re.findall(r"[\"']([^\"'\n]+)[\"']", source)]
+    return [
+        line.strip().lower()
+        for line in source.splitlines()
+        if line.strip() and not line.lstrip().startswith("#")
+    ]
+
+
+class PreFilter:
+    """Lexical first tier with per-tier counters and an audit mode"""
+
+    def __init__(
+        self,
+        denylist=(),
+        allowlist=DEFAULT_ALLOWLIST,
+        max_words=4,
+        benign_confidence=0.99,
+        audit=False,
+    ):
+        """
+        Args:
+            denylist: terms that always send a text to the model
+            allowlist: words a short reply may consist of and still be bypassed
+            max_words: longest reply eligible for the allowlist bypass
+            benign_confidence: NOT_HATE probability reported for bypassed texts
+            audit: still score bypassed texts with the model and count disagreements
+        """
+        terms = sorted({term for term in denylist if term})
+        self.denylist_size = len(terms)
+        self.matcher = AhoCorasick(terms)
+        self.allowlist = frozenset(allowlist)
+        self.max_words = max_words
+        self.benign_probs = [benign_confidence, 1.0 - benign_confidence]
+        self.audit = audit
+        self._lock = threading.Lock()
+        self._recent_disagreements = deque(maxlen=20)
+        self.checked = 0
+        self.bypassed = 0
+        self.denylist_hits = 0
+        self.audited = 0
+        self.disagreements = 0
+
+    def benign_probabilities(self, text):
+        """
+        Class probabilities when text is confidently benign, else None
+        (None means the model decides)
+        """
+        normalized = unicodedata.normalize("NFKC", text).lower()
+        verdict = None
+        denied = self._denylisted(normalized)
+        if not denied:
+            remainder = _URL_PATTERN.sub(" ", normalized)
+            words = _WORD_PATTERN.findall(remainder)
+            if not any(character.isalpha() for character in remainder):
+                # Emoji, numbers, punctuation and links only
+                verdict = list(self.benign_probs)
+            elif len(words) <= self.max_words and all(word in self.allowlist for word in words):
+                verdict = list(self.benign_probs)
+
+        with self._lock:
+            self.checked += 1
+            if denied:
+                self.denylist_hits += 1
+            if verdict is not None:
+                self.bypassed += 1
+        return verdict
+
+    def record_audit(self, text, model_result):
+        """Compare the model's verdict on a text the pre-filter would have bypassed"""
+        disagrees = model_result.get("label") == "HATE" or model_result.get("should_block")
+        with self._lock:
+            self.audited += 1
+            if disagrees:
+                self.disagreements += 1
+                self._recent_disagreements.append(
+                    {"text": text[:120], "model_confidence": model_result.get("confidence")}
+                )
+        return disagrees
+
+    def get_stats(self):
+        """Share of traffic each tier resolved, plus audit agreement"""
+        with self._lock:
+            checked = self.checked
+            resolved = 0 if self.audit else self.bypassed
+            return {
+                "mode": "audit" if self.audit else "on",
+                "checked": checked,
+                "denylist_terms": self.denylist_size,
+                "denylist_hits": self.denylist_hits,
+                "bypass_eligible": self.bypassed,
+                "resolved_by_prefilter": resolved,
+                "resolved_by_model": checked - resolved,
+                "prefilter_fraction": (resolved / checked) if checked else 0.0,
+                "audited": self.audited,
+                "audit_disagreements": self.disagreements,
+                "audit_disagreement_rate": (
+                    self.disagreements / self.audited if self.audited else 0.0
+                ),
+                "recent_disagreements": list(self._recent_disagreements),
+            }
+
+    def _denylisted(self, normalized):
+        """Whether a denylist term occurs as a whole word (or phrase)"""
+        for start, term in self.matcher.find_all(normalized):
+            end = start + len(term)
+            before = normalized[start - 1] if start > 0 else " "
+            after = normalized[end] if end < len(normalized) else " "
+            if not before.isalnum() and not after.isalnum():
+                return True
+        return False
+
+
+def create_prefilter(
+    mode, denylist_path="", allowlist_path="", max_words=4, benign_confidence=0.99
+):
+    """PreFilter for PREFILTER_MODE (on/audit), or None when off"""
+    if mode == "off":
+        return None
+    denylist = load_terms(denylist_path) if denylist_path and os.path.exists(denylist_path) else []
+    allowlist = load_terms(allowlist_path) if allowlist_path else DEFAULT_ALLOWLIST
+    return PreFilter(
+        denylist=denylist,
+        allowlist=allowlist,
+        max_words=max_words,
+        benign_confidence=benign_confidence,
+        audit=(mode == "audit"),
+    )
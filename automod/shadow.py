@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Shadow scoring of live traffic with a candidate model
+A sampled share of moderated posts is re-scored by the candidate on a background
+thread after the response has been sent; verdict agreement and latency are
+compared with the serving model so a faster or smaller model can be evaluated
+on production traffic without affecting it
+"""
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+from metrics import REGISTRY
+from structured_logging import get_logger
+
+logger = get_logger("shadow")
+
+# Latency samples kept per side for percentiles
+LATENCY_WINDOW = 2000
+
+
+class ShadowScorer:
+    """Off-path comparison of a candidate ContentModerator against the serving one"""
+
+    def __init__(self, candidate, percent, max_pending=256):
+        """
+        Args:
+            candidate: loaded ContentModerator for the model under evaluation
+            percent: share of requests (0-100) sent to the candidate
+            max_pending: requests buffered for the candidate; beyond it samples are skipped
+        """
+        self.candidate = candidate
+        self.percent = percent
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._primary_latency = deque(maxlen=LATENCY_WINDOW)
+        self._candidate_latency = deque(maxlen=LATENCY_WINDOW)
+        self._recent_disagreements = deque(maxlen=20)
+        self.started_at = time.time()
+        self.sampled = 0
+        self.skipped = 0
+        self.errors = 0
+        self.posts_compared = 0
+        self.verdict_agreements = 0
+        self.fields_compared = 0
+        self.label_agreements = 0
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def offer(self, items, primary_results, primary_latency):
+        """Queue a sample of a served request for the candidate; never blocks"""
+        if random.random() * 100.0 >= self.percent:
+            return
+        try:
+            self._queue.put_nowait((items, primary_results, primary_latency))
+        except queue.Full:
+            with self._lock:
+                self.skipped += 1
+            return
+        with self._lock:
+            self.sampled += 1
+
+    def stop(self, timeout=10.0):
+        """Finish the queued samples and free the candidate"""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self.candidate.disable_batching()
+        self.candidate.disable_worker_pool()
+
+    def get_stats(self):
+        """Agreement rates and latency percentiles for both models"""
+        with self._lock:
+            primary = _latency_summary(self._primary_latency)
+            candidate = _latency_summary(self._candidate_latency)
+            stats = {
+                "candidate_model": self.candidate.model_id,
+                "percent": self.percent,
+                "running_seconds": round(time.time() - self.started_at, 1),
+                "sampled": self.sampled,
+                "skipped_queue_full": self.skipped,
+                "pending": self._queue.qsize(),
+                "errors": self.errors,
+                "posts_compared": self.posts_compared,
+                "verdict_agreement": (
+                    self.verdict_agreements / self.posts_compared if self.posts_compared else None
+                ),
+                "fields_compared": self.fields_compared,
+                "label_agreement": (
+                    self.label_agreements / self.fields_compared if self.fields_compared else None
+                ),
+                "primary_latency": primary,
+                "candidate_latency": candidate,
+                "recent_disagreements": list(self._recent_disagreements),
+            }
+        if primary.get("p50_ms") and candidate.get("p50_ms"):
+            stats["candidate_speedup_p50"] = primary["p50_ms"] / candidate["p50_ms"]
+        return stats
+
+    def _run(self):
+        while True:
+            sample = self._queue.get()
+            if sample is None:
+                return
+            items, primary_results, primary_latency = sample
+            started = time.perf_counter()
+            try:
+                # Shadow verdicts are not served, so nothing the candidate does
+                # may reach the serving model's metrics (the candidate has no
+                # batcher or workers, so it scores entirely on this thread)
+                with REGISTRY.suppressed():
+                    candidate_results = self.candidate._moderate_items(items)
+            except Exception as e:
+                logger.warning("Shadow scoring failed: %s", e)
+                with self._lock:
+                    self.errors += 1
+                continue
+            latency = time.perf_counter() - started
+            with self._lock:
+                self._primary_latency.append(primary_latency)
+                self._candidate_latency.append(latency)
+                for primary, shadow in zip(primary_results, candidate_results):
+                    self._compare(primary, shadow)
+
+    def _compare(self, primary, shadow):
+        """Tally one post; degraded or failed verdicts on either side are skipped"""
+        if primary.get("degraded") or primary.get("error") or shadow.get("error"):
+            return
+        self.posts_compared += 1
+        if primary.get("allowed") == shadow.get("allowed"):
+            self.verdict_agreements += 1
+        else:
+            self._recent_disagreements.append(
+                {
+                    "primary_allowed": primary.get("allowed"),
+                    "candidate_allowed": shadow.get("allowed"),
+                    "primary_confidence": primary.get("overall_confidence"),
+                    "candidate_confidence": shadow.get("overall_confidence"),
+                }
+            )
+        primary_predictions = primary.get("predictions") or {}
+        shadow_predictions = shadow.get("predictions") or {}
+        for field, prediction in primary_predictions.items():
+            if field in shadow_predictions:
+                self.fields_compared += 1
+                if prediction.get("label") == shadow_predictions[field].get("label"):
+                    self.label_agreements += 1
+
+
+def _latency_summary(samples):
+    """p50/p95/mean in milliseconds for latencies given in seconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "p50_ms": rank(0.50) * 1000.0,
+        "p95_ms": rank(0.95) * 1000.0,
+        "mean_ms": sum(ordered) / len(ordered) * 1000.0,
+    }
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Asynchronous structured logging for the moderation service
+Records are handed to a bounded in-memory queue and written as JSON lines by a
+QueueListener thread, so disk writes, rotation and stdout flushes never run on
+inference or request threads; when the queue is full records are dropped and
+counted rather than blocking the caller
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Parent of every service logger; configured once per process, never the root logger
+LOGGER_NAME = "moderation"
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message"}
+
+_lock = threading.Lock()
+_pipeline = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, any extra fields, exc"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRS and not name.startswith("_"):
+                entry[name] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking on a full queue"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Only merge args into the message here; JSON encoding happens on the listener
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Pipeline:
+    """Queue, handler and listener for one process"""
+
+    def __init__(self, handlers, level, queue_size):
+        self.handlers = handlers
+        self.queue_size = queue_size
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.logger.setLevel(level)
+        self.logger.propagate = False
+        self.queue_handler = None
+        self.listener = None
+        self.start()
+
+    def start(self):
+        """(Re)create the queue and listener thread, e.g. in a freshly forked child"""
+        if self.queue_handler is not None:
+            self.logger.removeHandler(self.queue_handler)
+        log_queue = queue.Queue(maxsize=self.queue_size)
+        self.queue_handler = DroppingQueueHandler(log_queue)
+        self.logger.addHandler(self.queue_handler)
+        self.listener = logging.handlers.QueueListener(
+            log_queue, *self.handlers, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def stop(self):
+        """Flush queued records and stop the listener"""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+
+def configure_logging(
+    level="WARNING",
+    path="",
+    max_bytes=10 * 1024 * 1024,
+    backup_count=3,
+    console=False,
+    queue_size=10000,
+):
+    """
+    Route the "moderation" logger hierarchy through a background JSON writer
+    Safe to call repeatedly: only the first call in a process takes effect
+    Args:
+        level: minimum level name, checked before any formatting happens
+        path: log file (size-rotated); empty for no file
+        max_bytes, backup_count: rotation threshold and files kept
+        console: also write JSON lines to stderr
+        queue_size: records buffered before new ones are dropped
+    """
+    global _pipeline
+    with _lock:
+        if _pipeline is not None:
+            return _pipeline.logger
+
+        formatter = JsonFormatter()
+        handlers = []
+        if path:
+            try:
+                directory = os.path.dirname(os.path.abspath(path))
+                os.makedirs(directory, exist_ok=True)
+                handlers.append(
+                    logging.handlers.RotatingFileHandler(
+                        path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+                    )
+                )
+            except OSError as e:
+                print(f"Log file {path} unavailable ({e}); logging to stderr", file=sys.stderr)
+                console = True
+        if console:
+            handlers.append(logging.StreamHandler(sys.stderr))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        _pipeline = _Pipeline(handlers, getattr(logging, level.upper(), logging.WARNING), queue_size)
+        atexit.register(_pipeline.stop)
+        if hasattr(os, "register_at_fork"):
+            # The listener thread doesn't survive fork(); give each child its own
+            os.register_at_fork(after_in_child=_pipeline.start)
+        return _pipeline.logger
+
+
+def get_logger(name):
+    """Child of the service logger, e.g. get_logger("jobs") -> moderation.jobs"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def get_stats():
+    """Queued and dropped record counts for /stats"""
+    if _pipeline is None:
+        return {"configured": False}
+    return {
+        "configured": True,
+        "queued": _pipeline.queue_handler.queue.qsize(),
+        "dropped": _pipeline.queue_handler.dropped,
+    }
+
+
+def shutdown_logging():
+    """Flush and stop the background writer (also registered with atexit)"""
+    if _pipeline is not None:
+        _pipeline.stop()
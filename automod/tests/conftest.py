@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The service modules import each other by bare name, like the scripts do
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
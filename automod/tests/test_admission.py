@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from admission import AdmissionController
+from moderation_server import ModerationServer
+from moderationService import ContentModerator
+
+
+def moderate(admission, moderator, items):
+    server = SimpleNamespace(admission=admission, shadow=None)
+    return ModerationServer.moderate(server, moderator, items)
+
+
+def test_malformed_batch_item_leaves_limit_unchanged():
+    admission = AdmissionController(initial_limit=4, target_latency=5.0)
+    moderator = ContentModerator()
+
+    results = moderate(admission, moderator, [5])
+
+    assert results[0]["error"] == "Invalid input format"
+    stats = admission.get_stats()
+    assert stats["limit"] == 4
+    assert stats["decreases"] == 0
+    assert stats["in_flight"] == 0
+
+
+def test_prediction_failure_shrinks_limit():
+    admission = AdmissionController(initial_limit=4, target_latency=5.0)
+    # No model loaded: the item reaches the model path and fails there
+    moderator = ContentModerator()
+
+    results = moderate(admission, moderator, [{"content": "hello"}])
+
+    assert results[0]["predictions"]["content"]["label"] == "ERROR"
+    assert admission.get_stats()["decreases"] == 1
@@ -0,0 +1,60 @@
+import ast
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+AUTOMOD_DIR = Path(__file__).resolve().parent.parent
+
+# Loads config with .env read from argv[1], then starts the child the way
+# manage_service.start_service does: a copy of its own environment
+LAUNCHER = """
+import os, subprocess, sys
+import dotenv
+load_dotenv = dotenv.load_dotenv
+dotenv.load_dotenv = lambda *args, **kwargs: load_dotenv(sys.argv[1])
+import config
+env = os.environ.copy()
+env.update(dict(item.split("=", 1) for item in sys.argv[2:]))
+child = "from config import ModerationConfig; print(ModerationConfig.apply_tuning_profile())"
+sys.exit(subprocess.call([sys.executable, "-c", child], env=env))
+"""
+
+
+def launch(tmp_path, dotenv_lines, overrides=(), environ=None):
+    dotenv_path = tmp_path / ".env"
+    dotenv_path.write_text("\n".join(dotenv_lines) + "\n")
+    profile = tmp_path / "profile.json"
+    profile.write_text(json.dumps({"settings": {"TORCH_THREADS": 2, "BATCH_MAX_SIZE": 8}}))
+
+    env = {k: v for k, v in os.environ.items() if k not in ("TORCH_THREADS", "BATCH_MAX_SIZE")}
+    env.pop("MODERATION_DOTENV_SETTINGS", None)
+    env.update(environ or {}, TUNING_PROFILE=str(profile))
+    output = subprocess.run(
+        [sys.executable, "-c", LAUNCHER, str(dotenv_path), *overrides],
+        cwd=AUTOMOD_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return ast.literal_eval(output.strip().splitlines()[-1])
+
+
+def test_profile_overrides_settings_a_launcher_loaded_from_dotenv(tmp_path):
+    applied = launch(tmp_path, ["TORCH_THREADS=3", "BATCH_MAX_SIZE=32"])
+
+    assert applied == {"TORCH_THREADS": 2, "BATCH_MAX_SIZE": 8}
+
+
+def test_profile_keeps_settings_from_the_launchers_environment(tmp_path):
+    applied = launch(tmp_path, ["TORCH_THREADS=3"], environ={"BATCH_MAX_SIZE": "32"})
+
+    assert applied == {"TORCH_THREADS": 2}
+
+
+def test_profile_keeps_settings_the_launcher_changed(tmp_path):
+    applied = launch(tmp_path, ["TORCH_THREADS=3"], overrides=["TORCH_THREADS=4"])
+
+    assert applied == {"BATCH_MAX_SIZE": 8}
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk store of model probabilities keyed by content hash
+Survives idle shutdowns and CLI cold starts so repeated texts skip inference
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+class VerdictStore:
+    """SQLite-backed probability store with size-bounded compaction"""
+
+    def __init__(self, path, max_entries=200000, compact_every=1000):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            max_entries: compact down to 90% of this once exceeded
+            compact_every: check the size after this many writes
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.compact_every = compact_every
+        # One connection per process, shared by every thread under _lock:
+        # request threads are short-lived, so per-thread connections would be
+        # reopened (and leaked) on every request
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._writes_since_check = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.compactions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            conn = self._connection()
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS verdicts (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    probs TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS verdicts_created_at ON verdicts (created_at)")
+            conn.commit()
+
+    def get_many(self, keys):
+        """Return {key: probs} for the keys present in the store"""
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start : start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, probs FROM verdicts WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, probs in rows:
+                    found[key] = json.loads(probs)
+
+        with self._stats_lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries, model_id):
+        """Store {key: probs} computed by model_id"""
+        if not entries:
+            return
+        now = time.time()
+        rows = [(key, model_id, json.dumps(list(probs)), now) for key, probs in entries.items()]
+
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO verdicts (key, model, probs, created_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+            self.writes += len(rows)
+            self._writes_since_check += len(rows)
+            if self._writes_since_check >= self.compact_every:
+                self._writes_since_check = 0
+                self._compact(conn)
+
+    def compact(self):
+        """Trim the store to its size bound now"""
+        with self._lock:
+            self._compact(self._connection())
+
+    def count(self):
+        """Number of stored verdicts"""
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def close(self):
+        """Close this process's connection; the next call reopens it"""
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def get_stats(self):
+        """Lookup counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": self.count(),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "writes": self.writes,
+            "compactions": self.compactions,
+        }
+
+    def _compact(self, conn):
+        """Drop the oldest verdicts once over max_entries; caller holds the lock"""
+        total = conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        if total <= self.max_entries:
+            return
+
+        # Leave headroom so we don't compact again on the next write
+        excess = total - int(self.max_entries * 0.9)
+        conn.execute(
+            "DELETE FROM verdicts WHERE key IN "
+            "(SELECT key FROM verdicts ORDER BY created_at LIMIT ?)",
+            (excess,),
+        )
+        conn.commit()
+        conn.execute("PRAGMA incremental_vacuum")
+        self.compactions += 1
+
+    def _connection(self):
+        """
+        The process's shared SQLite connection, opened on first use; a forked
+        child opens its own instead of using the parent's. Caller holds the lock
+        """
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
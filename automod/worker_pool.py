@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Pre-forked inference worker pool for the moderation service
+Workers are forked after the model is loaded so weights are shared copy-on-write
+"""
+import gc
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config import ModerationConfig
+from metrics import REGISTRY
+from structured_logging import shutdown_logging
+
+
+def fork_supported():
+    """Pre-forking needs the fork start method (not available on Windows)"""
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def default_torch_threads(num_workers):
+    """Split the cores evenly so workers don't oversubscribe the CPU"""
+    return max(1, (os.cpu_count() or 1) // max(1, num_workers))
+
+
+class _Worker:
+    """Parent-side handle for one worker process"""
+
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.alive = True
+
+
+class WorkerPool:
+    """Routes scoring requests to the least-loaded of N forked worker processes"""
+
+    def __init__(self, moderator, num_workers, torch_threads=None, worker_concurrency=8):
+        """
+        Args:
+            moderator: loaded ContentModerator whose model the workers inherit
+            num_workers: number of worker processes to fork
+            torch_threads: intra-op threads per worker (default: cores / workers)
+            worker_concurrency: concurrent requests per worker, batched together
+        """
+        self.moderator = moderator
+        self.num_workers = num_workers
+        self.torch_threads = torch_threads or default_torch_threads(num_workers)
+        self.worker_concurrency = worker_concurrency
+        self.workers = []
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._stopping = False
+
+    def start(self):
+        """Fork the workers; call once the model is loaded and before serving"""
+        context = multiprocessing.get_context("fork")
+
+        # Move long-lived objects out of the collector's reach so GC passes in
+        # the children don't write to (and un-share) the inherited pages
+        gc.collect()
+        gc.freeze()
+
+        for index in range(self.num_workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(self.moderator, child_conn, self.torch_threads, self.worker_concurrency),
+                name=f"moderation-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+
+            worker = _Worker(index, process, parent_conn)
+            self.workers.append(worker)
+            threading.Thread(
+                target=self._read_results,
+                args=(worker,),
+                name=f"moderation-worker-{index}-reader",
+                daemon=True,
+            ).start()
+
+        gc.unfreeze()
+
+    def score(self, texts):
+        """Class probabilities for texts, computed by the least-loaded worker"""
+        return self._submit("score", texts, weight=len(texts)).result()
+
+    def get_stats(self):
+        """Per-worker load plus each worker's batching statistics"""
+        workers = []
+        for worker in self.workers:
+            stats = {
+                "pid": worker.process.pid,
+                "alive": worker.alive,
+                "in_flight": worker.in_flight,
+                "completed": worker.completed,
+            }
+            if worker.alive:
+                try:
+                    stats.update(self._submit("stats", None, worker=worker).result(timeout=2))
+                except Exception as e:
+                    stats["error"] = str(e)
+            workers.append(stats)
+
+        return {
+            "num_workers": self.num_workers,
+            "torch_threads_per_worker": self.torch_threads,
+            "workers": workers,
+        }
+
+    def metrics_snapshots(self):
+        """Metrics registry snapshot from each live worker"""
+        snapshots = []
+        for worker in self.workers:
+            if worker.alive:
+                try:
+                    snapshots.append(self._submit("metrics", None, worker=worker).result(timeout=2))
+                except Exception:
+                    continue
+        return snapshots
+
+    def stop(self, timeout=5.0):
+        """Ask workers to exit and wait for them"""
+        self._stopping = True
+        for worker in self.workers:
+            if worker.alive:
+                try:
+                    with worker.send_lock:
+                        worker.conn.send(None)
+                except (OSError, EOFError):
+                    pass
+        for worker in self.workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    def _submit(self, op, payload, weight=1, worker=None):
+        """Send a job to a worker and return a Future for its reply"""
+        future = Future()
+        with self._lock:
+            if worker is None:
+                candidates = [w for w in self.workers if w.alive]
+                if not candidates:
+                    future.set_exception(RuntimeError("No live moderation workers"))
+                    return future
+                worker = min(candidates, key=lambda w: w.in_flight)
+            job_id = next(self._job_ids)
+            self._pending[job_id] = (worker, future, weight)
+            worker.in_flight += weight
+
+        try:
+            with worker.send_lock:
+                worker.conn.send((job_id, op, payload))
+        except (OSError, EOFError) as e:
+            self._resolve(job_id, False, f"Worker {worker.index} unavailable: {e}")
+        return future
+
+    def _resolve(self, job_id, ok, value):
+        """Complete the Future for a job and release its load"""
+        with self._lock:
+            entry = self._pending.pop(job_id, None)
+            if entry is None:
+                return
+            worker, future, weight = entry
+            worker.in_flight -= weight
+            worker.completed += 1
+
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(RuntimeError(value))
+
+    def _read_results(self, worker):
+        """Reader thread: resolve futures as replies arrive from one worker"""
+        while True:
+            try:
+                job_id, ok, value = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            self._resolve(job_id, ok, value)
+
+        # Worker exited: fail whatever it still owed
+        worker.alive = False
+        if self._stopping:
+            self.moderator.logger.info("Moderation worker %s stopped", worker.index)
+        else:
+            self.moderator.logger.error("Moderation worker %s exited", worker.index)
+        with self._lock:
+            orphaned = [job_id for job_id, entry in self._pending.items() if entry[0] is worker]
+        for job_id in orphaned:
+            self._resolve(job_id, False, f"Worker {worker.index} exited")
+
+
+def _worker_main(moderator, conn, torch_threads, concurrency):
+    """Worker process: score texts with the inherited model until told to stop"""
+    import torch
+
+    # The parent owns shutdown: Ctrl+C reaches the whole process group, and the
+    # server's inherited SIGTERM handler has no meaning in a worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    torch.set_num_threads(torch_threads)
+
+    # Threads and pools don't survive fork; build this process's own
+    moderator.worker_pool = None
+    moderator.batcher = None
+    # Counts from before the fork belong to the parent
+    REGISTRY.reset()
+    if moderator.batching_config is not None:
+        moderator.enable_batching(**moderator.batching_config)
+
+    # Warm up here rather than in the parent: running inference before fork
+    # would start thread pools the children can't safely inherit
+    if ModerationConfig.WARMUP_ON_START:
+        moderator.warm_up()
+
+    send_lock = threading.Lock()
+
+    def reply(job_id, ok, value):
+        with send_lock:
+            conn.send((job_id, ok, value))
+
+    def run(job_id, op, payload):
+        try:
+            if op == "score":
+                reply(job_id, True, moderator._score(payload))
+            elif op == "stats":
+                reply(job_id, True, moderator.get_stats())
+            elif op == "metrics":
+                reply(job_id, True, REGISTRY.snapshot())
+            else:
+                reply(job_id, False, f"Unknown operation: {op}")
+        except Exception as e:
+            reply(job_id, False, str(e))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            if message is None:
+                break
+            executor.submit(run, *message)
+
+    moderator.disable_batching()
+    # Worker processes exit without running atexit hooks; flush queued log records
+    shutdown_logging()
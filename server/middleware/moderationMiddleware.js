@@ -1,7 +1,13 @@
 // Moderation middleware       console.log('� Starting persistent moderation service...');or Express.js routes
 const { spawn } = require('child_process');
+const net = require('net');
 const path = require('path');
 
+// Framed protocol on MODERATION_SOCKET_PATH (see automod/binary_protocol.py):
+// u32 payload length, u32 request id, u8 flags/status, then a JSON payload
+const FRAME_HEADER_BYTES = 9;
+const FRAME_STATUS_OK = 0;
+
 class ForumModerator {
   constructor() {
     this.moderationEnabled = process.env.ENABLE_MODERATION === 'true';
@@ -13,6 +19,20 @@ class ForumModerator {
     this.pythonPath = process.env.PYTHON_PATH || 'python';
     this.scriptPath = path.join(__dirname, '../../automod/moderate_cli.py');
     this.serviceProcess = null;
+
+    // Optional long-lived `moderate_cli.py --stream` child used instead of one spawn per post
+    this.useStreamingCLI = process.env.MODERATION_CLI_STREAM === 'true';
+    this.streamProcess = null;
+    this.streamPending = new Map();
+    this.streamNextId = 0;
+    this.streamBuffer = '';
+
+    // Optional persistent Unix socket to the persistent service, tried before HTTP
+    this.socketPath = process.env.MODERATION_SOCKET_PATH || null;
+    this.socket = null;
+    this.socketPending = new Map();
+    this.socketNextId = 0;
+    this.socketBuffer = Buffer.alloc(0);
     
     // Only log moderation status in production
     if (this.moderationEnabled) {
@@ -46,6 +66,16 @@ class ForumModerator {
   }
 
   cleanup() {
+    if (this.socket) {
+      this.socket.destroy();
+      this.socket = null;
+    }
+
+    if (this.streamProcess) {
+      this.streamProcess.kill('SIGTERM');
+      this.streamProcess = null;
+    }
+
     if (this.serviceProcess) {
       console.log('🔄 Shutting down moderation service...');
       try {
@@ -148,12 +178,19 @@ class ForumModerator {
     return false;
   }
 
-  async moderateContentViaPersistentService(contentData) {
+  async moderateContentViaPersistentService(contentData, retriesLeft = 1) {
+    if (this.socketPath) {
+      const result = await this.moderateContentViaSocket(contentData);
+      if (result) {
+        return result;
+      }
+    }
+
     try {
       // Create AbortController for timeout
       const controller = new AbortController();
       const timeoutId = setTimeout(() => controller.abort(), 10000); // 10 second timeout
-      
+
       const response = await fetch(this.serviceUrl, {
         method: 'POST',
         headers: {
@@ -165,6 +202,13 @@ class ForumModerator {
 
       clearTimeout(timeoutId);
 
+      // Service is at its in-flight cap: honour the retry hint once before falling back
+      if (response.status === 503 && retriesLeft > 0) {
+        const retryAfterSeconds = Math.min(Number(response.headers.get('Retry-After')) || 1, 5);
+        await new Promise(resolve => setTimeout(resolve, retryAfterSeconds * 1000));
+        return this.moderateContentViaPersistentService(contentData, retriesLeft - 1);
+      }
+
       if (!response.ok) {
         throw new Error(`Service responded with ${response.status}`);
       }
@@ -177,7 +221,211 @@ class ForumModerator {
     }
   }
 
+  getSocket() {
+    if (this.socket) {
+      return this.socket;
+    }
+
+    const socket = net.createConnection(this.socketPath);
+    this.socket = socket;
+    this.socketBuffer = Buffer.alloc(0);
+
+    socket.on('data', (data) => {
+      this.socketBuffer = Buffer.concat([this.socketBuffer, data]);
+      while (this.socketBuffer.length >= FRAME_HEADER_BYTES) {
+        const length = this.socketBuffer.readUInt32BE(0);
+        if (this.socketBuffer.length < FRAME_HEADER_BYTES + length) break;
+
+        const id = this.socketBuffer.readUInt32BE(4);
+        const status = this.socketBuffer.readUInt8(8);
+        const payload = this.socketBuffer.subarray(FRAME_HEADER_BYTES, FRAME_HEADER_BYTES + length);
+        this.socketBuffer = this.socketBuffer.subarray(FRAME_HEADER_BYTES + length);
+
+        const pending = this.socketPending.get(id);
+        if (!pending) continue;
+        this.socketPending.delete(id);
+        clearTimeout(pending.timeoutId);
+        let result = null;
+        if (status === FRAME_STATUS_OK) {
+          try {
+            result = JSON.parse(payload.toString('utf8'));
+          } catch (e) {
+            result = null;
+          }
+        }
+        // Busy or error frames resolve to null so the caller falls back to HTTP
+        pending.resolve(result);
+      }
+    });
+
+    const onClose = () => {
+      if (this.socket === socket) {
+        this.socket = null;
+      }
+      for (const pending of this.socketPending.values()) {
+        clearTimeout(pending.timeoutId);
+        pending.resolve(null);
+      }
+      this.socketPending.clear();
+    };
+    socket.on('close', onClose);
+    socket.on('error', () => socket.destroy());
+
+    return socket;
+  }
+
+  // Resolves to the moderation result, or null when the socket can't answer
+  moderateContentViaSocket(contentData) {
+    return new Promise((resolve) => {
+      const socket = this.getSocket();
+      const id = (this.socketNextId = (this.socketNextId + 1) % 0x100000000);
+
+      const timeoutId = setTimeout(() => {
+        this.socketPending.delete(id);
+        resolve(null);
+      }, 10000);
+      this.socketPending.set(id, { resolve, timeoutId });
+
+      const payload = Buffer.from(JSON.stringify(contentData), 'utf8');
+      const header = Buffer.alloc(FRAME_HEADER_BYTES);
+      header.writeUInt32BE(payload.length, 0);
+      header.writeUInt32BE(id, 4);
+      header.writeUInt8(0, 8); // single post, no text echo
+      socket.write(Buffer.concat([header, payload]));
+    });
+  }
+
+  // Queue a post for asynchronous moderation (priority: 'edit', 'new' or 'backfill').
+  // Resolves to { id, status } or null when the service has no job queue.
+  async submitModerationJob(contentData, priority = 'new') {
+    try {
+      const response = await fetch(`${this.serviceUrl}/jobs`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ post: contentData, priority })
+      });
+      if (response.status !== 202) {
+        return null;
+      }
+      return await response.json();
+    } catch (error) {
+      return null;
+    }
+  }
+
+  // Poll an asynchronous job; resolves to the job (status queued/running/done/failed) or null
+  async getModerationJob(jobId) {
+    try {
+      const response = await fetch(`${this.serviceUrl}/jobs/${encodeURIComponent(jobId)}`);
+      if (!response.ok) {
+        return null;
+      }
+      return await response.json();
+    } catch (error) {
+      return null;
+    }
+  }
+
+  // Re-moderate an edited post; the service only re-scores paragraphs that changed since
+  // the version identified by postId (or previousHash, the content_hash of the last result).
+  // Falls back to full moderation when the persistent service can't take it.
+  async moderateEditedContent(postId, contentData, previousHash = null) {
+    if (!this.moderationEnabled) {
+      return { allowed: true, reason: 'Moderation disabled' };
+    }
+
+    if (this.usePersistentService) {
+      try {
+        const response = await fetch(`${this.serviceUrl}/moderate/edit`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ ...contentData, post_id: postId, previous_hash: previousHash })
+        });
+        if (response.ok) {
+          return await response.json();
+        }
+      } catch (error) {
+        // Fall through to full moderation
+      }
+    }
+    return await this.moderateContent(contentData);
+  }
+
+  getStreamProcess() {
+    if (this.streamProcess) {
+      return this.streamProcess;
+    }
+
+    const child = spawn(this.pythonPath, [this.scriptPath, '--stream']);
+    this.streamProcess = child;
+    this.streamBuffer = '';
+
+    child.stdout.on('data', (data) => {
+      this.streamBuffer += data.toString();
+      let newline;
+      while ((newline = this.streamBuffer.indexOf('\n')) !== -1) {
+        const line = this.streamBuffer.slice(0, newline);
+        this.streamBuffer = this.streamBuffer.slice(newline + 1);
+        if (!line.trim()) continue;
+
+        let message;
+        try {
+          message = JSON.parse(line);
+        } catch (e) {
+          continue;
+        }
+        const pending = this.streamPending.get(message.id);
+        if (pending) {
+          this.streamPending.delete(message.id);
+          clearTimeout(pending.timeoutId);
+          delete message.id;
+          pending.resolve(message);
+        }
+      }
+    });
+
+    // Drain stderr so model loading output can't fill the pipe and stall the child
+    child.stderr.on('data', () => {});
+    child.stdin.on('error', () => {});
+
+    const onExit = () => {
+      if (this.streamProcess === child) {
+        this.streamProcess = null;
+      }
+      // Fail open for anything the child didn't answer; the next post respawns it
+      for (const pending of this.streamPending.values()) {
+        clearTimeout(pending.timeoutId);
+        pending.resolve({ allowed: true, reason: 'Moderation service unavailable' });
+      }
+      this.streamPending.clear();
+    };
+    child.on('close', onExit);
+    child.on('error', onExit);
+
+    return child;
+  }
+
+  moderateContentViaStreamingCLI(contentData) {
+    return new Promise((resolve) => {
+      const child = this.getStreamProcess();
+      const id = String(++this.streamNextId);
+
+      // The first request also waits for the model to load
+      const timeoutId = setTimeout(() => {
+        this.streamPending.delete(id);
+        resolve({ allowed: true, reason: 'Moderation timed out' });
+      }, 60000);
+
+      this.streamPending.set(id, { resolve, timeoutId });
+      child.stdin.write(JSON.stringify({ ...contentData, id }) + '\n');
+    });
+  }
+
   async moderateContentViaCLI(contentData) {
+    if (this.useStreamingCLI) {
+      return this.moderateContentViaStreamingCLI(contentData);
+    }
+
     return new Promise((resolve, reject) => {
       const python = spawn(this.pythonPath, [this.scriptPath]);
       let result = '';